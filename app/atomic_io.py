@@ -0,0 +1,76 @@
+# app/atomic_io.py
+from __future__ import annotations
+import gzip
+import io
+import lzma
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+__all__ = ["atomic_write", "fsync_dir"]
+
+# read once at import; os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def fsync_dir(directory: Path) -> None:
+    """Make a rename inside `directory` durable (no-op where directories can't be opened)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path: Path, encoding: str = "utf-8", compression: str = "none",
+                 durable: bool = True) -> Iterator[IO[str]]:
+    """
+    Write a text file so readers only ever see the old or the new contents:
+    write a temp file next to `path`, fsync it, rename it over `path`, fsync the dir.
+    If the block raises, `path` is left untouched and the temp file is removed.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as raw:
+            if compression == "gzip":
+                packed: IO[bytes] = gzip.GzipFile(fileobj=raw, mode="wb")
+            elif compression == "lzma":
+                packed = lzma.LZMAFile(raw, mode="wb")
+            else:
+                packed = raw
+            text = io.TextIOWrapper(packed, encoding=encoding, newline="", write_through=False)
+            try:
+                yield text
+                text.flush()
+            finally:
+                text.detach()
+                if packed is not raw:
+                    packed.close()  # writes the compression trailer; raw stays open
+            raw.flush()
+            if durable:
+                os.fsync(raw.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if durable:
+        fsync_dir(path.parent)
@@ -0,0 +1,426 @@
+# app/batch.py
+"""
+Apply one operation to every row of an operand file far larger than memory.
+
+    python -m app.batch <input> <output> --op divide [--chunk N] [--workers N] [--restart]
+
+Inputs and outputs are picked by suffix:
+- .csv:        `a,b` rows (an optional header line is skipped); output rows are
+               `a,b,result,error`
+- .f64 / .bin: raw little-endian float64, interleaved (a0, b0, a1, b1, ...);
+               output is one float64 result per row (NaN where the row failed)
+
+A reader thread, the compute step (app.shared_batch, on several processes)
+and a writer thread work on different chunks at once, with at most a few
+chunks in flight, so memory stays flat however large the file is. After each
+chunk the writer fsyncs the output and records a checkpoint (<output>.ckpt);
+an interrupted run started again with the same arguments resumes after the
+last committed chunk.
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .atomic_io import atomic_write
+from .calculator_config import load_config
+from .exceptions import OperationError
+from .numeric import get_backend
+from .shared_batch import ERR_UNREADABLE, ERROR_NAMES, MIN_PARALLEL, OK, evaluate, start_pool
+
+try:  # advisory locks are POSIX-only; elsewhere runs on one output are not serialized
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+__all__ = ["BatchProgress", "BatchReport", "run_batch", "main"]
+
+DEFAULT_CHUNK = 1_000_000
+_BINARY = {".f64", ".bin"}
+_IN_FLIGHT = 2  # chunks queued between each pair of stages
+_CSV_HEADER = b"a,b,result,error\n"
+_ERROR_LABELS = np.array([""] + [ERROR_NAMES.get(c, str(c)) for c in range(1, 256)], dtype=object)
+
+
+@dataclass(frozen=True)
+class BatchProgress:
+    chunk: int
+    rows: int          # rows done so far, including resumed ones
+    errors: int
+    fraction: float    # of the input bytes
+    rows_per_s: float  # this run only
+
+
+@dataclass
+class BatchReport:
+    rows: int = 0
+    chunks: int = 0
+    resumed_rows: int = 0
+    seconds: float = 0.0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    def summary(self) -> str:
+        rate = (self.rows - self.resumed_rows) / self.seconds if self.seconds else 0.0
+        text = f"batch: {self.rows} row(s) in {self.chunks} chunk(s), {rate:,.0f} rows/s, {self.error_count} error(s)"
+        if self.errors:
+            text += " (" + ", ".join(f"{n} {name}" for name, n in sorted(self.errors.items())) + ")"
+        if self.resumed_rows:
+            text += f"; resumed after {self.resumed_rows} row(s)"
+        return text
+
+
+@dataclass(frozen=True)
+class _Chunk:
+    index: int
+    a: np.ndarray
+    b: np.ndarray
+    unreadable: np.ndarray | None  # bool mask, CSV only
+    end: int                       # input byte offset after this chunk
+
+
+# ---------------- reading ----------------
+def _parse_csv_slow(lines: List[bytes]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(lines)
+    a, b = np.full(n, math.nan), np.full(n, math.nan)
+    bad = np.zeros(n, bool)
+    for i, line in enumerate(lines):
+        fields = line.split(b",")
+        try:
+            if len(fields) < 2:
+                raise ValueError(line)
+            a[i], b[i] = float(fields[0]), float(fields[1])
+        except ValueError:
+            bad[i] = True
+    return a, b, bad
+
+
+def _parse_csv(lines: List[bytes]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """pandas' C parser for the usual all-numeric chunk; row by row when something is off."""
+    try:
+        df = pd.read_csv(io.BytesIO(b"".join(lines)), header=None, names=["a", "b"], usecols=[0, 1],
+                         dtype=np.float64, skip_blank_lines=False, engine="c")
+    except (ValueError, pd.errors.ParserError):
+        return _parse_csv_slow(lines)
+    if len(df) != len(lines):
+        return _parse_csv_slow(lines)
+    a, b = df["a"].to_numpy(), df["b"].to_numpy()
+    return a, b, np.isnan(a) | np.isnan(b)
+
+
+def _is_header(line: bytes) -> bool:
+    try:
+        float(line.split(b",")[0])
+        return False
+    except ValueError:
+        return bool(line.strip())
+
+
+def _read_chunks(path: Path, start: int, chunk_rows: int, first_index: int) -> Iterator[_Chunk]:
+    binary = path.suffix.lower() in _BINARY
+    with open(path, "rb") as f:
+        f.seek(start)
+        index, offset = first_index, start
+        if binary:
+            while True:
+                flat = np.fromfile(f, dtype="<f8", count=2 * chunk_rows)
+                rows = len(flat) // 2
+                if not rows:
+                    return
+                offset += rows * 16
+                pairs = flat[: 2 * rows].reshape(rows, 2)
+                yield _Chunk(index, pairs[:, 0].copy(), pairs[:, 1].copy(), None, offset)
+                index += 1
+        if start == 0:
+            first = f.readline()
+            offset += len(first)
+            if not _is_header(first):
+                f.seek(0)
+                offset = 0
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            offset += sum(map(len, lines))
+            a, b, bad = _parse_csv(lines)
+            yield _Chunk(index, a, b, bad, offset)
+            index += 1
+
+
+# ---------------- writing ----------------
+def _csv_bytes(chunk: _Chunk, results: np.ndarray, errors: np.ndarray) -> bytes:
+    frame = pd.DataFrame({"a": chunk.a, "b": chunk.b, "result": results, "error": _ERROR_LABELS[errors]})
+    return frame.to_csv(header=False, index=False, lineterminator="\n").encode()
+
+
+# ---------------- checkpoint ----------------
+def _fingerprint(src: Path, op: str, chunk_rows: int, out: Path) -> Dict[str, Any]:
+    st = src.stat()
+    return {"input": str(src.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "op": op, "chunk_rows": chunk_rows, "output": str(out.resolve())}
+
+
+def _checkpoint_path(out: Path) -> Path:
+    return out.with_name(out.name + ".ckpt")
+
+
+def _load_checkpoint(out: Path, fingerprint: Dict[str, Any]) -> Dict[str, Any] | None:
+    try:
+        state = json.loads(_checkpoint_path(out).read_text())
+    except (OSError, ValueError):
+        return None
+    if state.get("fingerprint") != fingerprint or not out.exists():
+        return None
+    if out.stat().st_size < state["output_bytes"]:
+        return None  # output lost committed data; start over
+    return state
+
+
+def _save_checkpoint(out: Path, state: Dict[str, Any]) -> None:
+    with atomic_write(_checkpoint_path(out)) as f:
+        json.dump(state, f)
+
+
+@contextmanager
+def _exclusive(out: Path) -> Iterator[None]:
+    """
+    Hold `<output>.ckpt.lock` for the whole run; a second run on the same
+    output fails rather than writing into it too. The checkpoint itself is
+    renamed over and unlinked, so it cannot carry the lock.
+    """
+    with open(out.with_name(out.name + ".ckpt.lock"), "a+b") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError as exc:
+                raise OperationError(f"Another batch is already writing {out}") from exc
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+# ---------------- pipeline ----------------
+class _Stage(threading.Thread):
+    """A pipeline thread whose exception is re-raised by the coordinator."""
+    def __init__(self, target: Callable[[], None], name: str) -> None:
+        super().__init__(name=name, daemon=True)
+        self._fn = target
+        self.error: BaseException | None = None
+
+    def run(self) -> None:
+        try:
+            self._fn()
+        except BaseException as exc:  # handed to the coordinator
+            self.error = exc
+
+
+_DONE = object()
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event,
+         peer: threading.Thread | None = None) -> bool:
+    """Blocking put that gives up when the run stops or the consumer died."""
+    while not stop.is_set():
+        if peer is not None and not peer.is_alive():
+            return False
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: "queue.Queue[Any]", stop: threading.Event, peer: threading.Thread | None = None) -> Any:
+    """Blocking get; _DONE when the run stops or the producer died without saying so."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if peer is not None and not peer.is_alive() and q.empty():
+                return _DONE
+    return _DONE
+
+
+def run_batch(
+    src: Path,
+    out: Path,
+    op: str,
+    chunk_rows: int = DEFAULT_CHUNK,
+    workers: int | None = None,
+    restart: bool = False,
+    max_input: float = math.inf,
+    progress: Callable[[BatchProgress], None] | None = None,
+    cancel: threading.Event | None = None,
+) -> BatchReport:
+    """
+    Stream `src` through `op` into `out` chunk by chunk (see the module doc).
+    Resumes from `out`'s checkpoint when one matches these arguments, unless
+    `restart`. Setting `cancel` stops the run after the chunk in hand; the
+    checkpoint is kept, so it can be resumed. Raises OperationError for
+    unusable arguments or files, a cancelled run, or an output another run
+    is writing.
+    """
+    src, out = Path(src), Path(out)
+    get_backend("float").resolve(op)  # unknown operations fail before any file is touched
+    if not src.is_file():
+        raise OperationError(f"No input file at {src}")
+    if chunk_rows < 1:
+        raise OperationError("Chunk size must be positive")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+    with _exclusive(out):
+        # one pool for every chunk, started before the reader and writer threads
+        pool = start_pool(workers) if workers > 1 and chunk_rows >= MIN_PARALLEL else None
+        try:
+            return _run(src, out, op, chunk_rows, workers, restart, max_input, progress,
+                        cancel or threading.Event(), pool)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+
+def _run(src: Path, out: Path, op: str, chunk_rows: int, workers: int, restart: bool,
+         max_input: float, progress: Callable[[BatchProgress], None] | None,
+         stop: threading.Event, pool: ProcessPoolExecutor | None) -> BatchReport:
+    fingerprint = _fingerprint(src, op, chunk_rows, out)
+    state = None if restart else _load_checkpoint(out, fingerprint)
+    if state is None:
+        state = {"fingerprint": fingerprint, "chunks": 0, "rows": 0, "input_bytes": 0,
+                 "output_bytes": 0, "errors": {}}
+    report = BatchReport(rows=state["rows"], chunks=state["chunks"], resumed_rows=state["rows"],
+                         errors=dict(state["errors"]))
+    binary_out = out.suffix.lower() in _BINARY
+    total_bytes = max(1, fingerprint["size"])
+    started = time.perf_counter()
+
+    sink = open(out, "r+b" if state["output_bytes"] else "wb")
+    sink.truncate(state["output_bytes"])  # drop anything written after the last commit
+    sink.seek(state["output_bytes"])
+    if not state["output_bytes"] and not binary_out:
+        sink.write(_CSV_HEADER)
+
+    to_compute: "queue.Queue[Any]" = queue.Queue(_IN_FLIGHT)
+    to_write: "queue.Queue[Any]" = queue.Queue(_IN_FLIGHT)
+
+    def read() -> None:
+        for chunk in _read_chunks(src, state["input_bytes"], chunk_rows, state["chunks"]):
+            if not _put(to_compute, chunk, stop):
+                return
+        _put(to_compute, _DONE, stop)
+
+    def write() -> None:
+        while True:
+            item = _get(to_write, stop)
+            if item is _DONE:
+                return
+            chunk, results, errors = item
+            if binary_out:
+                sink.write(results.astype("<f8").tobytes())
+            else:
+                sink.write(_csv_bytes(chunk, results, errors))
+            sink.flush()
+            os.fsync(sink.fileno())
+            report.chunks += 1
+            report.rows += len(results)
+            codes, counts = np.unique(errors[errors != OK], return_counts=True)
+            for code, n in zip(codes.tolist(), counts.tolist()):
+                name = ERROR_NAMES.get(code, str(code))
+                report.errors[name] = report.errors.get(name, 0) + n
+            # commit: the output is durable up to here, so a rerun may skip it
+            state.update(chunks=report.chunks, rows=report.rows, input_bytes=chunk.end,
+                         output_bytes=sink.tell(), errors=report.errors)
+            _save_checkpoint(out, state)
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                progress(BatchProgress(report.chunks, report.rows, report.error_count,
+                                       chunk.end / total_bytes,
+                                       (report.rows - report.resumed_rows) / elapsed if elapsed else 0.0))
+
+    reader, writer = _Stage(read, "batch reader"), _Stage(write, "batch writer")
+    reader.start()
+    writer.start()
+    try:
+        while True:
+            chunk = _get(to_compute, stop, reader)
+            if chunk is _DONE:
+                break
+            done = evaluate(op, chunk.a, chunk.b, workers=workers, max_input=max_input,
+                            min_parallel=MIN_PARALLEL, pool=pool)
+            errors = done.errors
+            if chunk.unreadable is not None and chunk.unreadable.any():
+                errors = np.where(chunk.unreadable, ERR_UNREADABLE, errors).astype(np.uint8)
+            if not _put(to_write, (chunk, done.results, errors), stop, writer):
+                break
+        _put(to_write, _DONE, stop, writer)
+        writer.join()
+    finally:
+        cancelled = stop.is_set()
+        stop.set()
+        reader.join()
+        writer.join()
+        sink.close()
+    for stage in (reader, writer):
+        if stage.error is not None:
+            if isinstance(stage.error, OSError):
+                raise OperationError(f"{stage.name} failed: {stage.error}") from stage.error
+            raise stage.error
+    if cancelled:
+        raise OperationError(f"Batch cancelled after {report.chunks} chunk(s); run it again to resume")
+    _checkpoint_path(out).unlink(missing_ok=True)  # finished: nothing to resume
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def format_progress(p: BatchProgress) -> str:
+    return (f"chunk {p.chunk}: {p.rows} row(s), {p.fraction:.0%} of input, "
+            f"{p.rows_per_s:,.0f} rows/s, {p.errors} error(s)")
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="batch", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--op", required=True, help="operation applied to every (a, b) row")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--restart", action="store_true", help="ignore a checkpoint and start over")
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ns = parse_args(sys.argv[1:] if argv is None else argv)
+    cfg = load_config()
+    try:
+        report = run_batch(ns.input, ns.output, ns.op, ns.chunk, ns.workers, ns.restart,
+                           cfg.max_input_value,
+                           progress=lambda p: print(format_progress(p), file=sys.stderr, flush=True))
+    except OperationError as exc:
+        sys.stderr.write(f"error: {exc}\n")
+        return 2
+    print(report.summary())
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
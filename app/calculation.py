@@ -1,42 +1,140 @@
 # app/calculation.py
 from __future__ import annotations
-from dataclasses import dataclass, asdict
+from dataclasses import FrozenInstanceError
 from datetime import datetime, UTC
+from fractions import Fraction
+from itertools import count
 from typing import Dict, Any
+import os
+import time
 import uuid
 
-@dataclass(frozen=True)
+# Ids are (per-process random node, monotonic 64-bit sequence). Only the node
+# touches urandom, once per process; children of fork() get a fresh node.
+_NODE = int.from_bytes(os.urandom(8), "big")
+_SEQ = count(1)
+
+def _reseed_after_fork() -> None:
+    global _NODE, _SEQ
+    _NODE = int.from_bytes(os.urandom(8), "big")
+    _SEQ = count(1)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_after_fork)
+
+
 class Calculation:
-    operation: str
-    a: float
-    b: float
-    result: float
-    uid: str | None = None
-    timestamp: str | None = None  # ISO 8601 with +00:00
+    """
+    Immutable record of one operation.
+
+    Records created in this process keep a sequence id (`seq`) and an integer
+    epoch-nanosecond timestamp (`ts_ns`); the UUID and ISO 8601 strings exposed as
+    `uid` / `timestamp` are rendered on first access and cached. Records loaded
+    from disk simply carry the strings they were saved with.
+    """
+    __slots__ = ("operation", "a", "b", "result", "seq", "ts_ns", "_node", "_uid", "_timestamp")
+
+    def __init__(
+        self,
+        operation: str,
+        a: float,
+        b: float,
+        result: float,
+        uid: str | None = None,
+        timestamp: str | None = None,  # ISO 8601 with +00:00
+        *,
+        seq: int = 0,
+        ts_ns: int = 0,
+        node: int = 0,
+    ) -> None:
+        _set = object.__setattr__
+        _set(self, "operation", operation)
+        _set(self, "a", a)
+        _set(self, "b", b)
+        _set(self, "result", result)
+        _set(self, "seq", seq)
+        _set(self, "ts_ns", ts_ns)
+        _set(self, "_node", node or (_NODE if seq else 0))
+        _set(self, "_uid", uid)
+        _set(self, "_timestamp", timestamp)
+
+    @classmethod
+    def now(cls, operation: str, a: float, b: float, result: float) -> "Calculation":
+        """Build an already-stamped record in one allocation."""
+        return cls(operation, a, b, result, seq=next(_SEQ), ts_ns=time.time_ns())
+
+    # ---------- lazily rendered identity ----------
+    @property
+    def uid(self) -> str | None:
+        if self._uid is None and self.seq:
+            # version-4 layout so consumers validating UUID strings stay happy
+            rendered = str(uuid.UUID(int=(self._node << 64) | self.seq, version=4))
+            object.__setattr__(self, "_uid", rendered)
+        return self._uid
+
+    @property
+    def timestamp(self) -> str | None:
+        if self._timestamp is None and self.ts_ns:
+            dt = datetime.fromtimestamp(self.ts_ns // 1_000_000_000, UTC)
+            object.__setattr__(self, "_timestamp", dt.isoformat(timespec="seconds"))
+        return self._timestamp
+
+    def is_stamped(self) -> bool:
+        return (self._uid is not None or self.seq != 0) and (self._timestamp is not None or self.ts_ns != 0)
 
     def with_timestamp(self) -> "Calculation":
         """Ensure uid and timestamp exist; return an updated immutable instance."""
-        if self.uid is not None and self.timestamp is not None:
+        if self.is_stamped():
             return self
+        has_uid = self._uid is not None or self.seq != 0
+        has_ts = self._timestamp is not None or self.ts_ns != 0
         return Calculation(
-            operation=self.operation,
-            a=self.a,
-            b=self.b,
-            result=self.result,
-            uid=self.uid or str(uuid.uuid4()),
-            timestamp=self.timestamp or datetime.now(UTC).isoformat(timespec="seconds"),
+            self.operation, self.a, self.b, self.result,
+            uid=self._uid,
+            timestamp=self._timestamp,
+            seq=self.seq if has_uid else next(_SEQ),
+            ts_ns=self.ts_ns if has_ts else time.time_ns(),
+            node=self._node,
+        )
+
+    # ---------- value semantics (what the frozen dataclass used to give us) ----------
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def _key(self) -> tuple:
+        return (self.operation, self.a, self.b, self.result, self.uid, self.timestamp)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._key() == other._key()  # type: ignore[attr-defined]
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return (
+            f"Calculation(operation={self.operation!r}, a={self.a!r}, b={self.b!r}, "
+            f"result={self.result!r}, uid={self.uid!r}, timestamp={self.timestamp!r})"
         )
 
+    def __reduce__(self):
+        return (_restore, (self.operation, self.a, self.b, self.result, self._uid,
+                           self._timestamp, self.seq, self.ts_ns, self._node))
+
+    # ---------- serialization ----------
     def to_dict(self) -> Dict[str, Any]:
         c = self.with_timestamp()
-        d = asdict(c)
         return {
-            "id": d["uid"],
-            "operation": d["operation"],
-            "a": d["a"],
-            "b": d["b"],
-            "result": d["result"],
-            "timestamp": d["timestamp"],
+            "id": c.uid,
+            "operation": c.operation,
+            "a": c.a,
+            "b": c.b,
+            "result": c.result,
+            "timestamp": c.timestamp,
         }
 
     @staticmethod
@@ -45,9 +143,22 @@ class Calculation:
         ts = d.get("timestamp", None)
         return Calculation(
             operation=str(d["operation"]),
-            a=float(d["a"]),
-            b=float(d["b"]),
-            result=float(d["result"]),
+            a=_number(d["a"]),
+            b=_number(d["b"]),
+            result=_number(d["result"]),
             uid=str(cid) if cid is not None else None,
             timestamp=str(ts) if ts is not None else None,
         )
+
+
+def _number(value: Any) -> Any:
+    """Persisted numbers are floats, except exact-mode results saved as 'p/q'."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return Fraction(str(value))
+
+
+def _restore(operation, a, b, result, uid, timestamp, seq, ts_ns, node) -> Calculation:
+    return Calculation(operation, a, b, result, uid=uid, timestamp=timestamp,
+                       seq=seq, ts_ns=ts_ns, node=node)
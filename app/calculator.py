@@ -1,15 +1,20 @@
 # app/calculator.py
 from __future__ import annotations
-from typing import Protocol, List, Sequence
-import pandas as pd
-from pathlib import Path
+from itertools import chain
+from operator import ne
+from typing import Any, Dict, Iterable, Iterator, Protocol, List, Sequence
 
-from .operations import create_operation
+from .numeric import Kernel, get_backend
+from .cost_guard import RISKY_OPS, check_cost, estimate_product_digits, run_with_timeout
 from .calculation import Calculation
 from .history import History
 from .exceptions import OperationError
 from .calculator_config import load_config
 from .logger import get_logger
+from .group_commit import AutoSavePolicy
+from .history_store import open_store
+from .result_cache import ResultCache, open_cache, operation_key
+from .shared_batch import BatchResult, evaluate
 
 class Observer(Protocol):
     def on_new_calculation(self, calc: Calculation, history: History) -> None: ...
@@ -26,39 +31,238 @@ class LoggingObserver:
         )
 
 class AutoSaveObserver:
+    """
+    Persists history after calculations. Saves are atomic and scheduled by
+    CALCULATOR_AUTO_SAVE_POLICY (always / every=N / interval=M / on-idle[=M]);
+    under "always", bursts within CALCULATOR_SAVE_WINDOW_MS (or up to
+    CALCULATOR_SAVE_BATCH requests) still share one durable write.
+    Nothing is written while the history is unchanged since the last save.
+    With CALCULATOR_HISTORY_SHARED, writes append-and-merge into a file that
+    other processes share, and pull() picks up their records.
+    The observer keeps one history store open, so SQLite autosaves only write
+    the rows that changed since the previous save.
+    """
     def __init__(self) -> None:
         self._cfg = load_config()
+        self._history: History | None = None
+        self._saved_version = -1
+        self._path = self._cfg.history_dir / self._cfg.history_file
+        self._store = open_store(self._path, self._cfg.history_backend, self._cfg.default_encoding,
+                                 self._cfg.history_retention_days)
+        self._shared = self._store if self._cfg.history_shared else None
+        policy = AutoSavePolicy.parse(self._cfg.auto_save_policy)
+        self._committer = policy.committer(self._write, self._cfg.save_window_ms, self._cfg.save_batch)
+
+    @property
+    def writes(self) -> int:
+        return self._committer.commits
+
+    def bind(self, history: History) -> None:
+        # what the history already holds is not ours to write: only later changes are
+        self._history = history
+        self._saved_version = history.version
 
     def on_new_calculation(self, calc: Calculation, history: History) -> None:
         if not self._cfg.auto_save:
             return
-        rows = [c.to_dict() for c in history.items()]
-        df = pd.DataFrame(rows, columns=["id", "operation", "a", "b", "result", "timestamp"])
-        out = self._cfg.history_dir / self._cfg.history_file
-        df.to_csv(out, index=False, encoding=self._cfg.default_encoding)
+        self._history = history
+        self._committer.request()
+
+    def is_dirty(self) -> bool:
+        return self._history is not None and self._history.version != self._saved_version
+
+    def _write(self) -> None:
+        if not self._cfg.auto_save or not self.is_dirty():
+            return
+        h = self._history
+        assert h is not None
+        if self._shared is not None:
+            snap = h.snapshot()
+            foreign, _ = self._shared.append(snap)
+            # what came back from the file is on disk already; a concurrent change is not
+            self._saved_version = snap.version + (1 if h.merge(foreign) else 0)
+            return
+        version = h.version
+        h.save(store=self._store)
+        self._saved_version = version
+
+    def pull(self) -> int:
+        """Merge records other processes appended to the shared file; returns how many."""
+        if self._shared is None or self._history is None:
+            return 0
+        version = self._history.version
+        n = self._history.merge(self._shared.read_new())
+        if n and version == self._saved_version:
+            self._saved_version = version + 1  # they are on disk already
+        return n
+
+    def flush(self) -> int:
+        """Write pending or unsaved changes now; returns how many save requests that covered."""
+        if not self._cfg.auto_save:
+            return 0
+        n = self._committer.flush()
+        if not n and self.is_dirty():
+            # e.g. undo/clear since the last save: no calculation asked for a write
+            self._write()
+            n = 1
+        return n
 
 class Calculator:
+    """
+    Safe to share between threads: operations compute concurrently and only
+    the history update serializes (see History). Observers are notified from
+    whichever thread ran the operation.
+    """
     def __init__(self, observers: Sequence[Observer] | None = None) -> None:
         cfg = load_config()
-        self.history = History(max_size=cfg.max_history_size)
-        self._observers: List[Observer] = list(observers or [])
+        self.history = History(max_size=cfg.max_history_size, max_bytes=cfg.max_history_bytes,
+                               spill_dir=cfg.history_dir / "spill")
+        # numeric mode is fixed for the session; float needs no coercion at all
+        self.numeric = get_backend(cfg.numeric_mode, cfg.precision)
+        self._coerce = self.numeric.coerce
+        self._precision = cfg.precision
+        # only unbounded (exact) numbers need the up-front cost estimate
+        self._max_digits = 0 if self.numeric.bounded else cfg.max_result_digits
+        self._op_timeout = cfg.op_timeout
+        self._max_input = cfg.max_input_value
+        # optional persistent memo shared across sessions (CALCULATOR_RESULT_CACHE)
+        self.cache: ResultCache | None = open_cache(
+            cfg.result_cache, cfg.history_dir, f"{self.numeric.name}:{cfg.precision}", cfg.result_cache_size
+        )
+        self._cache_all = cfg.result_cache == "all"
+        self._kernels: Dict[str, Kernel] = {}
+        self._observers: List[Observer] = []
+        for obs in observers or []:
+            self.add_observer(obs)
 
     def add_observer(self, obs: Observer) -> None:
+        bind = getattr(obs, "bind", None)
+        if bind is not None:
+            bind(self.history)
         self._observers.append(obs)
 
+    def refresh(self) -> int:
+        """Merge history records other processes appended to a shared history file."""
+        n = 0
+        for obs in self._observers:
+            pull = getattr(obs, "pull", None)
+            if pull is not None:
+                n += pull()
+        return n
+
+    def flush(self) -> int:
+        """Force observers holding deferred work (e.g. autosave) to write it now."""
+        if self.cache is not None:
+            self.cache.flush()
+        n = 0
+        for obs in self._observers:
+            flush = getattr(obs, "flush", None)
+            if flush is not None:
+                n += flush()
+        return n
+
     def _notify(self, calc: Calculation) -> None:
         for obs in self._observers:
             obs.on_new_calculation(calc, self.history)
 
+    def _kernel(self, op_name: str) -> Kernel:
+        kernel = self._kernels.get(op_name)
+        if kernel is None:
+            kernel = self._kernels[op_name] = self._build_kernel(op_name)
+        return kernel
+
+    def _build_kernel(self, op_name: str) -> Kernel:
+        """Resolve an operation once and wrap it in the cache/guards this session needs."""
+        name = op_name.strip().lower()
+        kernel = self._guarded_kernel(op_name, name)
+        key = operation_key(name)
+        if self.cache is not None and key is not None and (self._cache_all or name in RISKY_OPS):
+            # a hit skips the cost check and the worker process as well
+            kernel = self.cache.wrap(key, kernel)
+        return kernel
+
+    def _guarded_kernel(self, op_name: str, name: str) -> Kernel:
+        base = self.numeric.resolve(op_name)
+        if name not in RISKY_OPS or (not self._max_digits and self._op_timeout <= 0):
+            return base
+        max_digits, timeout = self._max_digits, self._op_timeout
+        mode, precision = self.numeric.name, self._precision
+
+        def guarded(a: Any, b: Any) -> Any:
+            if max_digits:
+                check_cost(name, a, b, max_digits)
+            if timeout > 0:
+                return run_with_timeout(mode, precision, name, a, b, timeout)
+            return base(a, b)
+        return guarded
+
     def execute(self, op_name: str, a: float, b: float) -> Calculation:
-        # Optional input bound check (keeps requirement ready for validators later)
-        cfg = load_config()
-        if abs(a) > cfg.max_input_value or abs(b) > cfg.max_input_value:
+        # Optional input bound check (keeps requirement ready for validators later);
+        # the limit is read once per session like the other settings
+        if abs(a) > self._max_input or abs(b) > self._max_input:
             raise OperationError("Input exceeds configured maximum")
 
-        op = create_operation(op_name)
-        result = op.execute(a, b)
-        calc = Calculation(op_name, a, b, result).with_timestamp()
+        kernel = self._kernel(op_name)
+        if self._coerce is not None:
+            a, b = self._coerce(a), self._coerce(b)
+        result = kernel(a, b)
+        calc = Calculation.now(op_name, a, b, result)
+        self.history.add(calc)
+        self._notify(calc)
+        return calc
+
+    def execute_batch(self, op_name: str, a: Any, b: Any, workers: int | None = None) -> BatchResult:
+        """
+        Element-wise `op_name` over operand arrays, spread over `workers`
+        processes through shared memory (see app.shared_batch). Per-element
+        errors come back as codes; nothing is added to the history.
+        """
+        if self.numeric.name != "float":
+            raise OperationError("Batch evaluation needs CALCULATOR_NUMERIC_MODE=float")
+        return evaluate(op_name, a, b, workers=workers, max_input=self._max_input)
+
+    def reduce(self, op_name: str, chunks: Iterable[Sequence[Any]]) -> Calculation:
+        """
+        Fold every value in `chunks` with an n-ary reduction (sum, product, min,
+        max, mean) and record ONE history entry, with a = how many values and
+        b = 0. Values come in chunks so a large file streams through: each
+        chunk is bound-checked and coerced in one pass, never value by value.
+        NaN is rejected whatever the reduction, and an exact product is held
+        to the same digit limit as power/root.
+        """
+        reducer = self.numeric.resolve_reduction(op_name)
+        n = 0
+        digits = 0.0
+        max_digits = self._max_digits if op_name == "product" else 0
+
+        def checked() -> Iterator[Sequence[Any]]:
+            nonlocal n, digits
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if max(map(abs, chunk)) > self._max_input:
+                    raise OperationError("Input exceeds configured maximum")
+                # NaN never wins a comparison, so min/max would keep or drop it by position
+                if any(map(ne, chunk, chunk)):
+                    raise OperationError(f"Result not finite in {op_name} operation")
+                if max_digits:
+                    digits += estimate_product_digits(chunk)
+                    if digits > max_digits:
+                        raise OperationError(
+                            f"product result too large: about {digits:.3g} digits (limit {max_digits})"
+                        )
+                if self._coerce is not None:
+                    chunk = list(map(self._coerce, chunk))
+                n += len(chunk)
+                yield chunk
+
+        it = checked()
+        first = next(it, None)
+        if first is None:
+            raise OperationError(f"{op_name} needs at least one value")
+        result = reducer(chain.from_iterable(chain((first,), it)))
+        parse = self.numeric.parse
+        calc = Calculation.now(op_name, parse(n), parse(0), result)
         self.history.add(calc)
         self._notify(calc)
         return calc
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from .group_commit import AutoSavePolicy
 
 def _as_bool(s: str | None, default: bool) -> bool:
     if s is None:
@@ -16,17 +17,45 @@ def _as_int(s: str | None, default: int) -> int:
     except Exception:
         return default
 
+def _as_float(s: str | None, default: float) -> float:
+    try:
+        return float(s) if s is not None else default
+    except Exception:
+        return default
+
+def _as_policy(s: str | None) -> str:
+    try:
+        AutoSavePolicy.parse(s)
+        return (s or "always").strip().lower()
+    except Exception:
+        return "always"
+
 @dataclass(frozen=True)
 class Config:
     log_dir: Path
     history_dir: Path
     log_file: str
     history_file: str
+    history_backend: str
+    history_retention_days: int
     max_history_size: int
+    max_history_bytes: int
     auto_save: bool
+    save_window_ms: float
+    save_batch: int
+    auto_save_policy: str
+    history_shared: bool
     precision: int
+    numeric_mode: str
+    max_result_digits: int
+    op_timeout: float
+    result_cache: str
+    result_cache_size: int
     max_input_value: float
     default_encoding: str
+    daemon_socket: Path
+    daemon_idle_timeout: float
+    plugin_dir: Path
 
 def load_config() -> Config:
     load_dotenv()  # load .env if present
@@ -34,15 +63,50 @@ def load_config() -> Config:
     log_dir = Path(os.getenv("CALCULATOR_LOG_DIR", "var/logs"))
     history_dir = Path(os.getenv("CALCULATOR_HISTORY_DIR", "var/history"))
     log_file = os.getenv("CALCULATOR_LOG_FILE", "calculator.log")
-    history_file = os.getenv("CALCULATOR_HISTORY_FILE", "history.csv")
+    # csv (default), sqlite or partitioned (one file per day); a .db/.sqlite/.csv/.parts
+    # history file name picks its own backend
+    history_backend = os.getenv("CALCULATOR_HISTORY_BACKEND", "csv").strip().lower()
+    if history_backend not in {"csv", "sqlite", "partitioned"}:
+        history_backend = "csv"
+    history_file = os.getenv(
+        "CALCULATOR_HISTORY_FILE",
+        {"sqlite": "history.db", "partitioned": "history.parts"}.get(history_backend, "history.csv"),
+    )
+    # partitioned backend: delete whole days older than this on save (0 = keep everything)
+    history_retention_days = max(0, _as_int(os.getenv("CALCULATOR_HISTORY_RETENTION_DAYS"), 0))
 
     max_history_size = _as_int(os.getenv("CALCULATOR_MAX_HISTORY_SIZE"), 1000)
+    # > 0: keep at most this many bytes of history in memory, spill older entries to disk
+    max_history_bytes = _as_int(os.getenv("CALCULATOR_MAX_HISTORY_BYTES"), 0)
     auto_save = _as_bool(os.getenv("CALCULATOR_AUTO_SAVE"), True)
+    # group commit: coalesce autosaves requested within this window / batch size
+    save_window_ms = _as_float(os.getenv("CALCULATOR_SAVE_WINDOW_MS"), 0.0)
+    save_batch = _as_int(os.getenv("CALCULATOR_SAVE_BATCH"), 0)
+    auto_save_policy = _as_policy(os.getenv("CALCULATOR_AUTO_SAVE_POLICY"))
+    # several processes append to one history file (locked, merged by id)
+    history_shared = _as_bool(os.getenv("CALCULATOR_HISTORY_SHARED"), False)
 
     precision = _as_int(os.getenv("CALCULATOR_PRECISION"), 6)
+    numeric_mode = os.getenv("CALCULATOR_NUMERIC_MODE", "float").strip().lower()
+    if numeric_mode not in {"float", "decimal", "exact"}:
+        numeric_mode = "float"
+    max_result_digits = _as_int(os.getenv("CALCULATOR_MAX_RESULT_DIGITS"), 4300)
+    op_timeout = _as_float(os.getenv("CALCULATOR_OP_TIMEOUT"), 0.0)
+    # persistent memo of results under history_dir: off | risky (power/root) | all
+    result_cache = os.getenv("CALCULATOR_RESULT_CACHE", "off").strip().lower()
+    if result_cache not in {"off", "risky", "all"}:
+        result_cache = "off"
+    result_cache_size = _as_int(os.getenv("CALCULATOR_RESULT_CACHE_SIZE"), 100_000)
     max_input_value = float(os.getenv("CALCULATOR_MAX_INPUT_VALUE", "1e12"))
     default_encoding = os.getenv("CALCULATOR_DEFAULT_ENCODING", "utf-8")
 
+    # keep these defaults in sync with app/client.py (it must not import this module)
+    daemon_socket = Path(os.getenv("CALCULATOR_DAEMON_SOCKET", "var/run/calculator.sock"))
+    daemon_idle_timeout = _as_float(os.getenv("CALCULATOR_DAEMON_IDLE_TIMEOUT"), 300.0)
+
+    # *.py files declaring OPERATIONS = {...}; imported only when one of them runs
+    plugin_dir = Path(os.getenv("CALCULATOR_PLUGIN_DIR", "plugins"))
+
     # ensure dirs exist
     log_dir.mkdir(parents=True, exist_ok=True)
     history_dir.mkdir(parents=True, exist_ok=True)
@@ -52,9 +116,24 @@ def load_config() -> Config:
         history_dir=history_dir,
         log_file=log_file,
         history_file=history_file,
+        history_backend=history_backend,
+        history_retention_days=history_retention_days,
         max_history_size=max_history_size,
+        max_history_bytes=max_history_bytes,
         auto_save=auto_save,
+        save_window_ms=save_window_ms,
+        save_batch=save_batch,
+        auto_save_policy=auto_save_policy,
+        history_shared=history_shared,
         precision=precision,
+        numeric_mode=numeric_mode,
+        max_result_digits=max_result_digits,
+        op_timeout=op_timeout,
+        result_cache=result_cache,
+        result_cache_size=result_cache_size,
         max_input_value=max_input_value,
         default_encoding=default_encoding,
+        daemon_socket=daemon_socket,
+        daemon_idle_timeout=daemon_idle_timeout,
+        plugin_dir=plugin_dir,
     )
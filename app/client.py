@@ -0,0 +1,122 @@
+# app/client.py
+"""
+Thin client for the calculator daemon (app/daemon.py).
+
+    python -m app.client add 1 2        # one command from argv
+    printf 'add 1 2\\nhistory\\n' | python -m app.client
+
+Deliberately imports nothing from the rest of the package (no pandas, no dotenv):
+it only forwards lines over a Unix socket and prints the reply. The daemon is
+spawned on first use and exits on its own after its idle timeout.
+For the lowest latency run it as `python -S -m app.client ...`.
+"""
+from __future__ import annotations
+import os
+import socket
+import sys
+import time
+
+# keep in sync with app/calculator_config.py
+_DEFAULT_SOCKET = "var/run/calculator.sock"
+_SPAWN_TIMEOUT = 10.0
+
+
+def socket_path() -> str:
+    return os.getenv("CALCULATOR_DAEMON_SOCKET", _DEFAULT_SOCKET)
+
+
+def _connect(path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+
+def _spawn_daemon() -> None:
+    import subprocess
+    pkg_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (pkg_root, env.get("PYTHONPATH")) if p)
+    subprocess.Popen(
+        [sys.executable, "-m", "app.daemon"],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def connect(path: str | None = None, spawn: bool = True) -> socket.socket:
+    """Connect to the daemon, starting it first if nobody is listening."""
+    path = path or socket_path()
+    sock = _connect(path)
+    if sock is not None:
+        return sock
+    if not spawn:
+        raise ConnectionError(f"calculator daemon is not running at {path}")
+    _spawn_daemon()
+    deadline = time.monotonic() + _SPAWN_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        sock = _connect(path)
+        if sock is not None:
+            return sock
+    raise ConnectionError(f"calculator daemon did not start at {path}")
+
+
+def request(lines: list[str], path: str | None = None, spawn: bool = True) -> str:
+    """Send command lines to the daemon and return its combined reply."""
+    sock = connect(path, spawn)
+    try:
+        payload = "".join(line.rstrip("\n") + "\n" for line in lines).encode("utf-8")
+        if len(payload) > 65536:
+            # a long script could fill both socket buffers; feed it from a thread
+            import threading
+            sender = threading.Thread(target=_send_all, args=(sock, payload), daemon=True)
+            sender.start()
+        else:
+            _send_all(sock, payload)
+        chunks: list[bytes] = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", errors="replace")
+    finally:
+        sock.close()
+
+
+def _send_all(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(payload)
+    sock.shutdown(socket.SHUT_WR)
+
+
+def _quote(arg: str) -> str:
+    if arg and not any(ch.isspace() or ch in "'\"\\" for ch in arg):
+        return arg
+    import shlex
+    return shlex.quote(arg)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if args:
+        lines = [" ".join(_quote(a) for a in args)]
+    else:
+        lines = sys.stdin.readlines()
+    try:
+        reply = request(lines)
+    except ConnectionError as exc:
+        sys.stderr.write(f"error: {exc}\n")
+        return 2
+    sys.stdout.write(reply)
+    return 1 if any(line.startswith("error:") for line in reply.splitlines()) else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
@@ -1,9 +1,11 @@
 # app/command_pattern.py
 from __future__ import annotations
+import threading
 from dataclasses import dataclass
 from typing import Protocol, List
 
 from app.calculator import Calculator
+from app.exceptions import OperationError
 
 class Command(Protocol):
     """Behavioral Command interface."""
@@ -21,21 +23,34 @@ class MathCommand:
         return f"{self.op_name}({float(self.a)}, {float(self.b)}) = {c.result}"
 
 class CommandQueue:
-    """Invoker that can queue and run commands (deferred execution)."""
+    """
+    Invoker that can queue and run commands (deferred execution).
+    Safe to share between threads; commands run outside the lock, so a slow
+    one never blocks enqueue().
+    """
     def __init__(self) -> None:
         self._items: List[Command] = []
+        self._lock = threading.Lock()
 
     def enqueue(self, cmd: Command) -> None:
-        self._items.append(cmd)
+        with self._lock:
+            self._items.append(cmd)
 
     def clear(self) -> int:
-        n = len(self._items)
-        self._items.clear()
-        return n
+        with self._lock:
+            n = len(self._items)
+            self._items.clear()
+            return n
+
+    def _next(self) -> Command | None:
+        with self._lock:
+            return self._items.pop(0) if self._items else None
 
     def list(self) -> list[str]:
         out: list[str] = []
-        for i, cmd in enumerate(self._items, 1):
+        with self._lock:
+            items = tuple(self._items)
+        for i, cmd in enumerate(items, 1):
             if isinstance(cmd, MathCommand):
                 out.append(f"{i}. {cmd.op_name} {cmd.a} {cmd.b}")
             else:
@@ -44,7 +59,10 @@ class CommandQueue:
 
     def run_all(self, calc: Calculator) -> list[str]:
         results: list[str] = []
-        while self._items:
-            cmd = self._items.pop(0)
-            results.append(cmd.execute(calc))
+        while (cmd := self._next()) is not None:
+            try:
+                results.append(cmd.execute(calc))
+            except OperationError as exc:
+                # a rejected or timed-out command must not strand the rest of the queue
+                results.append(f"error: {exc}")
         return results  # pragma: no cover
@@ -1,12 +1,60 @@
 # app/command_registry.py
 from __future__ import annotations
-from typing import Callable
+from types import MappingProxyType
+from typing import Callable, Mapping
 
 Handler = Callable[..., str]
 
+class _Registry(dict):
+    """The live registry: every change, through any dict method, bumps _GENERATION."""
+    def _changed(self) -> None:
+        global _GENERATION
+        _GENERATION += 1
+
+    def __setitem__(self, name, handler) -> None:
+        super().__setitem__(name, handler)
+        self._changed()
+
+    def __delitem__(self, name) -> None:
+        super().__delitem__(name)
+        self._changed()
+
+    def pop(self, *args):
+        try:
+            return super().pop(*args)
+        finally:
+            self._changed()
+
+    def popitem(self):
+        try:
+            return super().popitem()
+        finally:
+            self._changed()
+
+    def setdefault(self, name, handler=None):
+        try:
+            return super().setdefault(name, handler)
+        finally:
+            self._changed()
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
 # Single live registry + help store
-_REGISTRY: dict[str, Handler] = {}
+_REGISTRY: dict[str, Handler] = _Registry()
 _HELP: list[tuple[str, str]] = []   # (name, description)
+_GENERATION = 0  # bumped on every registry change; invalidates frozen dispatch tables
+_FROZEN: tuple[int, Mapping[str, Handler]] | None = None
 
 
 def register(name: str, handler: Handler, desc: str = "") -> None:
@@ -25,10 +73,27 @@ def command(name: str, desc: str = ""):
 
 
 def get_commands() -> dict[str, Handler]:
-    """Return the LIVE registry (not a copy). Tests rely on this mutability."""
+    """
+    Return the LIVE registry (not a copy). Tests rely on this mutability;
+    changes made through it are seen by dispatch_table() like register().
+    """
     return _REGISTRY
 
 
+def registry_version() -> int:
+    """Changes whenever the registry does, however it was changed."""
+    return _GENERATION
+
+
+def dispatch_table() -> Mapping[str, Handler]:
+    """A read-only snapshot of the registry, rebuilt only after it changes."""
+    global _FROZEN
+    version = registry_version()
+    if _FROZEN is None or _FROZEN[0] != version:
+        _FROZEN = (version, MappingProxyType(dict(_REGISTRY)))
+    return _FROZEN[1]
+
+
 def help_lines() -> list[tuple[str, str]]:
     """
     Return accumulated (name, desc) pairs that describe commands.
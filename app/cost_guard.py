@@ -0,0 +1,156 @@
+# app/cost_guard.py
+from __future__ import annotations
+import math
+import multiprocessing as mp
+import threading
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any, Iterable
+
+from app.exceptions import OperationError
+
+__all__ = [
+    "RISKY_OPS", "estimate_log10_magnitude", "estimate_exact_digits", "estimate_product_digits",
+    "check_cost", "mp_context", "run_with_timeout",
+]
+
+# Operations whose cost grows with the size of the result rather than being O(1)
+RISKY_OPS = frozenset({"power", "root"})
+
+
+def _log10_abs(x: Any) -> float:
+    """log10(|x|) without materializing huge floats; -inf for zero."""
+    if x == 0:
+        return -math.inf
+    if isinstance(x, Fraction):
+        return math.log10(abs(x.numerator)) - math.log10(x.denominator)
+    if isinstance(x, Decimal):
+        return float(abs(x).log10())
+    if isinstance(x, int):
+        return math.log10(abs(x))
+    return math.log10(abs(float(x)))
+
+
+def _as_float(x: Any) -> float:
+    try:
+        return float(x)
+    except OverflowError:
+        return math.inf if x > 0 else -math.inf
+
+
+def estimate_log10_magnitude(op_name: str, a: Any, b: Any) -> float | None:
+    """
+    Estimated log10(|result|) for power/root, i.e. roughly the number of digits
+    the result needs (negative for tiny results). None for O(1) operations.
+    """
+    if op_name == "power":
+        la = _log10_abs(a)
+        if la == 0 or b == 0 or la == -math.inf:
+            return 0.0  # 1 ** b, a ** 0, 0 ** b
+        return _as_float(b) * la
+    if op_name == "root":
+        if b == 0 or a == 0:
+            return 0.0
+        return _log10_abs(a) / _as_float(b)
+    return None
+
+
+def estimate_exact_digits(op_name: str, a: Any, b: Any) -> float | None:
+    """
+    Estimated digits in the numerator or denominator of an exact power/root
+    of Fractions. These grow even when the value stays small:
+    1.0000001 ** 10**9 is about 1e43 but needs billions of digits. A
+    fractional exponent p/q takes the q-th root first. None for other
+    operations or operands.
+    """
+    if op_name not in RISKY_OPS or not (isinstance(a, Fraction) and isinstance(b, Fraction)):
+        return None
+    if a == 0 or b == 0:
+        return 0.0
+    size = max(math.log10(abs(a.numerator)), math.log10(a.denominator))
+    if op_name == "power":
+        return abs(b.numerator) * size / b.denominator
+    return size / abs(b)
+
+
+def estimate_product_digits(values: Iterable[Any]) -> float:
+    """
+    Upper bound on the digits in the numerator or denominator of an exact
+    product of `values`: they add up with every factor, so a long enough
+    list of short Fractions still builds a number that takes minutes to
+    multiply out. Zeros and non-Fractions count as no digits.
+    """
+    num = den = 0.0
+    for x in values:
+        if isinstance(x, Fraction) and x:
+            num += math.log10(abs(x.numerator))
+            den += math.log10(x.denominator)
+    return max(num, den)
+
+
+def check_cost(op_name: str, a: Any, b: Any, max_digits: int) -> None:
+    """Reject power/root calls whose exact result would exceed `max_digits` digits."""
+    est = estimate_log10_magnitude(op_name, a, b)
+    if est is None or max_digits <= 0:
+        return
+    if math.isnan(est) or abs(est) > max_digits:
+        raise OperationError(
+            f"{op_name} result too large: about {abs(est):.3g} digits (limit {max_digits})"
+        )
+    digits = estimate_exact_digits(op_name, a, b)
+    if digits is not None and digits > max_digits:
+        raise OperationError(
+            f"{op_name} result too large: about {digits:.3g} digits as a fraction (limit {max_digits})"
+        )
+
+
+# ---------------- killable worker ----------------
+def mp_context():
+    """
+    Start method for worker processes. fork starts in ~1ms and needs nothing
+    pickled but the operands, but forking while other threads run (the
+    group-commit writer, a batch's reader and writer) can hand the child a
+    lock that is held forever, so then forkserver or spawn is used.
+    """
+    methods = mp.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return mp.get_context("fork")
+    return mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _worker(conn, mode: str, precision: int, op_name: str, a: Any, b: Any) -> None:
+    from app.numeric import get_backend
+    try:
+        conn.send(("ok", get_backend(mode, precision).resolve(op_name)(a, b)))
+    except OperationError as exc:
+        conn.send(("err", str(exc)))
+    except Exception as exc:  # pragma: no cover - defensive
+        conn.send(("err", f"{op_name} failed: {exc}"))
+    finally:
+        conn.close()
+
+
+def run_with_timeout(mode: str, precision: int, op_name: str, a: Any, b: Any, timeout: float) -> Any:
+    """
+    Run one backend operation in a child process and kill it after `timeout`
+    seconds. Raises OperationError("timed out") when the deadline passes.
+    """
+    ctx = mp_context()
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_worker, args=(child, mode, precision, op_name, a, b), daemon=True)
+    proc.start()
+    child.close()
+    try:
+        if not parent.poll(timeout):
+            raise OperationError("timed out")
+        status, value = parent.recv()
+    except EOFError as exc:
+        raise OperationError(f"{op_name} worker exited unexpectedly") from exc
+    finally:
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+        parent.close()
+    if status == "err":
+        raise OperationError(value)
+    return value
@@ -0,0 +1,112 @@
+# app/daemon.py
+from __future__ import annotations
+import contextvars
+import socket
+import socketserver
+from pathlib import Path
+
+from app.calculator import AutoSaveObserver, Calculator
+from app.calculator_config import load_config
+from app.repl import process_line_iter, _install_sigterm_flush, _seed_registry_if_needed
+
+__all__ = ["CalculatorDaemon", "serve"]
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    One connection = one client invocation.
+    The client writes newline-separated commands and half-closes the socket;
+    we answer each line exactly as the REPL would print it. Each connection
+    runs in a fresh context, so session state such as a macro being recorded
+    is neither seen by other clients nor left behind when this one goes.
+    """
+    def handle(self) -> None:
+        contextvars.Context().run(self._serve)
+
+    def _serve(self) -> None:
+        server: CalculatorDaemon = self.server  # type: ignore[assignment]
+        for raw in self.rfile:
+            line = raw.decode(server.encoding, errors="replace")
+            cont, lines = process_line_iter(server.calc, line)
+            try:
+                for out in lines:
+                    self.wfile.write((out + "\n").encode(server.encoding))
+            finally:
+                # a client that hung up mid-stream stops the producer (e.g. a batch) now
+                close = getattr(lines, "close", None)
+                if close is not None:
+                    close()
+            if not cont:
+                break
+
+
+class CalculatorDaemon(socketserver.UnixStreamServer):
+    """
+    Long-lived server that keeps the interpreter, pandas, config and the
+    command registry warm. Stops by itself after `idle_timeout` seconds
+    without a connection (0 disables the idle shutdown). Like the REPL, the
+    session autosaves by default and flushes pending saves when it stops.
+    """
+    def __init__(self, socket_path: Path, idle_timeout: float = 300.0,
+                 calc: Calculator | None = None, encoding: str = "utf-8") -> None:
+        self.socket_path = Path(socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        _remove_stale_socket(self.socket_path)
+        super().__init__(str(self.socket_path), _RequestHandler)
+        self.timeout = idle_timeout if idle_timeout > 0 else None
+        self.encoding = encoding
+        _seed_registry_if_needed()
+        self.calc = calc or Calculator(observers=[AutoSaveObserver()])
+        self._idle = False
+
+    def handle_timeout(self) -> None:
+        self._idle = True
+
+    def serve_until_idle(self) -> None:
+        try:
+            while not self._idle:
+                self.handle_request()
+        finally:
+            try:
+                self.calc.flush()  # the clients' history outlives the daemon
+            finally:
+                self.server_close()
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(path: Path) -> None:
+    """Unlink a socket file left by a dead daemon; refuse to steal a live one."""
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+        return
+    finally:
+        probe.close()
+    raise OSError(f"calculator daemon already listening on {path}")
+
+
+def serve() -> int:
+    cfg = load_config()
+    try:
+        daemon = CalculatorDaemon(cfg.daemon_socket, cfg.daemon_idle_timeout,
+                                  encoding=cfg.default_encoding)
+    except OSError:
+        # another daemon won the race; the client will talk to that one
+        return 0
+    _install_sigterm_flush()  # SIGTERM unwinds through serve_until_idle's flush
+    daemon.serve_until_idle()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(serve())  # pragma: no cover
@@ -0,0 +1,152 @@
+# app/group_commit.py
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .exceptions import OperationError
+
+__all__ = ["GroupCommitter", "AutoSavePolicy"]
+
+
+class GroupCommitter:
+    """
+    Coalesces save requests into fewer durable writes (group commit).
+
+    - window_ms == 0: every request writes immediately (the old behaviour)
+    - window_ms > 0: the first pending request sets a deadline; everything
+      requested before it passes is written by one flush. With debounce=True
+      each request pushes the deadline back (flush once input goes idle).
+    - window_ms is None: no timer at all, only max_batch / explicit flush()
+    - max_batch > 0: flush as soon as that many requests are pending
+
+    One background thread per committer sleeps until the deadline, so bursts
+    don't create a timer thread per request. The lock is held while writing;
+    requests that arrive mid-write join the next batch.
+    """
+    def __init__(self, flush_fn: Callable[[], Any], window_ms: float | None = 0,
+                 max_batch: int = 0, debounce: bool = False) -> None:
+        self._flush_fn = flush_fn
+        self._window = None if window_ms is None else max(0.0, float(window_ms)) / 1000.0
+        self._max_batch = max(0, int(max_batch))
+        self._debounce = debounce
+        self._cond = threading.Condition(threading.RLock())
+        self._pending = 0
+        self._deadline: float | None = None
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self.commits = 0
+        self.last_error: Exception | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def request(self) -> bool:
+        """Record one save request; returns True if it was written right away."""
+        with self._cond:
+            self._pending += 1
+            if self._window == 0 or (self._max_batch and self._pending >= self._max_batch):
+                self._flush_locked()
+                return True
+            if self._window is not None and (self._deadline is None or self._debounce):
+                armed = self._deadline is not None
+                self._deadline = time.monotonic() + self._window
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                    self._thread.start()
+                elif not armed:
+                    self._cond.notify()
+            return False
+
+    def flush(self) -> int:
+        """Write now if anything is pending; returns how many requests were coalesced."""
+        with self._cond:
+            return self._flush_locked()
+
+    def close(self) -> int:
+        """Flush and stop the background thread."""
+        with self._cond:
+            try:
+                return self._flush_locked()
+            finally:
+                self._closed = True
+                self._cond.notify()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                delay = self._deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)  # a debounced deadline may have moved meanwhile
+                    continue
+                try:
+                    self._flush_locked()
+                except Exception as exc:
+                    # keep the requests pending; the next flush/sync retries and re-raises
+                    self._deadline = None
+                    self.last_error = exc
+
+    def _flush_locked(self) -> int:
+        self._deadline = None
+        n = self._pending
+        if not n:
+            return 0
+        self._flush_fn()
+        self._pending = 0
+        self.commits += 1
+        self.last_error = None
+        return n
+
+
+def _ms(text: str) -> float:
+    text = text.strip()
+    if text.endswith("ms"):
+        return float(text[:-2])
+    if text.endswith("s"):
+        return float(text[:-1]) * 1000.0
+    return float(text)
+
+
+@dataclass(frozen=True)
+class AutoSavePolicy:
+    """
+    When autosave writes, parsed from CALCULATOR_AUTO_SAVE_POLICY:
+    - always        every calculation (subject to the group-commit window/batch)
+    - every=N       once N calculations are pending
+    - interval=M    at most once per M (ms, or with an s/ms suffix)
+    - on-idle[=M]   once no calculation arrived for M (default 1s)
+    """
+    kind: str = "always"
+    every: int = 0
+    interval_ms: float = 0.0
+
+    @staticmethod
+    def parse(text: str | None) -> "AutoSavePolicy":
+        raw = (text or "always").strip().lower()
+        name, eq, value = raw.partition("=")
+        try:
+            if name == "always" and not eq:
+                return AutoSavePolicy()
+            if name == "every" and int(value) >= 1:
+                return AutoSavePolicy("every", every=int(value))
+            if name == "interval" and _ms(value) > 0:
+                return AutoSavePolicy("interval", interval_ms=_ms(value))
+            if name in ("on-idle", "idle"):
+                return AutoSavePolicy("on-idle", interval_ms=_ms(value) if eq else 1000.0)
+        except ValueError:
+            pass
+        raise OperationError(f"Invalid autosave policy: {text!r} (use always, every=N, interval=M, on-idle[=M])")
+
+    def committer(self, flush_fn: Callable[[], Any], window_ms: float = 0, max_batch: int = 0) -> GroupCommitter:
+        if self.kind == "every":
+            return GroupCommitter(flush_fn, window_ms=None, max_batch=self.every)
+        if self.kind == "interval":
+            return GroupCommitter(flush_fn, window_ms=self.interval_ms, max_batch=max_batch)
+        if self.kind == "on-idle":
+            return GroupCommitter(flush_fn, window_ms=self.interval_ms, max_batch=max_batch, debounce=True)
+        return GroupCommitter(flush_fn, window_ms=window_ms, max_batch=max_batch)
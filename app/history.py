@@ -1,6 +1,8 @@
 # app/history.py
 from __future__ import annotations
-from typing import List, Iterable
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Iterable, Set, Tuple
 from .calculation import Calculation
 from .calculator_memento import CalculatorMemento
 from .exceptions import OperationError
@@ -8,135 +10,394 @@ from .exceptions import OperationError
 from pathlib import Path
 import pandas as pd
 from .calculator_config import load_config
+from .history_export import COLUMNS
+from .history_store import HistoryStore, open_store
+from .history_spill import Segment, SpillSegments, entry_bytes, iter_segments, slice_segments
+from .sketch import DistributionStats
+
+__all__ = ["History", "HistorySnapshot"]
+
+
+@dataclass(frozen=True)
+class HistorySnapshot:
+    """
+    The history as of one version: spilled segments plus the in-memory
+    tail, oldest first. Never changes, so it can be read (iterated, queried,
+    exported, saved) from any thread while writers carry on.
+    """
+    version: int
+    cold: Tuple[Segment, ...]
+    hot: Tuple[Calculation, ...]
+    # entries undo took out: stores that merge rather than rewrite delete these
+    removed: Tuple[Calculation, ...] = ()
+    # clear() ran since the last save: such stores must keep nothing else either
+    cleared: bool = False
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.hot)
+
+    @property
+    def spilled(self) -> int:
+        return sum(seg.count for seg in self.cold)
+
+    def __iter__(self) -> Iterator[Calculation]:
+        yield from iter_segments(self.cold)
+        yield from self.hot
+
+    def window(self, start: int, stop: int) -> Iterator[Calculation]:
+        """Entries [start:stop] (0 = oldest), touching only the segments that overlap."""
+        cold = self.spilled
+        start, stop = max(0, start), min(stop, cold + len(self.hot))
+        if start < cold:
+            yield from slice_segments(self.cold, start, min(stop, cold))
+        yield from self.hot[max(0, start - cold): max(0, stop - cold)]
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        """Entries filtered by operation and ISO timestamp range (the last `limit` matches)."""
+        hits = [
+            c for c in self
+            if (operation is None or c.operation == operation)
+            and (since is None or (c.timestamp or "") >= since)
+            and (until is None or (c.timestamp or "") <= until)
+        ]
+        return hits[-limit:] if limit else hits
 
-__all__ = ["History"]
 
 class History:
     """
     Manages calculation history with undo/redo using a Memento snapshot.
     - done:   list[Calculation] (chronological)
     - undone: stack[list[Calculation]] (LIFO for redo)
+
+    By default entries past max_size are dropped. With max_bytes > 0 nothing
+    is dropped: once the in-memory tail exceeds max_bytes (or max_size
+    entries), its older half spills to an on-disk segment under spill_dir.
+    items(), iter_items(), query() and undo page spilled entries back in.
+
+    `stats` keeps streaming quantile sketches of every entry added (see
+    app.sketch), so percentiles never need the whole history in memory.
+
+    Safe to share between threads. Mutations serialize on one lock; readers
+    (items(), iter_items(), window(), query(), exports and saves) work on an
+    immutable HistorySnapshot. A snapshot is published lazily: the first read
+    after a change copies the in-memory tail under the lock, every later read
+    reuses it, and no reader holds the lock while it iterates or writes a file.
     """
-    def __init__(self, max_size: int = 1000):
+    def __init__(self, max_size: int = 1000, max_bytes: int = 0,
+                 spill_dir: Path | None = None):
         if max_size <= 0:
             raise OperationError("max_size must be positive")
         self._done: List[Calculation] = []
         self._undone: List[Calculation] = []
+        self._removed: Dict[str, Calculation] = {}  # undone, until a save applies it
+        self._cleared: int | None = None  # version of a clear() no save has applied yet
+        self._foreign: Set[str] = set()  # uids merge() brought in: undo never pops them
         self._max_size = int(max_size)
+        self._version = 0  # bumped on every mutation; lets savers skip clean writes
+        self._max_bytes = max(0, int(max_bytes))
+        self._hot_bytes = 0
+        self._cold: SpillSegments | None = None
+        if self._max_bytes:
+            self._cold = SpillSegments(spill_dir or load_config().history_dir / "spill")
+        self.stats = DistributionStats()
+        self._lock = threading.RLock()
+        self._snapshot: HistorySnapshot | None = None
+
+    def _changed(self) -> None:
+        """Call under the lock after every mutation."""
+        self._version += 1
+        self._snapshot = None
+
+    def snapshot(self) -> HistorySnapshot:
+        """An immutable view of the current history (reused until the next change)."""
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                snap = self._snapshot
+                if snap is None:
+                    cold = self._cold.snapshot() if self._cold is not None else ()
+                    snap = self._snapshot = HistorySnapshot(self._version, cold, tuple(self._done),
+                                                            tuple(self._removed.values()),
+                                                            self._cleared is not None)
+        return snap
+
+    def _saved(self, snap: HistorySnapshot) -> None:
+        """`snap` is on disk: forget the removals and the clear() it carried."""
+        with self._lock:
+            for c in snap.removed:
+                if self._removed.get(c.uid) is c:
+                    del self._removed[c.uid]
+            if snap.cleared and self._cleared is not None and self._cleared <= snap.version:
+                self._cleared = None
+            if snap.removed or snap.cleared:
+                self._snapshot = None  # same entries, but less left to apply
 
     # ---------- basic info ----------
     def size(self) -> int:
-        return len(self._done)
+        with self._lock:
+            return len(self._done) + (len(self._cold) if self._cold is not None else 0)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate bytes held in memory (tracked only with a byte budget)."""
+        return self._hot_bytes
+
+    @property
+    def spilled(self) -> int:
+        """How many of the oldest entries currently live on disk."""
+        return len(self._cold) if self._cold is not None else 0
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     def is_empty(self) -> bool:
-        return not self._done
+        return self.size() == 0
 
     def items(self) -> List[Calculation]:
         # return a defensive copy
-        return list(self._done)
+        return list(self.snapshot())
+
+    def iter_items(self) -> Iterator[Calculation]:
+        """Oldest first, reading spilled segments one at a time."""
+        return iter(self.snapshot())
+
+    def window(self, start: int, stop: int) -> Iterator[Calculation]:
+        """
+        Entries [start:stop] in chronological order (0 = oldest), touching only
+        the spilled segments that overlap the window.
+        """
+        return self.snapshot().window(start, stop)
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        """Entries filtered by operation and ISO timestamp range (the last `limit` matches)."""
+        return self.snapshot().query(operation, since, until, limit)
+
+    # ---------- spill ----------
+    def _trim(self) -> None:
+        """Enforce max_size (drop, or spill with a byte budget) and max_bytes."""
+        if self._cold is None:
+            # enforce max size by trimming from the oldest
+            overflow = len(self._done) - self._max_size
+            if overflow > 0:
+                if self._foreign:
+                    self._foreign.difference_update(c.uid for c in self._done[:overflow])
+                del self._done[0:overflow]
+            return
+        if self._hot_bytes <= self._max_bytes and len(self._done) <= self._max_size:
+            return
+        # spill the older half so spills (and undo page-ins) stay amortized O(1);
+        # the newest entry always stays in memory
+        n = min(max(len(self._done) // 2, len(self._done) - self._max_size), len(self._done) - 1)
+        if n <= 0:
+            return
+        cold = self._done[:n]
+        self._cold.push(cold)
+        del self._done[:n]
+        self._hot_bytes -= sum(entry_bytes(c) for c in cold)
+
+    def _page_in(self) -> None:
+        """Undo reached the spilled part: bring the newest segment back."""
+        if self._done or not self.spilled:
+            return
+        assert self._cold is not None
+        self._done = self._cold.pop()
+        self._hot_bytes = sum(entry_bytes(c) for c in self._done)
+
+    def _last_local(self) -> int:
+        """Index in _done of the newest entry undo may take (not merged in); -1 if none."""
+        while True:
+            self._page_in()
+            for i in range(len(self._done) - 1, -1, -1):
+                if self._done[i].uid not in self._foreign:
+                    return i
+            if not self.spilled:
+                return -1
+            # only merged entries in memory: bring the next segment in front of them
+            assert self._cold is not None
+            older = self._cold.pop()
+            self._done[:0] = older
+            self._hot_bytes += sum(entry_bytes(c) for c in older)
+
+    def _push(self, c: Calculation) -> None:
+        self._done.append(c)
+        if self._cold is not None:
+            self._hot_bytes += entry_bytes(c)
 
     # ---------- mutation ----------
     def add(self, calc: Calculation) -> None:
         if not isinstance(calc, Calculation):
             raise OperationError("Only Calculation can be added")
-        # new action invalidates redo stack
-        self._undone.clear()
-        self._done.append(calc.with_timestamp())
-        # enforce max size by trimming from the oldest
-        overflow = len(self._done) - self._max_size
-        if overflow > 0:
-            del self._done[0:overflow]
+        calc = calc.with_timestamp()
+        with self._lock:
+            # new action invalidates redo stack
+            self._undone.clear()
+            self._push(calc)
+            self.stats.record(calc)
+            self._changed()
+            self._trim()
 
     def clear(self) -> None:
-        self._done.clear()
-        self._undone.clear()
+        with self._lock:
+            self._done.clear()
+            self._undone.clear()
+            self._removed.clear()
+            self._foreign.clear()
+            self._hot_bytes = 0
+            if self._cold is not None:
+                self._cold.clear()
+            self.stats.clear()
+            self._changed()
+            self._cleared = self._version
+
+    def merge(self, calcs: Iterable[Calculation]) -> int:
+        """
+        Append records whose uid is not present yet (e.g. written by another
+        process). Unlike add(), this keeps the redo stack, and undo never takes
+        merged records: it stays local to what this History added.
+        Uids are checked against the in-memory tail and earlier merges only,
+        never the spilled part: the shared stores already hand back just the
+        records this process did not write. Returns how many were added.
+        """
+        with self._lock:
+            hot = {c.uid for c in self._done}
+            added = 0
+            for c in calcs:
+                c = c.with_timestamp()
+                if c.uid in hot or c.uid in self._foreign:
+                    continue
+                hot.add(c.uid)
+                self._foreign.add(c.uid)
+                self._push(c)
+                self.stats.record(c)
+                added += 1
+            if added:
+                self._trim()
+                self._changed()
+            return added
 
     # ---------- undo/redo ----------
     def undo(self) -> Calculation:
-        if not self._done:
-            raise OperationError("Nothing to undo")
-        c = self._done.pop()
-        self._undone.append(c)
-        return c
+        """Take back the newest calculation added here (never one merge() brought in)."""
+        with self._lock:
+            i = self._last_local()
+            if i < 0:
+                raise OperationError("Nothing to undo")
+            c = self._done.pop(i)
+            if self._cold is not None:
+                self._hot_bytes -= entry_bytes(c)
+            self._undone.append(c)
+            self._removed[c.uid] = c
+            self._changed()
+            self._trim()  # paging past merged entries may have gone over budget
+            return c
 
     def redo(self) -> Calculation:
-        if not self._undone:
-            raise OperationError("Nothing to redo")
-        c = self._undone.pop()
-        self._done.append(c)
-        return c
+        with self._lock:
+            if not self._undone:
+                raise OperationError("Nothing to redo")
+            c = self._undone.pop()
+            self._removed.pop(c.uid, None)
+            self._push(c)
+            self._changed()
+            self._trim()
+            return c
 
     # ---------- memento ----------
     def create_memento(self) -> CalculatorMemento:
-        return CalculatorMemento(done=tuple(self._done))
+        return CalculatorMemento(done=tuple(self.snapshot()))
 
     def restore(self, m: CalculatorMemento) -> None:
-        # restoring invalidates redo
-        self._undone.clear()
-        self._done = list(m.done)
+        with self._lock:
+            # restoring invalidates redo
+            self._undone.clear()
+            self._foreign.clear()
+            self._done = list(m.done)
+            self.stats.clear()
+            self.stats.record_many(self._done)
+            if self._cold is not None:
+                self._cold.clear()
+                self._hot_bytes = sum(entry_bytes(c) for c in self._done)
+                while self._hot_bytes > self._max_bytes or len(self._done) > self._max_size:
+                    before = len(self._done)
+                    self._trim()
+                    if len(self._done) == before:
+                        break
+            self._changed()
 
     # ---------- convenience ----------
     def extend(self, calcs: Iterable[Calculation]) -> None:
-        for c in calcs:
-            self.add(c)
+        with self._lock:
+            for c in calcs:
+                self.add(c)
 
     # ---------- persistence ----------
     def to_dataframe(self) -> pd.DataFrame:
         """Return the current 'done' list as a DataFrame suitable for CSV."""
-        rows = [c.to_dict() for c in self._done]
-        return pd.DataFrame(rows, columns=["id", "operation", "a", "b", "result", "timestamp"])
+        rows = [c.to_dict() for c in self.snapshot()]
+        return pd.DataFrame(rows, columns=list(COLUMNS))
 
-    def save(self, path: Path | None = None) -> Path:
+    def save(self, path: Path | None = None, store: HistoryStore | None = None) -> Path:
         """
-        Save the current history to CSV. Returns the file path.
+        Save the current history through its store (CSV or SQLite, see
+        CALCULATOR_HISTORY_BACKEND). Returns the file path.
+        CSV is streamed into a temp file that is fsynced and renamed over the
+        target; SQLite writes only what changed since the store's last save.
+        With CALCULATOR_HISTORY_SHARED the file is shared with other processes
+        instead: only records it lacks are appended.
+        Pass `store` to reuse one (e.g. autosave keeps its SQLite connection).
         Raises OperationError if something goes wrong.
         """
         cfg = load_config()
-        out = path or (cfg.history_dir / cfg.history_file)
+        owned = store is None
+        if store is None:
+            out = path or (cfg.history_dir / cfg.history_file)
+            store = open_store(out, cfg.history_backend, cfg.default_encoding, cfg.history_retention_days)
+        out = store.path
+        snap = self.snapshot()  # writers carry on while the file is written
         try:
-            df = self.to_dataframe()
-            out.parent.mkdir(parents=True, exist_ok=True)
-            df.to_csv(out, index=False, encoding=cfg.default_encoding)
+            if cfg.history_shared:
+                # other processes own rows in this file too: merge, never rewrite
+                store.append(snap)
+            else:
+                store.save(snap)
+            self._saved(snap)
             return out
         except Exception as exc:
             raise OperationError(f"Failed to save history to {out}: {exc}") from exc
+        finally:
+            if owned:
+                store.close()
 
-    def load(self, path: Path | None = None, clear_existing: bool = True) -> int:
+    def load(self, path: Path | None = None, clear_existing: bool = True,
+             limit: int | None = None, since: str | None = None, until: str | None = None) -> int:
         """
-        Load history from CSV into this History instance.
+        Load history (all of it, or only the last `limit` records) into this History instance.
+        `since`/`until` (ISO timestamps) load only that range; a partitioned
+        store then reads only the days that overlap it.
         Returns number of records loaded. Missing/malformed files are handled gracefully (0).
         """
         cfg = load_config()
         file = path or (cfg.history_dir / cfg.history_file)
-        if not file.exists():
-            return 0
         try:
-            df = pd.read_csv(file)
-            required = {"id", "operation", "a", "b", "result", "timestamp"}
-            if not required.issubset(set(df.columns)):
-                # Malformed CSV; ignore but do not crash
-                return 0
-
-            items: list[Calculation] = []
-            for _, row in df.iterrows():
-                c = Calculation.from_dict(
-                    {
-                        "id": row.get("id"),
-                        "operation": row["operation"],
-                        "a": float(row["a"]),
-                        "b": float(row["b"]),
-                        "result": float(row["result"]),
-                        "timestamp": row.get("timestamp"),
-                    }
-                ).with_timestamp()
-                items.append(c)
-
+            store = open_store(file, cfg.history_backend, cfg.default_encoding, cfg.history_retention_days)
+            try:
+                if since is None and until is None:
+                    items = store.load(limit)
+                else:
+                    items = store.query(since=since, until=until, limit=limit)
+            finally:
+                store.close()
+        except Exception:
+            # Any parse or IO problem should not crash the app during load
+            return 0
+        with self._lock:
             if clear_existing:
                 self.clear()
+                self._cleared = None  # the store is the source here, not a clear to save
             # Use existing add() so max-size logic stays consistent
             for c in items:
                 self.add(c)
-            return len(items)
-        except Exception:
-            # Any parse or IO problem should not crash the app during load
-            return 0
\ No newline at end of file
+        return len(items)
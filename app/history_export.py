@@ -0,0 +1,151 @@
+# app/history_export.py
+from __future__ import annotations
+import csv
+import gzip
+import json
+import lzma
+import os
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+from .atomic_io import atomic_write
+from .calculation import Calculation
+from .exceptions import OperationError
+
+__all__ = [
+    "COLUMNS", "FORMATS", "COMPRESSIONS",
+    "csv_rows", "jsonl_lines", "open_text", "resolve_format", "write_records", "export_history",
+    "read_records",
+]
+
+COLUMNS = ("id", "operation", "a", "b", "result", "timestamp")
+FORMATS = ("csv", "jsonl")
+COMPRESSIONS = ("none", "gzip", "lzma")
+
+_SUFFIX_COMPRESSION = {".gz": "gzip", ".xz": "lzma", ".lzma": "lzma"}
+_SUFFIX_FORMAT = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def _cell(value: Any) -> Any:
+    """Render a numeric cell the way pandas' to_csv does for our columns."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if value != value else repr(value)  # NaN -> empty field
+    if isinstance(value, int) and not isinstance(value, bool):
+        # a/b/result mix ints and floats, so pandas stores them as float64
+        return repr(float(value))
+    return str(value)
+
+
+def csv_rows(calcs: Iterable[Calculation]) -> Iterator[tuple]:
+    """Yield one CSV row per record, columns in COLUMNS order."""
+    for c in calcs:
+        c = c.with_timestamp()
+        yield (c.uid, c.operation, _cell(c.a), _cell(c.b), _cell(c.result), c.timestamp)
+
+
+def jsonl_lines(calcs: Iterable[Calculation]) -> Iterator[str]:
+    """Yield one JSON object per record (same keys as the CSV header)."""
+    for c in calcs:
+        yield json.dumps(c.to_dict(), default=str) + "\n"
+
+
+def resolve_format(path: Path, fmt: str | None, compression: str | None) -> tuple[str, str]:
+    """(format, compression) for `path`: given values win, else its suffixes decide."""
+    suffixes = [s.lower() for s in path.suffixes]
+    if compression is None:
+        compression = _SUFFIX_COMPRESSION.get(suffixes[-1], "none") if suffixes else "none"
+    if fmt is None:
+        plain = [s for s in suffixes if s not in _SUFFIX_COMPRESSION]
+        fmt = _SUFFIX_FORMAT.get(plain[-1], "csv") if plain else "csv"
+    if fmt not in FORMATS:
+        raise OperationError(f"Unknown export format: {fmt} (expected one of {', '.join(FORMATS)})")
+    if compression not in COMPRESSIONS:
+        raise OperationError(
+            f"Unknown compression: {compression} (expected one of {', '.join(COMPRESSIONS)})"
+        )
+    return fmt, compression
+
+
+def open_text(path: Path, mode: str, compression: str, encoding: str) -> IO[str]:
+    """Open a (possibly compressed) text file; newline='' lets csv control line endings."""
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding=encoding, newline="")
+    if compression == "lzma":
+        return lzma.open(path, mode + "t", encoding=encoding, newline="")
+    return open(path, mode, encoding=encoding, newline="")
+
+
+def write_records(out: IO[str], calcs: Iterable[Calculation], fmt: str = "csv",
+                  chunk_size: int = 1024) -> int:
+    """Stream records to an open text file in chunks; returns the record count."""
+    it = iter(calcs)
+    n = 0
+    if fmt == "csv":
+        # pandas' to_csv defaults: minimal quoting, os.linesep line endings
+        writer = csv.writer(out, lineterminator=os.linesep)
+        writer.writerow(COLUMNS)
+        rows = csv_rows(it)
+        while chunk := list(islice(rows, chunk_size)):
+            writer.writerows(chunk)
+            n += len(chunk)
+    else:
+        lines = jsonl_lines(it)
+        while chunk := list(islice(lines, chunk_size)):
+            out.write("".join(chunk))
+            n += len(chunk)
+    return n
+
+
+def export_history(
+    calcs: Iterable[Calculation],
+    path: Path,
+    fmt: str | None = None,
+    compression: str | None = None,
+    encoding: str = "utf-8",
+    chunk_size: int = 1024,
+) -> int:
+    """
+    Stream `calcs` to `path` as CSV or JSON Lines without building a DataFrame.
+    Format and compression default to what the file suffix says
+    (e.g. history.jsonl.gz). The file is replaced atomically.
+    Returns the number of records written.
+    """
+    path = Path(path)
+    fmt, compression = resolve_format(path, fmt, compression)
+    try:
+        with atomic_write(path, encoding=encoding, compression=compression) as out:
+            return write_records(out, calcs, fmt, chunk_size)
+    except OperationError:
+        raise
+    except Exception as exc:
+        raise OperationError(f"Failed to export history to {path}: {exc}") from exc
+
+
+def read_records(path: Path, fmt: str | None = None, compression: str | None = None,
+                 encoding: str = "utf-8") -> Iterator[tuple]:
+    """
+    Stream raw rows (COLUMNS order, values as stored) from a CSV or JSON Lines
+    history, compressed or not, without loading the file. Rows with missing
+    columns are skipped.
+    """
+    path = Path(path)
+    fmt, compression = resolve_format(path, fmt, compression)
+    with open_text(path, "r", compression, encoding) as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    d = json.loads(line)
+                    yield tuple(d.get(k) for k in COLUMNS)
+            return
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or not set(COLUMNS).issubset(header):
+            return
+        idx = [header.index(k) for k in COLUMNS]
+        width = len(header)
+        for row in reader:
+            if len(row) == width:
+                yield tuple(row[i] for i in idx)
@@ -0,0 +1,206 @@
+# app/history_merge.py
+"""
+Merge history files from many hosts into one time-ordered history.
+
+    python -m app.history_merge host1.csv host2.jsonl.gz host3.db -o merged.csv
+
+Every input must already be in timestamp order (as the app writes them).
+The files are k-way merged through a heap, one row per file in memory at a
+time, and the output is written as rows arrive. A record present in several
+files (same id) is written once. Ids already written are looked up in a
+temporary on-disk SQLite index, so copies with different timestamps are
+caught too, without holding every id in memory. The same id with a different
+operation, operands or result is reported as a conflict. The earliest copy
+wins (the first file listed, when timestamps tie), and the tool exits 1.
+"""
+from __future__ import annotations
+import argparse
+import heapq
+import math
+import sqlite3
+import sys
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Iterator, List, Sequence, Tuple
+
+from .atomic_io import atomic_write
+from .calculation import Calculation
+from .calculator_config import load_config
+from .exceptions import OperationError
+from .history_export import COLUMNS, resolve_format, write_records
+from .history_store import backend_for
+from .verify import iter_history_rows
+
+__all__ = ["Conflict", "MergeReport", "merge_rows", "merge_histories", "format_report", "main"]
+
+_MAX_SAMPLES = 10
+_ID, _TIMESTAMP = COLUMNS.index("id"), COLUMNS.index("timestamp")
+_NUMBERS = ("a", "b", "result")
+
+
+@dataclass(frozen=True)
+class Conflict:
+    uid: str
+    kept: Calculation
+    dropped: Calculation
+    source: str  # the file the dropped record came from
+
+    def __str__(self) -> str:
+        k, d = self.kept, self.dropped
+        return (f"{self.uid}: kept {k.operation}({k.a}, {k.b}) = {k.result}, "
+                f"{self.source} has {d.operation}({d.a}, {d.b}) = {d.result}")
+
+
+@dataclass
+class MergeReport:
+    read: int = 0
+    written: int = 0
+    duplicates: int = 0    # identical copies dropped
+    conflicts: int = 0     # same id, different record: dropped and reported
+    skipped: int = 0       # rows without an id or a readable timestamp
+    out_of_order: int = 0  # rows older than the row before them in the same file
+    samples: List[Conflict] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.conflicts == 0
+
+    def summary(self) -> str:
+        text = f"merged {self.read} row(s) into {self.written}: {self.duplicates} duplicate(s), {self.conflicts} conflict(s)"
+        if self.skipped:
+            text += f", {self.skipped} unreadable row(s) skipped"
+        if self.out_of_order:
+            text += f", {self.out_of_order} row(s) out of timestamp order"
+        return text
+
+
+@lru_cache(maxsize=4096)  # rows are second-resolution: neighbours share timestamps
+def _instant(timestamp: str) -> float:
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.timestamp()
+
+
+def _stream(path: Path, encoding: str, report: MergeReport) -> Iterator[Tuple[float, str, Calculation]]:
+    source, last = str(path), -math.inf
+    for row in iter_history_rows(path, encoding):
+        report.read += 1
+        try:
+            if not row[_ID] or not row[_TIMESTAMP]:
+                raise ValueError("missing id or timestamp")
+            record = dict(zip(COLUMNS, row))
+            for k in _NUMBERS:
+                if record[k] is None or record[k] == "":
+                    record[k] = math.nan  # how CSV and SQLite store a NaN
+            c = Calculation.from_dict(record)
+            key = _instant(str(row[_TIMESTAMP]))
+        except (ValueError, ZeroDivisionError, TypeError):
+            report.skipped += 1
+            continue
+        if key < last:
+            report.out_of_order += 1
+        last = max(last, key)
+        yield key, source, c
+
+
+def _same(x: Any, y: Any) -> bool:
+    return x == y or (x != x and y != y)  # NaN results match each other
+
+
+def merge_rows(paths: Sequence[Path], encoding: str = "utf-8",
+               report: MergeReport | None = None) -> Iterator[Calculation]:
+    """The merged, deduplicated records, oldest first; counts go to `report`."""
+    report = report if report is not None else MergeReport()
+    paths = [Path(p) for p in paths]
+    for path in paths:
+        if not path.exists():
+            raise OperationError(f"No history file at {path}")
+    return _merge(paths, encoding, report)
+
+
+def _merge(paths: List[Path], encoding: str, report: MergeReport) -> Iterator[Calculation]:
+    streams = [_stream(path, encoding, report) for path in paths]
+    # "" opens a private temporary database: SQLite spills it to disk, not RAM
+    index = sqlite3.connect("")
+    try:
+        # numbers are kept as text, the way the files store them: exact-mode
+        # Fractions ("1/3") cannot be bound as SQLite values, and NaN would be NULL
+        index.execute("CREATE TABLE seen (id TEXT PRIMARY KEY, operation TEXT, a TEXT, b TEXT,"
+                      " result TEXT, timestamp TEXT) WITHOUT ROWID")
+        # heapq.merge is stable: equal timestamps keep file order, then row order
+        for _, source, c in heapq.merge(*streams, key=itemgetter(0)):
+            if index.execute("INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?, ?)",
+                             (c.uid, c.operation, str(c.a), str(c.b), str(c.result), c.timestamp)).rowcount:
+                report.written += 1
+                yield c
+                continue
+            row = index.execute("SELECT * FROM seen WHERE id = ?", (c.uid,)).fetchone()
+            first = Calculation.from_dict(dict(zip(COLUMNS, row)))
+            if all(_same(x, y) for x, y in zip((first.operation, first.a, first.b, first.result),
+                                               (c.operation, c.a, c.b, c.result))):
+                report.duplicates += 1
+            else:
+                report.conflicts += 1
+                if len(report.samples) < _MAX_SAMPLES:
+                    report.samples.append(Conflict(c.uid, first, c, source))
+    finally:
+        index.close()
+
+
+def merge_histories(paths: Sequence[Path], out: Path, fmt: str | None = None,
+                    compression: str | None = None, encoding: str = "utf-8") -> MergeReport:
+    """
+    Merge `paths` into `out` (CSV or JSON Lines, optionally compressed, picked
+    by suffix like export). The output replaces `out` atomically.
+    """
+    out = Path(out)
+    if backend_for(out) == "sqlite":
+        raise OperationError("merge writes CSV or JSON Lines; import the result to get SQLite")
+    fmt, compression = resolve_format(out, fmt, compression)
+    report = MergeReport()
+    rows = merge_rows(paths, encoding, report)
+    try:
+        with atomic_write(out, encoding=encoding, compression=compression) as f:
+            write_records(f, rows, fmt)
+    except OperationError:
+        raise
+    except Exception as exc:
+        raise OperationError(f"Failed to merge into {out}: {exc}") from exc
+    return report
+
+
+def format_report(report: MergeReport) -> str:
+    lines = [report.summary()]
+    lines += [f"  conflict {c}" for c in report.samples]
+    if report.conflicts > len(report.samples):
+        lines.append(f"  ... and {report.conflicts - len(report.samples)} more")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="history_merge", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", type=Path, help="history files (CSV, JSON Lines or SQLite)")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="merged history (.csv or .jsonl, optionally .gz/.xz)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    parser.add_argument("--compress", choices=("none", "gzip", "lzma"), default=None)
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ns = parse_args(sys.argv[1:] if argv is None else argv)
+    cfg = load_config()
+    try:
+        report = merge_histories(ns.paths, ns.output, ns.format, ns.compress, cfg.default_encoding)
+    except OperationError as exc:
+        sys.stderr.write(f"error: {exc}\n")
+        return 2
+    print(format_report(report))
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
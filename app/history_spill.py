@@ -0,0 +1,121 @@
+# app/history_spill.py
+from __future__ import annotations
+import pickle
+import shutil
+import sys
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+from .calculation import Calculation
+
+__all__ = ["Segment", "SpillSegments", "entry_bytes", "iter_segments", "slice_segments"]
+
+# uid/timestamp strings are rendered lazily but every save renders them
+_RENDERED_BYTES = sys.getsizeof("0" * 36) + sys.getsizeof("0" * 25)
+_LIST_SLOT = 8
+
+
+def entry_bytes(c: Calculation) -> int:
+    """Approximate memory held by one history entry."""
+    return (sys.getsizeof(c) + sys.getsizeof(c.a) + sys.getsizeof(c.b)
+            + sys.getsizeof(c.result) + _RENDERED_BYTES + _LIST_SLOT)
+
+
+def _remove(path: Path) -> None:
+    path.unlink(missing_ok=True)
+
+
+class _Directory:
+    """A private temp directory, removed once no stack or segment refers to it."""
+    def __init__(self, parent: Path) -> None:
+        parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix="spill-", dir=parent))
+        weakref.finalize(self, shutil.rmtree, self.path, True)
+
+
+class Segment:
+    """
+    One pickled run of entries. The file is deleted once nothing refers to
+    the segment, so a History snapshot can still read a segment that undo
+    has paged back in (or clear() dropped) after the snapshot was taken.
+    """
+    __slots__ = ("path", "count", "_dir", "__weakref__")
+
+    def __init__(self, directory: _Directory, path: Path, count: int) -> None:
+        self.path, self.count, self._dir = path, count, directory
+        weakref.finalize(self, _remove, path)
+
+    def read(self) -> List[Calculation]:
+        with open(self.path, "rb") as f:
+            return pickle.load(f)
+
+
+def iter_segments(segments: Sequence[Segment]) -> Iterator[Calculation]:
+    for seg in segments:
+        yield from seg.read()
+
+
+def slice_segments(segments: Sequence[Segment], start: int, stop: int) -> Iterator[Calculation]:
+    """Entries [start:stop] (oldest = 0), reading only the segments that overlap."""
+    base = 0
+    for seg in segments:
+        if base >= stop:
+            break
+        if base + seg.count > start:
+            yield from seg.read()[max(0, start - base): stop - base]
+        base += seg.count
+
+
+class SpillSegments:
+    """
+    The cold, oldest part of a History, kept on disk as a stack of pickled
+    segments (oldest first). Only segment sizes stay in memory; reads load one
+    segment at a time. The directory is private to this instance and removed
+    once it is cleared (or garbage collected) and no snapshot still holds
+    one of its segments.
+    """
+    def __init__(self, parent: Path) -> None:
+        self._parent = Path(parent)
+        self._dir: _Directory | None = None
+        self._segments: List[Segment] = []
+        self._next = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, calcs: List[Calculation]) -> None:
+        """Write `calcs` (older than everything in memory) as the newest segment."""
+        if not calcs:
+            return
+        if self._dir is None:
+            self._dir = _Directory(self._parent)
+        path = self._dir.path / f"seg-{self._next:06d}.pkl"
+        self._next += 1
+        with open(path, "wb") as f:
+            pickle.dump(calcs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._segments.append(Segment(self._dir, path, len(calcs)))
+        self.count += len(calcs)
+
+    def pop(self) -> List[Calculation]:
+        """Page the newest segment back in and forget it."""
+        seg = self._segments.pop()
+        self.count -= seg.count
+        return seg.read()
+
+    def snapshot(self) -> Tuple[Segment, ...]:
+        """The current segments, oldest first; they stay readable while referenced."""
+        return tuple(self._segments)
+
+    def __iter__(self) -> Iterator[Calculation]:
+        return iter_segments(self.snapshot())
+
+    def slice(self, start: int, stop: int) -> Iterator[Calculation]:
+        return slice_segments(self.snapshot(), start, stop)
+
+    def clear(self) -> None:
+        self._segments.clear()
+        self.count = 0
+        self._dir = None
@@ -0,0 +1,576 @@
+# app/history_store.py
+from __future__ import annotations
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Protocol, Sequence, Set, Tuple
+
+import pandas as pd
+
+from .atomic_io import atomic_write
+from .calculation import Calculation
+from .exceptions import OperationError
+from .history_export import COLUMNS, read_records, write_records
+from .shared_history import SharedHistoryFile
+
+__all__ = [
+    "BACKENDS", "HistoryStore", "CsvHistoryStore", "SqliteHistoryStore",
+    "Partition", "PartitionedHistoryStore", "backend_for", "open_store",
+]
+
+BACKENDS = ("csv", "sqlite", "partitioned")
+_SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+_PARTITIONED_SUFFIX = ".parts"
+
+
+class HistoryStore(Protocol):
+    """Where History.save/load keep records; one instance per history file."""
+    path: Path
+
+    def save(self, calcs: Iterable[Calculation]) -> int:
+        """
+        Make the store hold exactly `calcs` (the partitioned store merges
+        instead, see there); returns how many records were written.
+        """
+        ...
+
+    def load(self, limit: int | None = None) -> List[Calculation]:
+        """All records in order, or only the last `limit` of them."""
+        ...
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        """Records filtered by operation and ISO timestamp range (last `limit` matches)."""
+        ...
+
+    def append(self, calcs: Iterable[Calculation]) -> Tuple[List[Calculation], int]:
+        """Shared mode: merge-on-write, returns (foreign records, number appended)."""
+        ...
+
+    def read_new(self) -> List[Calculation]:
+        """Shared mode: records other processes added since the last read/append."""
+        ...
+
+    def close(self) -> None:
+        """Release what the store holds open (the SQLite connection); safe to call twice."""
+        ...
+
+
+def _matches(c: Calculation, operation: str | None, since: str | None, until: str | None) -> bool:
+    if operation is not None and c.operation != operation:
+        return False
+    ts = c.timestamp or ""
+    return (since is None or ts >= since) and (until is None or ts <= until)
+
+
+class CsvHistoryStore:
+    """
+    The original CSV file: save() rewrites it atomically, load() parses it with
+    pandas. In shared mode appends go through SharedHistoryFile instead.
+    """
+    def __init__(self, path: Path, encoding: str = "utf-8") -> None:
+        self.path = Path(path)
+        self.encoding = encoding
+        self._shared: SharedHistoryFile | None = None
+
+    def save(self, calcs: Iterable[Calculation]) -> int:
+        with atomic_write(self.path, encoding=self.encoding) as f:
+            return write_records(f, calcs, "csv")
+
+    def load(self, limit: int | None = None) -> List[Calculation]:
+        if not self.path.exists():
+            return []
+        df = pd.read_csv(self.path)
+        if not set(COLUMNS).issubset(set(df.columns)):
+            # Malformed CSV; ignore but do not crash
+            return []
+        # a shared file may hold a record twice (appended again after a redo)
+        df = df[~(df["id"].duplicated() & df["id"].notna())]
+        if limit is not None:
+            df = df.tail(max(0, limit))
+        items: list[Calculation] = []
+        for _, row in df.iterrows():
+            c = Calculation.from_dict(
+                {
+                    "id": row.get("id"),
+                    "operation": row["operation"],
+                    "a": row["a"],
+                    "b": row["b"],
+                    "result": row["result"],
+                    "timestamp": row.get("timestamp"),
+                }
+            ).with_timestamp()
+            items.append(c)
+        return items
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        # a flat file has no index: scan it
+        hits = [c for c in self.load() if _matches(c, operation, since, until)]
+        return hits[-limit:] if limit else hits
+
+    def _shared_file(self) -> SharedHistoryFile:
+        if self._shared is None:
+            self._shared = SharedHistoryFile(self.path, self.encoding)
+        return self._shared
+
+    def append(self, calcs: Iterable[Calculation]) -> Tuple[List[Calculation], int]:
+        return self._shared_file().append(calcs)
+
+    def read_new(self) -> List[Calculation]:
+        return self._shared_file().read_new()
+
+    def close(self) -> None:
+        pass  # every read and write opens and closes the file itself
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    pos       INTEGER PRIMARY KEY AUTOINCREMENT,
+    id        TEXT NOT NULL UNIQUE,
+    operation TEXT NOT NULL,
+    a         REAL,
+    b         REAL,
+    result    REAL,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_history_operation ON history(operation);
+CREATE INDEX IF NOT EXISTS ix_history_timestamp ON history(timestamp);
+CREATE INDEX IF NOT EXISTS ix_history_result ON history(result);
+"""
+
+
+def _sql_number(value: Any) -> Any:
+    # REAL columns keep floats/ints natively; Fraction/Decimal round-trip as text
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return str(value)
+
+
+def _row(c: Calculation) -> tuple:
+    c = c.with_timestamp()
+    return (c.uid, c.operation, _sql_number(c.a), _sql_number(c.b), _sql_number(c.result), c.timestamp)
+
+
+def _calc(row: Sequence[Any]) -> Calculation:
+    d = dict(zip(COLUMNS, row))
+    for key in ("a", "b", "result"):
+        if d[key] is None:
+            d[key] = float("nan")  # SQLite stores NaN as NULL
+    return Calculation.from_dict(d).with_timestamp()
+
+
+class SqliteHistoryStore:
+    """
+    History in a SQLite database (WAL journal, indexed on operation, timestamp
+    and result). save() is incremental: it streams the records alongside the
+    table and, in one transaction, deletes the rows that were undone or
+    trimmed and inserts only the new ones. load(limit) and query()
+    read just the rows asked for.
+
+    Shared mode needs no extra lock file: append() is INSERT OR IGNORE by id
+    and read_new() picks up rows past the last seen rowid. Only the ids of
+    the history last appended are remembered, to skip re-inserting them.
+    """
+    def __init__(self, path: Path, encoding: str = "utf-8") -> None:
+        self.path = Path(path)
+        self.encoding = encoding  # unused; SQLite stores text as UTF-8
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()  # autosave may write from the group-commit thread
+        self._last_pos = 0
+        self._seen: set[str] = set()
+
+    # ---------- connection ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- writing ----------
+    def save(self, calcs: Iterable[Calculation]) -> int:
+        # History appends, pops (undo) and trims from the front (max size): line the
+        # records up against the table, both streamed in order, and rewrite only the
+        # tail past the first disagreement. Neither side is held in memory whole.
+        records = (c.with_timestamp() for c in calcs)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = next(records, None)
+                found = None if first is None else conn.execute(
+                    "SELECT pos FROM history WHERE id = ?", (first.uid or "",)).fetchone()
+                if found is None:
+                    conn.execute("DELETE FROM history")
+                    pending: Iterator[Calculation] = iter(()) if first is None else chain([first], records)
+                else:
+                    conn.execute("DELETE FROM history WHERE pos < ?", (found[0],))
+                    stop, pending = self._line_up(conn, found[0], chain([first], records))
+                    if stop is not None:
+                        conn.execute("DELETE FROM history WHERE pos >= ?", (stop,))
+                written = 0
+
+                def rows() -> Iterator[tuple]:
+                    nonlocal written
+                    for c in pending:
+                        written += 1
+                        yield _row(c)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO history (id, operation, a, b, result, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows(),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return written
+
+    @staticmethod
+    def _line_up(conn: sqlite3.Connection, start: int,
+                 records: Iterator[Calculation]) -> Tuple[int | None, Iterator[Calculation]]:
+        """
+        Walk the table from `start` alongside `records` while the ids agree.
+        Returns the first pos that disagrees (None if the table ran out first)
+        and the records still to insert.
+        """
+        cur = conn.execute("SELECT pos, id FROM history WHERE pos >= ? ORDER BY pos", (start,))
+        try:
+            for pos, uid in cur:
+                c = next(records, None)
+                if c is None:
+                    return pos, iter(())
+                if (c.uid or "") != uid:
+                    return pos, chain([c], records)
+            return None, records
+        finally:
+            cur.close()
+
+    def append(self, calcs: Iterable[Calculation]) -> Tuple[List[Calculation], int]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                foreign = self._read_tail(conn)
+                held = {c.uid for c in foreign}
+                fresh: List[Calculation] = []
+                for c in calcs:
+                    c = c.with_timestamp()
+                    held.add(c.uid)  # type: ignore[arg-type]
+                    if c.uid not in self._seen:
+                        fresh.append(c)
+                # the primary key drops ids the table has: count only real inserts
+                added = conn.executemany(
+                    "INSERT OR IGNORE INTO history (id, operation, a, b, result, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (_row(c) for c in fresh),
+                ).rowcount
+                last = conn.execute("SELECT COALESCE(MAX(pos), 0) FROM history").fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._last_pos = last  # we hold the write lock, so nothing else landed in between
+            # only what the history still holds: it never offers trimmed ids again
+            self._seen = held
+            return foreign, max(0, added)
+
+    # ---------- reading ----------
+    def _read_tail(self, conn: sqlite3.Connection) -> List[Calculation]:
+        fresh: List[Calculation] = []
+        for row in conn.execute(
+            "SELECT pos, id, operation, a, b, result, timestamp FROM history WHERE pos > ? ORDER BY pos",
+            (self._last_pos,),
+        ):
+            # rows past the last pos are new to the table (ids are unique), never our own
+            self._last_pos = row[0]
+            fresh.append(_calc(row[1:]))
+        return fresh
+
+    def read_new(self) -> List[Calculation]:
+        with self._lock:
+            return self._read_tail(self._connect())
+
+    def load(self, limit: int | None = None) -> List[Calculation]:
+        if not self.path.exists():
+            return []
+        return self.query(limit=limit)
+
+    def iter_rows(self, chunk_size: int = 4096) -> Iterator[tuple]:
+        """Stream raw rows (COLUMNS order) oldest first, `chunk_size` at a time."""
+        # a private connection: the caller may write through this store meanwhile
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            cur = conn.execute("SELECT id, operation, a, b, result, timestamp FROM history ORDER BY pos")
+            while rows := cur.fetchmany(chunk_size):
+                yield from rows
+        finally:
+            conn.close()
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        where, params = [], []
+        if operation is not None:
+            where.append("operation = ?")
+            params.append(operation)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(until)
+        sql = "SELECT id, operation, a, b, result, timestamp FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY pos DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(max(0, limit))
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [_calc(r) for r in reversed(rows)]
+
+
+_DAY = re.compile(r"\d{4}-\d{2}-\d{2}")
+_UNDATED = "undated"
+
+
+def _day(c: Calculation) -> str:
+    day = (c.timestamp or "")[:10]
+    return day if _DAY.fullmatch(day) else _UNDATED
+
+
+@dataclass(frozen=True)
+class Partition:
+    """The manifest of one day of history."""
+    day: str
+    count: int
+    min_ts: str
+    max_ts: str
+    ops: Dict[str, int]
+    digest: int  # crc32 of the ids in order: tells save() whether the day changed
+
+    @classmethod
+    def of(cls, day: str, calcs: Sequence[Calculation]) -> "Partition":
+        ops: Dict[str, int] = {}
+        digest = 0
+        for c in calcs:
+            ops[c.operation] = ops.get(c.operation, 0) + 1
+            digest = zlib.crc32(f"{c.uid}\n".encode(), digest)
+        stamps = [c.timestamp or "" for c in calcs]
+        return cls(day, len(calcs), min(stamps, default=""), max(stamps, default=""), ops, digest)
+
+    def overlaps(self, operation: str | None, since: str | None, until: str | None) -> bool:
+        return ((operation is None or operation in self.ops)
+                and (since is None or self.max_ts >= since)
+                and (until is None or self.min_ts <= until))
+
+
+class PartitionedHistoryStore:
+    """
+    History split by UTC day under a directory: <day>.csv holds the records
+    and <day>.json a small manifest (count, min/max timestamp, per-operation
+    counts, a digest of the ids). save() merges into the days it is given
+    and rewrites only those whose records changed, so saving a history
+    loaded for a few days leaves every other day alone. load(limit) reads
+    only the newest days it needs, and query() skips every day its manifest
+    rules out. With `retention_days`, save() deletes whole days older than
+    that instead of rewriting them.
+    Records come back in day order. Shared mode is not supported.
+    """
+    def __init__(self, path: Path, encoding: str = "utf-8", retention_days: int = 0) -> None:
+        self.path = Path(path)
+        self.encoding = encoding
+        self.retention_days = max(0, retention_days)
+        self._lock = threading.Lock()  # autosave may write from the group-commit thread
+
+    def _file(self, day: str) -> Path:
+        return self.path / f"{day}.csv"
+
+    def _manifest(self, day: str) -> Path:
+        return self.path / f"{day}.json"
+
+    # ---------- manifests ----------
+    def partitions(self) -> List[Partition]:
+        """Every day's manifest, oldest first (rebuilt for a day whose manifest is lost)."""
+        if not self.path.is_dir():
+            return []
+        parts = []
+        for file in sorted(self.path.glob("*.csv")):
+            try:
+                parts.append(Partition(**json.loads(self._manifest(file.stem).read_text(encoding="utf-8"))))
+            except (OSError, ValueError, TypeError):
+                parts.append(self._write_manifest(Partition.of(file.stem, self._read(file.stem))))
+        return parts
+
+    def _write_manifest(self, part: Partition) -> Partition:
+        with atomic_write(self._manifest(part.day)) as f:
+            json.dump(asdict(part), f)
+        return part
+
+    def _read(self, day: str) -> List[Calculation]:
+        return CsvHistoryStore(self._file(day), self.encoding).load()
+
+    def cutoff(self) -> str | None:
+        """Days before this one fall outside the retention window."""
+        if not self.retention_days:
+            return None
+        return (datetime.now(UTC).date() - timedelta(days=self.retention_days)).isoformat()
+
+    def drop_before(self, day: str) -> int:
+        """Delete every partition older than `day` (YYYY-MM-DD); returns how many."""
+        with self._lock:
+            old = [p.day for p in self.partitions() if _DAY.fullmatch(p.day) and p.day < day]
+            for d in old:
+                self._drop(d)
+            return len(old)
+
+    def _drop(self, day: str) -> None:
+        # data first: a manifest without its file is ignored, a file without one is rebuilt
+        self._file(day).unlink(missing_ok=True)
+        self._manifest(day).unlink(missing_ok=True)
+
+    # ---------- writing ----------
+    def save(self, calcs: Iterable[Calculation]) -> int:
+        """
+        Merge `calcs` into their days. A day is rewritten only when its records
+        changed, and keeps the records `calcs` does not hold (never loaded, or
+        trimmed from memory) unless undo took them out (a HistorySnapshot's
+        `removed`). Days without any of `calcs` are left alone: only the
+        retention window and drop_before() delete days, and a snapshot taken
+        after History.clear() (`cleared`), which holds the whole history, so
+        every day is cut down to it.
+        """
+        days: Dict[str, List[Calculation]] = {}
+        for c in calcs:
+            c = c.with_timestamp()
+            days.setdefault(_day(c), []).append(c)
+        removed: Dict[str, Set[str]] = {}
+        for c in getattr(calcs, "removed", ()):
+            removed.setdefault(_day(c.with_timestamp()), set()).add(c.uid)
+        cleared = getattr(calcs, "cleared", False)
+        cutoff = self.cutoff()
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            existing = {p.day: p for p in self.partitions()}
+            written = 0
+            for day in sorted(days.keys() | removed.keys() | (existing.keys() if cleared else set())):
+                if cutoff and _DAY.fullmatch(day) and day < cutoff:
+                    continue
+                items, old = days.get(day, []), existing.get(day)
+                if old is None and not items:
+                    continue
+                part = Partition.of(day, items)
+                if old is not None:
+                    if (old.count, old.digest) == (part.count, part.digest):
+                        continue  # the day as it was loaded
+                    merged = items if cleared else self._merged(day, items, removed.get(day, set()))
+                    if not merged:
+                        self._drop(day)
+                        continue
+                    if merged is not items:
+                        items, part = merged, Partition.of(day, merged)
+                        if (old.count, old.digest) == (part.count, part.digest):
+                            continue  # `calcs` held only part of an unchanged day
+                with atomic_write(self._file(day), encoding=self.encoding) as f:
+                    written += write_records(f, items, "csv")
+                self._write_manifest(part)
+            for day in existing:
+                if cutoff and _DAY.fullmatch(day) and day < cutoff:
+                    self._drop(day)
+            return written
+
+    def _merged(self, day: str, items: List[Calculation], gone: Set[str]) -> List[Calculation]:
+        """The day's stored records not in `items` or `gone`, merged into `items` by timestamp."""
+        held = {c.uid for c in items}
+        kept = [c for c in self._read(day) if c.uid not in held and c.uid not in gone]
+        if not kept:
+            return items
+        return sorted(kept + items, key=lambda c: c.timestamp or "")
+
+    def append(self, calcs: Iterable[Calculation]) -> Tuple[List[Calculation], int]:
+        raise OperationError("A partitioned history cannot be shared; use the csv or sqlite backend")
+
+    def read_new(self) -> List[Calculation]:
+        raise OperationError("A partitioned history cannot be shared; use the csv or sqlite backend")
+
+    def close(self) -> None:
+        pass  # every read and write opens and closes its day file itself
+
+    # ---------- reading ----------
+    def load(self, limit: int | None = None) -> List[Calculation]:
+        parts = self.partitions()
+        if limit is not None:
+            # only the newest days that hold the last `limit` records
+            need, first = max(0, limit), len(parts)
+            while first > 0 and need > 0:
+                first -= 1
+                need -= parts[first].count
+            parts = parts[first:]
+        items = [c for p in parts for c in self._read(p.day)]
+        if limit is not None:
+            items = items[max(0, len(items) - limit):]
+        return items
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Stream raw rows (COLUMNS order), one day at a time."""
+        for p in self.partitions():
+            yield from read_records(self._file(p.day), "csv", "none", self.encoding)
+
+    def query(self, operation: str | None = None, since: str | None = None,
+              until: str | None = None, limit: int | None = None) -> List[Calculation]:
+        chunks: List[List[Calculation]] = []
+        found = 0
+        for p in reversed(self.partitions()):
+            if limit and found >= limit:
+                break
+            if not p.overlaps(operation, since, until):
+                continue
+            hits = [c for c in self._read(p.day) if _matches(c, operation, since, until)]
+            chunks.append(hits)
+            found += len(hits)
+        out = [c for hits in reversed(chunks) for c in hits]
+        return out[-limit:] if limit else out
+
+
+def backend_for(path: Path, default: str = "csv") -> str:
+    """The backend a history file uses: its suffix if it names one, otherwise `default`."""
+    suffix = Path(path).suffix.lower()
+    if suffix in _SQLITE_SUFFIXES:
+        return "sqlite"
+    if suffix == _PARTITIONED_SUFFIX:
+        return "partitioned"
+    return "csv" if suffix == ".csv" else default
+
+
+def open_store(path: Path, backend: str | None = None, encoding: str = "utf-8",
+               retention_days: int = 0) -> HistoryStore:
+    """
+    Build the store for `path`; `backend` defaults to what the suffix suggests.
+    `retention_days` only applies to the partitioned backend.
+    """
+    backend = backend_for(path, backend or "csv")
+    if backend == "sqlite":
+        return SqliteHistoryStore(path, encoding)
+    if backend == "partitioned":
+        return PartitionedHistoryStore(path, encoding, retention_days)
+    if backend == "csv":
+        return CsvHistoryStore(path, encoding)
+    raise OperationError(f"Unknown history backend: {backend} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,144 @@
+# app/macros.py
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from app.atomic_io import atomic_write
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.command_pattern import MathCommand
+from app.exceptions import OperationError
+from app.pipeline import Param, Ref, parse_chain, resolve_operand
+
+__all__ = ["Macro", "MacroBook", "Recording", "compile_macro"]
+
+
+@dataclass(frozen=True)
+class Macro:
+    """
+    A recorded sequence of operation lines, compiled once into MathCommands
+    whose operands are pre-parsed numbers, `_`/`$n` Refs or `%n` Params.
+    `_` refers to the previous step, across line boundaries.
+    """
+    name: str
+    lines: Tuple[str, ...]
+    steps: Tuple[MathCommand, ...]
+    arity: int  # highest %n used
+
+    def play(self, calc: Calculator, args: Sequence[Any]) -> Iterator[Calculation]:
+        """Run the steps with %n bound to args (already parsed numbers)."""
+        if len(args) != self.arity:
+            raise OperationError(f"{self.name} takes {self.arity} argument(s), got {len(args)}")
+        previous: Calculation | None = None
+        execute = calc.execute
+        for step in self.steps:
+            a, b = step.a, step.b
+            if a.__class__ is Param:
+                a = args[a.index - 1]
+            elif a.__class__ is Ref:
+                a = resolve_operand(a, calc, previous)
+            if b.__class__ is Param:
+                b = args[b.index - 1]
+            elif b.__class__ is Ref:
+                b = resolve_operand(b, calc, previous)
+            previous = execute(step.op_name, a, b)
+            yield previous
+
+
+def compile_macro(name: str, lines: Sequence[str], calc: Calculator) -> Macro:
+    """Parse and validate every line once; raises OperationError for the first bad one."""
+    steps: List[MathCommand] = []
+    arity = 0
+    for line in lines:
+        for stage in parse_chain(line, calc, params=True):
+            for operand in (stage.a, stage.b):
+                if isinstance(operand, Param):
+                    arity = max(arity, operand.index)
+            steps.append(MathCommand(stage.op_name, stage.a, stage.b))
+    return Macro(name, tuple(lines), tuple(steps), arity)
+
+
+@dataclass
+class MacroBook:
+    """
+    Named macros of one history directory, persisted as source lines in
+    macros.json next to the history file and compiled on first use per
+    session (so a change in numeric mode or operations is picked up).
+    """
+    path: Path
+    encoding: str = "utf-8"
+    _sources: Dict[str, Tuple[str, ...]] | None = None
+    _compiled: Dict[Tuple[str, int], Macro] = field(default_factory=dict)
+
+    # ---------- storage ----------
+    def sources(self) -> Dict[str, Tuple[str, ...]]:
+        if self._sources is None:
+            try:
+                raw = json.loads(self.path.read_text(encoding=self.encoding))
+                self._sources = {str(k): tuple(map(str, v)) for k, v in raw.items()}
+            except FileNotFoundError:
+                self._sources = {}
+            except (ValueError, AttributeError, TypeError):
+                self._sources = {}  # unreadable file: start over rather than crash
+        return self._sources
+
+    def _save(self) -> None:
+        try:
+            with atomic_write(self.path, encoding=self.encoding) as f:
+                json.dump({k: list(v) for k, v in self.sources().items()}, f, indent=2)
+        except OSError as exc:
+            raise OperationError(f"Failed to save macros to {self.path}: {exc}") from exc
+
+    # ---------- recording ----------
+    def start(self, name: str) -> "Recording":
+        if not name.isidentifier():
+            raise OperationError(f"Invalid macro name: {name}")
+        return Recording(self, name)
+
+    def save(self, name: str, lines: Sequence[str]) -> int:
+        if not lines:
+            raise OperationError(f"Nothing recorded; {name} not saved")
+        self.sources()[name] = tuple(lines)
+        self._compiled = {k: m for k, m in self._compiled.items() if k[0] != name}
+        self._save()
+        return len(lines)
+
+    # ---------- playback ----------
+    def get(self, name: str, calc: Calculator) -> Macro:
+        # constants are parsed by the session's backend; backends are cached for the process
+        key = (name, id(calc.numeric))
+        macro = self._compiled.get(key)
+        if macro is None:
+            lines = self.sources().get(name)
+            if lines is None:
+                raise OperationError(f"Unknown macro: {name}")
+            macro = self._compiled[key] = compile_macro(name, lines, calc)
+        return macro
+
+    def delete(self, name: str) -> None:
+        if self.sources().pop(name, None) is None:
+            raise OperationError(f"Unknown macro: {name}")
+        self._compiled = {k: m for k, m in self._compiled.items() if k[0] != name}
+        self._save()
+
+
+@dataclass
+class Recording:
+    """
+    A macro being recorded. Each session keeps its own, so the book itself
+    can be shared by every client of one history directory.
+    """
+    book: MacroBook
+    name: str
+    lines: List[str] = field(default_factory=list)
+
+    def capture(self, line: str, calc: Calculator) -> str:
+        """Validate `line` by compiling it, then add it to the macro."""
+        compile_macro(self.name, [line], calc)
+        self.lines.append(line)
+        return f"recorded: {line}"
+
+    def stop(self) -> Tuple[str, int]:
+        return self.name, self.book.save(self.name, self.lines)
@@ -0,0 +1,320 @@
+# app/numeric.py
+from __future__ import annotations
+from dataclasses import dataclass, field
+from decimal import Decimal, Context, ROUND_HALF_EVEN, MAX_EMAX, MAX_PREC, MIN_EMIN
+from fractions import Fraction
+from functools import lru_cache, reduce
+from itertools import count
+from math import isqrt, prod
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from app.exceptions import OperationError
+from app.operations import _FACTORY, _REDUCTIONS, create_operation, create_reduction
+
+__all__ = ["NumericBackend", "get_backend", "MODES"]
+
+Kernel = Callable[[Any, Any], Any]
+Reducer = Callable[[Iterable[Any]], Any]
+
+MODES = ("float", "decimal", "exact")
+
+
+@dataclass(frozen=True)
+class NumericBackend:
+    """
+    A numeric mode resolved once per session.
+    - parse:   turns user text (or a float) into this mode's number type
+    - coerce:  applied to Calculator.execute inputs; None means "use as is"
+    - kernels: op name -> callable(a, b)
+    - bounded: results have a fixed size, so no operation can run away
+    - reductions: n-ary op name -> callable(values), values never empty
+    """
+    name: str
+    parse: Callable[[Any], Any]
+    coerce: Callable[[Any], Any] | None
+    kernels: Dict[str, Kernel]
+    bounded: bool = True
+    reductions: Dict[str, Reducer] = field(default_factory=dict)
+
+    def resolve(self, op_name: str) -> Kernel:
+        kernel = self.kernels.get(op_name)
+        if kernel is not None:
+            return kernel
+        kernel = self.kernels.get(op_name.strip().lower())
+        if kernel is not None:
+            return kernel
+        # operations added to _FACTORY after this backend was built
+        return create_operation(op_name).execute
+
+    def resolve_reduction(self, op_name: str) -> Reducer:
+        fn = self.reductions.get(op_name) or self.reductions.get(op_name.strip().lower())
+        if fn is not None:
+            return fn
+        return create_reduction(op_name).reduce
+
+
+# ---------------- float (default) ----------------
+def _float_backend() -> NumericBackend:
+    # One stateless instance per operation; no per-call factory lookup.
+    kernels = {name: cls().execute for name, cls in _FACTORY.items()}
+    reductions = {name: cls().reduce for name, cls in _REDUCTIONS.items()}
+    return NumericBackend("float", float, None, kernels, reductions=reductions)
+
+
+# ---------------- decimal.Decimal ----------------
+def _guarded(name: str, fn: Kernel) -> Kernel:
+    def kernel(a: Any, b: Any) -> Any:
+        try:
+            return fn(a, b)
+        except OperationError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as exc:
+            raise OperationError(f"Invalid {name} operation: {exc}") from exc
+    return kernel
+
+
+def _guarded_reduction(name: str, fn: Reducer) -> Reducer:
+    def reducer(values: Iterable[Any]) -> Any:
+        try:
+            return fn(values)
+        except OperationError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as exc:
+            raise OperationError(f"Invalid {name} operation: {exc}") from exc
+    return reducer
+
+
+def _counted_sum(values: Iterable[Any], add: Callable[[Any, Any], Any], zero: Any) -> Tuple[Any, int]:
+    """Sum and number of values in one pass (zip stops on `values` first)."""
+    seen = count()
+    total = reduce(add, map(itemgetter(0), zip(values, seen)), zero)
+    return total, next(seen)
+
+
+def _check_root_degree(a: Any, b: Any) -> int:
+    if b != int(b) or b == 0:
+        raise OperationError("Root degree must be a nonzero integer")
+    n = int(b)
+    if a < 0 and n % 2 == 0:
+        raise OperationError("Even root of a negative number is not real")
+    return n
+
+
+def _decimal_backend(precision: int) -> NumericBackend:
+    ctx = Context(prec=max(1, precision), rounding=ROUND_HALF_EVEN)
+    wide = Context(prec=ctx.prec + 10, rounding=ROUND_HALF_EVEN)
+
+    def parse(value: Any) -> Decimal:
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, float):
+            value = repr(value)  # shortest round-trip text, not the binary expansion
+        elif isinstance(value, Fraction):
+            return ctx.divide(Decimal(value.numerator), Decimal(value.denominator))
+        return Decimal(value)
+
+    def divide(a, b):
+        if b == 0:
+            raise OperationError("Division by zero")
+        return ctx.divide(a, b)
+
+    def power(a, b):
+        r = ctx.power(a, b)
+        if not r.is_finite():
+            raise OperationError("Result not finite in power operation")
+        return r
+
+    def root(a, b):
+        n = _check_root_degree(a, b)
+        if a == 0 and n < 0:
+            raise OperationError("Invalid root operation: zero to a negative power")
+        # compute with guard digits, then round once to the session precision
+        r = ctx.plus(wide.power(wide.abs(a), wide.divide(1, n)))
+        r = -r if a < 0 else r
+        if not r.is_finite():
+            raise OperationError("Result not finite in root operation")
+        return r
+
+    def modulus(a, b):
+        if b == 0:
+            raise OperationError("Modulus by zero")
+        r = ctx.remainder(a, b)
+        # Decimal truncates; match float's floored (sign of divisor) semantics
+        if r and (r < 0) != (b < 0):
+            r = ctx.add(r, b)
+        return r
+
+    def int_divide(a, b):
+        if b == 0:
+            raise OperationError("Integer division by zero")
+        q, r = ctx.divmod(a, b)
+        if r and (r < 0) != (b < 0):
+            q = ctx.subtract(q, 1)
+        return q
+
+    def percent(a, b):
+        if b == 0:
+            raise OperationError("Percentage denominator cannot be zero")
+        return ctx.multiply(ctx.divide(a, b), 100)
+
+    raw: Dict[str, Kernel] = {
+        "add": ctx.add,
+        "subtract": ctx.subtract,
+        "multiply": ctx.multiply,
+        "divide": divide,
+        "power": power,
+        "root": root,
+        "modulus": modulus,
+        "int_divide": int_divide,
+        "percent": percent,
+        "abs_diff": lambda a, b: ctx.abs(ctx.subtract(a, b)),
+    }
+    kernels = {name: _guarded(name, fn) for name, fn in raw.items()}
+
+    # Sums are exact (enough digits for any addend), then rounded once, so
+    # the result does not depend on the order or number of values.
+    exact = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+    def mean(values):
+        total, n = _counted_sum(values, exact.add, Decimal(0))
+        return ctx.divide(total, n)
+
+    raw_reductions: Dict[str, Reducer] = {
+        "sum": lambda values: ctx.plus(reduce(exact.add, values, Decimal(0))),
+        "product": lambda values: ctx.plus(reduce(wide.multiply, values, Decimal(1))),
+        "min": lambda values: ctx.plus(min(values)),
+        "max": lambda values: ctx.plus(max(values)),
+        "mean": mean,
+    }
+    reductions = {name: _guarded_reduction(name, fn) for name, fn in raw_reductions.items()}
+    return NumericBackend("decimal", parse, parse, kernels, reductions=reductions)
+
+
+# ---------------- fractions.Fraction (exact) ----------------
+def _iroot(x: int, n: int) -> int | None:
+    """Exact integer n-th root of x >= 0, or None if x is not a perfect power."""
+    if x in (0, 1):
+        return x
+    if n >= x.bit_length():
+        return None  # 2 ** n > x, so only 0 and 1 qualify
+    if n == 2:
+        r = isqrt(x)
+    else:
+        # integer Newton from above: floats overflow past 1e308 and lose digits past 2**53
+        r = 1 << -(-x.bit_length() // n)
+        while True:
+            y = ((n - 1) * r + x // r ** (n - 1)) // n
+            if y >= r:
+                break
+            r = y
+    return r if r ** n == x else None
+
+
+def _exact_root(a: Fraction, n: int) -> Fraction | None:
+    """Exact n-th root of a (n > 0) when numerator and denominator are perfect powers."""
+    sign = -1 if a < 0 else 1
+    num = _iroot(abs(a.numerator), n)
+    den = _iroot(a.denominator, n)
+    if num is None or den is None:
+        return None
+    return sign * Fraction(num, den)
+
+
+def _inexact(name: str, value: float) -> float:
+    from math import isfinite
+    if not isfinite(value):
+        raise OperationError(f"Result not finite in {name} operation")
+    return value
+
+
+def _exact_backend() -> NumericBackend:
+    def parse(value: Any) -> Fraction:
+        if isinstance(value, Fraction):
+            return value
+        if isinstance(value, float):
+            value = repr(value)  # 0.1 means 1/10, not 3602879701896397/36028797018963968
+        elif isinstance(value, Decimal):
+            return Fraction(value)
+        return Fraction(value)
+
+    def divide(a, b):
+        if b == 0:
+            raise OperationError("Division by zero")
+        return a / b
+
+    def power(a, b):
+        if b.denominator == 1:
+            return a ** b.numerator
+        if a >= 0:
+            r = _exact_root(a, b.denominator)
+            if r is not None:
+                return r ** b.numerator
+        return _inexact("power", float(a) ** float(b))
+
+    def root(a, b):
+        n = _check_root_degree(a, b)
+        if a == 0 and n < 0:
+            raise OperationError("Invalid root operation: zero to a negative power")
+        r = _exact_root(a, abs(n))
+        if r is not None:
+            return r if n > 0 else 1 / r
+        mag = abs(float(a)) ** (1.0 / n)
+        return _inexact("root", -mag if a < 0 else mag)
+
+    def modulus(a, b):
+        if b == 0:
+            raise OperationError("Modulus by zero")
+        return a % b
+
+    def int_divide(a, b):
+        if b == 0:
+            raise OperationError("Integer division by zero")
+        return Fraction(a // b)
+
+    def percent(a, b):
+        if b == 0:
+            raise OperationError("Percentage denominator cannot be zero")
+        return a / b * 100
+
+    raw: Dict[str, Kernel] = {
+        "add": lambda a, b: a + b,
+        "subtract": lambda a, b: a - b,
+        "multiply": lambda a, b: a * b,
+        "divide": divide,
+        "power": power,
+        "root": root,
+        "modulus": modulus,
+        "int_divide": int_divide,
+        "percent": percent,
+        "abs_diff": lambda a, b: abs(a - b),
+    }
+    kernels = {name: _guarded(name, fn) for name, fn in raw.items()}
+
+    def mean(values):
+        total, n = _counted_sum(values, lambda a, b: a + b, Fraction(0))
+        return total / n
+
+    raw_reductions: Dict[str, Reducer] = {
+        "sum": lambda values: sum(values, Fraction(0)),
+        "product": lambda values: prod(values, start=Fraction(1)),
+        "min": min,
+        "max": max,
+        "mean": mean,
+    }
+    reductions = {name: _guarded_reduction(name, fn) for name, fn in raw_reductions.items()}
+    # ints grow without limit: 3 ** 10**9 would pin a core
+    return NumericBackend("exact", parse, parse, kernels, bounded=False, reductions=reductions)
+
+
+@lru_cache(maxsize=None)
+def get_backend(mode: str = "float", precision: int = 6) -> NumericBackend:
+    """Return the (cached) backend for a numeric mode."""
+    mode = mode.strip().lower()
+    if mode == "float":
+        return _float_backend()
+    if mode == "decimal":
+        return _decimal_backend(precision)
+    if mode == "exact":
+        return _exact_backend()
+    raise OperationError(f"Unknown numeric mode: {mode} (expected one of {', '.join(MODES)})")
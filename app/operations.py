@@ -1,8 +1,10 @@
 # app/operations.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Protocol, Callable, Dict
-from math import isfinite
+from typing import Protocol, Callable, Dict, Iterable
+from itertools import count
+from math import fsum, isfinite, prod
+from operator import itemgetter
 from app.exceptions import OperationError
 
 class Operation(Protocol):
@@ -74,8 +76,9 @@ class IntDivide:
     def execute(self, a: float, b: float) -> float:
         if b == 0:
             raise OperationError("Integer division by zero")
-        # Truncate toward zero to match typical integer division semantics
-        return int(a) // int(b)
+        # Floor of the true quotient; operands are no longer truncated first,
+        # so int_divide(7.5, 2.5) == 3 and int_divide(1, 0.5) == 2
+        return a // b
 
 @dataclass(frozen=True)
 class Percent:
@@ -107,12 +110,129 @@ _FACTORY: Dict[str, Callable[[], Operation]] = {
     "abs_diff": AbsDiff,
 }
 
+# One-line help for each operation (also the REPL command descriptions)
+DESCRIPTIONS: Dict[str, str] = {
+    "add": "add",
+    "subtract": "subtract",
+    "multiply": "multiply",
+    "divide": "divide",
+    "power": "a ** b",
+    "root": "n-th root of a",
+    "modulus": "a % b",
+    "int_divide": "a // b",
+    "percent": "(a / b) * 100",
+    "abs_diff": "|a - b|",
+}
+
+# Plugin operations (see app.plugins): the factory imports the plugin's
+# module on its first call, so unused plugins are never imported.
+_LAZY: Dict[str, Callable[[], Operation]] = {}
+
+def register_lazy_operation(name: str, factory: Callable[[], Operation], desc: str = "") -> None:
+    op_name = name.strip().lower()
+    if op_name in _FACTORY:
+        raise OperationError(f"Operation {op_name} is built in")
+    _LAZY[op_name] = factory
+    DESCRIPTIONS[op_name] = desc or "plugin operation"
+
+def unregister_lazy_operation(name: str) -> None:
+    op_name = name.strip().lower()
+    if _LAZY.pop(op_name, None) is not None:
+        DESCRIPTIONS.pop(op_name, None)
+
+class _OperationNames:
+    """Live `name in OPERATION_NAMES` test covering built-in and plugin operations."""
+    def __contains__(self, name: object) -> bool:
+        return name in _FACTORY or name in _LAZY
+
+OPERATION_NAMES = _OperationNames()
+
 def create_operation(name: str) -> Operation:
     """
     Factory function that returns a new operation instance.
     """
     op_name = name.strip().lower()
-    cls = _FACTORY.get(op_name)
+    cls = _FACTORY.get(op_name) or _LAZY.get(op_name)
     if cls is None:
         raise OperationError(f"Unknown operation: {name}")
     return cls()
+
+# N-ary reductions
+#
+# These fold any number of values (never empty; the caller checks) into one
+# result. Inputs are iterables so long inputs stream through C-level loops.
+
+class Reduction(Protocol):
+    def reduce(self, values: Iterable[float]) -> float: ...
+
+def _finite(name: str, result: float) -> float:
+    if not isfinite(result):
+        raise OperationError(f"Result not finite in {name} operation")
+    return result
+
+@dataclass(frozen=True)
+class Sum:
+    """
+    math.fsum: correctly rounded, so sum(0.1 x 10) == 1.0 and no error
+    builds up over long inputs (unlike a running `+` or a pairwise sum).
+    """
+    def reduce(self, values: Iterable[float]) -> float:
+        try:
+            return _finite("sum", fsum(values))
+        except OverflowError as exc:
+            raise OperationError("Result not finite in sum operation") from exc
+
+@dataclass(frozen=True)
+class Product:
+    def reduce(self, values: Iterable[float]) -> float:
+        return _finite("product", prod(values))
+
+@dataclass(frozen=True)
+class Minimum:
+    def reduce(self, values: Iterable[float]) -> float:
+        return _finite("min", min(values))
+
+@dataclass(frozen=True)
+class Maximum:
+    def reduce(self, values: Iterable[float]) -> float:
+        return _finite("max", max(values))
+
+@dataclass(frozen=True)
+class Mean:
+    def reduce(self, values: Iterable[float]) -> float:
+        # zip stops on `values` first, so the counter ends at len(values)
+        seen = count()
+        try:
+            total = fsum(map(itemgetter(0), zip(values, seen)))
+        except OverflowError as exc:
+            raise OperationError("Result not finite in mean operation") from exc
+        return _finite("mean", total / next(seen))
+
+_REDUCTIONS: Dict[str, Callable[[], Reduction]] = {
+    "sum": Sum,
+    "product": Product,
+    "min": Minimum,
+    "max": Maximum,
+    "mean": Mean,
+}
+
+# n-ary history entries store (count, 0) as operands and cannot be recomputed
+REDUCTIONS = frozenset(_REDUCTIONS)
+
+REDUCTION_DESCRIPTIONS: Dict[str, str] = {
+    "sum": "sum of values, @history or @<file>",
+    "product": "product of values",
+    "min": "smallest value",
+    "max": "largest value",
+    "mean": "arithmetic mean of values",
+}
+
+def create_reduction(name: str) -> Reduction:
+    """
+    Factory function that returns a new reduction instance.
+    """
+    op_name = name.strip().lower()
+    cls = _REDUCTIONS.get(op_name)
+    if cls is None:
+        raise OperationError(f"Unknown reduction: {name}")
+    return cls()
@@ -0,0 +1,131 @@
+# app/pipeline.py
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Container, Iterator, List
+
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.exceptions import OperationError
+from app.operations import REDUCTIONS
+
+__all__ = ["Ref", "Param", "Stage", "looks_like_chain", "parse_chain", "run_chain", "resolve_operand"]
+
+
+@dataclass(frozen=True)
+class Ref:
+    """
+    A reference to an earlier result:
+    - `_`  (index None): the previous stage's result, or the last history entry
+    - `$n` (index n):    history entry n, numbered as `history` shows them (1 = oldest)
+    """
+    index: int | None = None
+
+    def __str__(self) -> str:
+        return "_" if self.index is None else f"${self.index}"
+
+
+@dataclass(frozen=True)
+class Param:
+    """`%n` inside a macro: the n-th argument given to `play` (1-based)."""
+    index: int
+
+    def __str__(self) -> str:
+        return f"%{self.index}"
+
+
+Operand = Any  # a parsed number, a Ref, or (in macros) a Param
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One `op a b` step of a chain, with operands parsed once."""
+    op_name: str
+    a: Operand
+    b: Operand
+
+
+def looks_like_chain(line: str, operations: Container[str]) -> bool:
+    """
+    Cheap pre-check: starts with an operation, has a pipe or a result
+    reference, and has nothing for shlex to unquote.
+    """
+    if "'" in line or '"' in line or "\\" in line:
+        return False
+    if "|" not in line and "$" not in line and "_" not in line:
+        return False
+    tokens = line.split()
+    return bool(tokens) and tokens[0] in operations and (
+        "|" in line or "$" in line or "_" in tokens
+    )
+
+
+def _operand(token: str, parse: Callable[[str], Any], params: bool = False) -> Operand:
+    if token == "_":
+        return Ref()
+    if params and token.startswith("%"):
+        if not token[1:].isdigit() or int(token[1:]) < 1:
+            raise OperationError(f"Invalid macro parameter: {token} (use %n, n >= 1)")
+        return Param(int(token[1:]))
+    if token.startswith("$"):
+        if not token[1:].isdigit() or int(token[1:]) < 1:
+            raise OperationError(f"Invalid result reference: {token} (use _ or $n, n >= 1)")
+        return Ref(int(token[1:]))
+    try:
+        return parse(token)
+    except (ValueError, ArithmeticError) as exc:
+        raise OperationError("Arguments must be numbers") from exc
+
+
+def parse_chain(line: str, calc: Calculator, params: bool = False) -> List[Stage]:
+    """
+    Parse `op a b | op a b | ...` into stages. Every operation name is
+    resolved up front, so a typo in the last stage runs nothing.
+    With params=True, `%n` macro parameters are accepted as operands.
+    """
+    stages: List[Stage] = []
+    for part in line.split("|"):
+        tokens = part.split()
+        if not tokens:
+            raise OperationError("Empty stage in pipe")
+        if tokens[0] in REDUCTIONS:
+            raise OperationError(f"{tokens[0]} cannot be a piped stage; give it values, @history or @<file>")
+        if len(tokens) != 3:
+            raise OperationError(f"Each piped stage must be '<op> <a> <b>': {part.strip()}")
+        name = tokens[0]
+        calc.numeric.resolve(name)  # raises for anything that is not an operation
+        stages.append(Stage(name, _operand(tokens[1], calc.numeric.parse, params),
+                            _operand(tokens[2], calc.numeric.parse, params)))
+    return stages
+
+
+def resolve_operand(value: Operand, calc: Calculator, previous: Calculation | None) -> Any:
+    """The number an operand stands for (Params must be substituted first)."""
+    if isinstance(value, Param):
+        raise OperationError(f"Macro parameter {value} used outside a macro")
+    if not isinstance(value, Ref):
+        return value
+    if value.index is None:
+        last = previous
+        if last is None:
+            size = calc.history.size()
+            last = next(calc.history.window(size - 1, size), None) if size else None
+        if last is None:
+            raise OperationError("No previous result for _")
+        return last.result
+    entry = next(calc.history.window(value.index - 1, value.index), None)
+    if entry is None:
+        raise OperationError(f"No history entry {value} ({calc.history.size()} item(s))")
+    return entry.result
+
+
+def run_chain(calc: Calculator, stages: List[Stage]) -> Iterator[Calculation]:
+    """
+    Run the stages in one pass; results flow between stages as numbers, never
+    through text. Yields each stage's Calculation; stops at the first error.
+    """
+    previous: Calculation | None = None
+    for stage in stages:
+        a = resolve_operand(stage.a, calc, previous)
+        b = resolve_operand(stage.b, calc, previous)
+        previous = calc.execute(stage.op_name, a, b)
+        yield previous
@@ -0,0 +1,214 @@
+# app/plugins.py
+"""
+Extra operations from installed packages and from a plugins directory.
+
+Installed packages declare entry points in the "calculator.operations" group:
+
+    [project.entry-points."calculator.operations"]
+    hypot = "geometry_ops:Hypot"
+
+Any *.py file in CALCULATOR_PLUGIN_DIR (default: plugins) can declare a
+literal mapping of operation names to descriptions:
+
+    OPERATIONS = {"hypot": "sqrt(a**2 + b**2)"}
+
+and defines, for each name, a function (a, b) of the same name or a class
+with execute(a, b) named in CamelCase (abs_log -> AbsLog). Discovery only reads metadata: entry point names, and the
+OPERATIONS literal parsed with ast (never executed). A plugin's module is
+imported the first time one of its operations runs.
+"""
+from __future__ import annotations
+import ast
+import hashlib
+import importlib.util
+import sys
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Any, Callable, Container, Dict, List
+
+from .calculator_config import load_config
+from .exceptions import OperationError
+from .logger import get_logger
+from .operations import OPERATION_NAMES, REDUCTIONS, Operation, register_lazy_operation
+
+__all__ = ["ENTRY_POINT_GROUP", "PluginSpec", "discover", "load_plugins", "loaded_plugins", "plugin_fingerprint"]
+
+ENTRY_POINT_GROUP = "calculator.operations"
+_MODULE_PREFIX = "calculator_plugins"
+
+
+@dataclass(frozen=True)
+class PluginSpec:
+    name: str
+    target: str  # "module:attr" (entry point) or "file.py:attr" (plugins directory)
+    desc: str
+    source: str  # distribution name or plugin file
+    version: str = ""  # distribution version (entry points only)
+
+
+@dataclass(frozen=True)
+class _FunctionOperation:
+    fn: Callable[[Any, Any], Any]
+
+    def execute(self, a: float, b: float) -> float:
+        return self.fn(a, b)
+
+
+def _as_operation(obj: Any, name: str) -> Operation:
+    if isinstance(obj, type):
+        obj = obj()
+    if hasattr(obj, "execute"):
+        return obj
+    if callable(obj):
+        return _FunctionOperation(obj)
+    raise OperationError(f"Plugin operation {name} is neither an Operation nor a function")
+
+
+def _camel(name: str) -> str:
+    return "".join(part.title() for part in name.split("_"))
+
+
+def _import_file(path: Path) -> Any:
+    module_name = f"{_MODULE_PREFIX}.{path.stem}"
+    module = sys.modules.get(module_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"cannot import {path}")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+    return module
+
+
+def _attribute(module: Any, name: str) -> Any:
+    for attr in (name, _camel(name)):
+        obj = getattr(module, attr, None)
+        if obj is not None:
+            return obj
+    raise AttributeError(f"{module.__name__} defines neither {name} nor {_camel(name)}")
+
+
+class _LazyFactory:
+    """Imports the plugin on the first call; later calls reuse what it loaded."""
+    def __init__(self, spec: PluginSpec, load: Callable[[], Any]) -> None:
+        self._spec = spec
+        self._load = load
+        self._obj: Any = None
+
+    def __call__(self) -> Operation:
+        if self._obj is None:
+            try:
+                self._obj = self._load()
+            except Exception as exc:
+                raise OperationError(f"Plugin operation {self._spec.name} failed to load: {exc}") from exc
+        return _as_operation(self._obj, self._spec.name)
+
+
+# ---------- discovery (metadata only) ----------
+def _from_entry_points() -> List[tuple[PluginSpec, Callable[[], Any]]]:
+    found = []
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        dist = getattr(ep, "dist", None)
+        source = dist.name if dist is not None else "entry point"
+        version = dist.version if dist is not None else ""
+        found.append((PluginSpec(ep.name, ep.value, f"plugin operation ({source})", source, version), ep.load))
+    return found
+
+
+def _declared_operations(path: Path) -> Dict[str, str]:
+    """The OPERATIONS literal of a plugin file, read without importing it."""
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == "OPERATIONS"):
+            declared = ast.literal_eval(node.value)
+            if not isinstance(declared, dict):
+                raise ValueError("OPERATIONS must be a dict of name -> description")
+            return {str(k): str(v) for k, v in declared.items()}
+    return {}
+
+
+def _from_directory(directory: Path) -> List[tuple[PluginSpec, Callable[[], Any]]]:
+    found = []
+    log = get_logger("plugins")
+    for path in sorted(directory.glob("*.py")):
+        try:
+            declared = _declared_operations(path)
+        except (OSError, SyntaxError, ValueError) as exc:
+            log.warning("skipping plugin file %s: %s", path, exc)
+            continue
+        for name, desc in declared.items():
+            spec = PluginSpec(name, f"{path.name}:{name}", desc, str(path))
+            found.append((spec, lambda path=path, name=name: _attribute(_import_file(path), name)))
+    return found
+
+
+def discover(plugin_dir: Path | None, include_entry_points: bool = True
+             ) -> List[tuple[PluginSpec, Callable[[], Any]]]:
+    """Plugin specs with their (not yet called) loaders: entry points first, then the directory."""
+    found = _from_entry_points() if include_entry_points else []
+    if plugin_dir is not None and plugin_dir.is_dir():
+        found += _from_directory(plugin_dir)
+    return found
+
+
+# ---------- registration ----------
+_LOADED: Dict[str, PluginSpec] = {}
+_SCANNED: set[Path] = set()
+
+
+def load_plugins(plugin_dir: Path | None = None, reserved: Container[str] = ()) -> List[PluginSpec]:
+    """
+    Discover plugins (entry points once, each directory once) and register
+    them as lazy operations.
+    Names that are already operations, or in `reserved` (e.g. REPL commands),
+    are skipped with a warning. Returns every plugin registered so far.
+    """
+    if plugin_dir is None:
+        plugin_dir = load_config().plugin_dir
+    key = Path(plugin_dir).resolve()
+    if key in _SCANNED:
+        return loaded_plugins()
+    first = not _SCANNED
+    _SCANNED.add(key)
+    log = get_logger("plugins")
+    for spec, load in discover(Path(plugin_dir), include_entry_points=first):
+        name = spec.name.strip().lower()
+        if (name in OPERATION_NAMES or name in REDUCTIONS or name in reserved
+                or not name.isidentifier()):
+            log.warning("skipping plugin operation %s from %s: name not available", spec.name, spec.source)
+            continue
+        register_lazy_operation(name, _LazyFactory(spec, load), spec.desc)
+        _LOADED[name] = spec
+    return loaded_plugins()
+
+
+def loaded_plugins() -> List[PluginSpec]:
+    return list(_LOADED.values())
+
+
+def plugin_fingerprint(name: str) -> str | None:
+    """
+    Identifies the code behind a registered plugin operation, so persistent
+    caches can tell an edited plugin apart: a hash of the plugin file, or the
+    distribution and its version for an entry point. None when `name` is not
+    a plugin or its code cannot be identified.
+    """
+    spec = _LOADED.get(name.strip().lower())
+    if spec is None:
+        return None
+    digest = hashlib.sha256(spec.target.encode())
+    if spec.version:
+        digest.update(f"{spec.source}=={spec.version}".encode())
+    else:
+        try:
+            digest.update(Path(spec.source).read_bytes())
+        except OSError:
+            return None
+    return digest.hexdigest()[:16]
@@ -0,0 +1,106 @@
+# app/quantiles.py
+"""
+Percentiles and histograms of results across histories and saved sketches.
+
+    python -m app.quantiles history.csv other.db session.json [--op add] [--hist N] [--save all.json]
+
+Every source is streamed into mergeable sketches (see app.sketch), so files
+of any size combine into one global view without being sorted or loaded.
+"""
+from __future__ import annotations
+import argparse
+import math
+import sys
+from pathlib import Path
+from typing import List, Sequence
+
+from .calculation import Calculation
+from .calculator_config import load_config
+from .exceptions import OperationError
+from .history_export import COLUMNS
+from .sketch import DistributionStats, KllSketch
+from .verify import iter_history_rows
+
+__all__ = ["PERCENTILES", "load_stats", "format_stats", "main"]
+
+PERCENTILES = (0.5, 0.9, 0.99)
+_BAR = 30
+
+
+def load_stats(path: Path, encoding: str = "utf-8") -> DistributionStats:
+    """Sketches from a saved stats file (.json) or any history file the app writes."""
+    path = Path(path)
+    if path.suffix == ".json":
+        try:
+            return DistributionStats.load(path, encoding)
+        except FileNotFoundError as exc:
+            raise OperationError(f"No stats file at {path}") from exc
+        except (ValueError, KeyError, TypeError) as exc:
+            raise OperationError(f"Not a stats file: {path}") from exc
+    stats = DistributionStats()
+    for row in iter_history_rows(path, encoding):
+        try:
+            stats.record(Calculation.from_dict(dict(zip(COLUMNS, row))))
+        except (ValueError, ZeroDivisionError, TypeError):
+            continue  # unreadable rows are verify's business
+    return stats
+
+
+def _summary(label: str, sketch: KllSketch) -> str:
+    if not sketch.n:
+        return f"{label}: none"
+    parts = [f"n={sketch.n}", f"min={sketch.min:.6g}"]
+    parts += [f"p{round(q * 100)}={v:.6g}" for q, v in zip(PERCENTILES, sketch.quantiles(PERCENTILES))]
+    parts.append(f"max={sketch.max:.6g}")
+    return f"{label}: " + " ".join(parts)
+
+
+def _histogram(sketch: KllSketch, bins: int) -> List[str]:
+    rows = sketch.histogram(bins)
+    peak = max((c for _, _, c in rows), default=0) or 1
+    return [f"  [{lo:>12.6g}, {hi:>12.6g})  {'#' * math.ceil(c / peak * _BAR):<{_BAR}}  {c}"
+            for lo, hi, c in rows]
+
+
+def format_stats(stats: DistributionStats, op: str | None = None, hist: int = 0,
+                 inputs: bool = False) -> str:
+    """p50/p90/p99 of results and input magnitudes; a histogram of either on request."""
+    scope = op or "all operations"
+    results, magnitudes = stats.results(op), stats.inputs(op)
+    if not results.n:
+        return f"quantiles: no results for {scope}"
+    lines = [_summary(f"results ({scope})", results), _summary(f"|inputs| ({scope})", magnitudes)]
+    if hist:
+        lines += _histogram(magnitudes if inputs else results, hist)
+    return "\n".join(lines)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="quantiles", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", type=Path,
+                        help="history files or saved stats (.json); default: the configured history")
+    parser.add_argument("--op", default=None, help="only this operation")
+    parser.add_argument("--hist", type=int, default=0, help="histogram with N bins")
+    parser.add_argument("--inputs", action="store_true", help="histogram of input magnitudes instead")
+    parser.add_argument("--save", type=Path, default=None, help="write the merged sketches here (.json)")
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ns = parse_args(sys.argv[1:] if argv is None else argv)
+    cfg = load_config()
+    stats = DistributionStats()
+    try:
+        for path in ns.paths or [cfg.history_dir / cfg.history_file]:
+            stats.merge(load_stats(path, cfg.default_encoding))
+    except OperationError as exc:
+        sys.stderr.write(f"error: {exc}\n")
+        return 2
+    if ns.save:
+        stats.save(ns.save, cfg.default_encoding)
+    print(format_stats(stats, ns.op, ns.hist, ns.inputs))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
@@ -0,0 +1,79 @@
+# app/reductions.py
+"""
+Value sources for the n-ary reductions (sum, product, min, max, mean).
+
+    sum 1 2 3            literal values
+    sum @history         the result of every history entry
+    sum @values.txt      numbers from a file (whitespace, comma or newline separated)
+
+Sources can be mixed; every one yields chunks of parsed numbers, so a file
+or history larger than memory is reduced without ever being held whole.
+"""
+from __future__ import annotations
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Sequence
+
+from app.calculator import Calculator
+from app.calculator_config import load_config
+from app.exceptions import OperationError
+from app.history import History
+
+__all__ = ["HISTORY_SOURCE", "read_values", "history_results", "value_chunks"]
+
+HISTORY_SOURCE = "@history"
+CHUNK_LINES = 65_536
+CHUNK_ENTRIES = 10_000
+
+
+def read_values(
+    path: Path,
+    parse: Callable[[str], Any] = float,
+    encoding: str = "utf-8",
+    chunk_lines: int = CHUNK_LINES,
+) -> Iterator[List[Any]]:
+    """Numbers from a text file, `chunk_lines` lines at a time."""
+    path = Path(path)
+    try:
+        f = open(path, encoding=encoding)
+    except OSError as exc:
+        raise OperationError(f"Cannot read values from {path}: {exc.strerror or exc}") from exc
+    with f:
+        while True:
+            lines = list(islice(f, chunk_lines))
+            if not lines:
+                return
+            tokens = " ".join(lines).replace(",", " ").split()
+            try:
+                yield list(map(parse, tokens))
+            except (ValueError, ArithmeticError) as exc:
+                raise OperationError(f"Non-numeric value in {path}: {exc}") from exc
+
+
+def history_results(history: History, chunk_entries: int = CHUNK_ENTRIES) -> Iterator[List[Any]]:
+    """The result of every history entry, oldest first, one window at a time."""
+    total = history.size()  # entries the reduction itself adds are not included
+    for start in range(0, total, chunk_entries):
+        yield [c.result for c in history.window(start, min(start + chunk_entries, total))]
+
+
+def value_chunks(calc: Calculator, args: Sequence[str]) -> Iterator[List[Any]]:
+    """Chunks of numbers for `args`: literals, @history and @<file> in any mix."""
+    parse = calc.numeric.parse
+    literals: List[Any] = []
+    for arg in args:
+        if not arg.startswith("@"):
+            try:
+                literals.append(parse(arg))
+            except (ValueError, ArithmeticError) as exc:
+                raise OperationError("Arguments must be numbers") from exc
+            continue
+        if literals:
+            yield literals
+            literals = []
+        if arg == HISTORY_SOURCE:
+            yield from history_results(calc.history)
+        else:
+            yield from read_values(Path(arg[1:]), parse, load_config().default_encoding)
+    if literals:
+        yield literals
@@ -1,20 +1,42 @@
 # app/repl.py
 from __future__ import annotations
+import contextvars
 import os
+import queue
+import signal
 import sys
 import shlex
-from typing import Callable, Tuple
-
-from app.calculator import Calculator
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Mapping, Tuple
+
+from app.calculator import Calculator, AutoSaveObserver
+from app.calculator_config import load_config
+from app.history_export import export_history
+from app.history_merge import format_report as format_merge, merge_histories
+from app.verify import format_report, verify_history
+from app.quantiles import format_stats, load_stats
+from app.sketch import DistributionStats
+from app.pipeline import looks_like_chain, parse_chain, run_chain
+from app.macros import MacroBook, Recording
+from app.operations import DESCRIPTIONS, OPERATION_NAMES, REDUCTION_DESCRIPTIONS, REDUCTIONS
+from app.plugins import load_plugins
+from app.reductions import value_chunks
+from app.batch import DEFAULT_CHUNK, format_progress, run_batch
 from app.exceptions import OperationError
-from app.command_registry import command, register, get_commands, help_lines
+from app.command_registry import command, register, get_commands, help_lines, dispatch_table
 from app.command_pattern import CommandQueue, MathCommand
 from app.help_decorator import with_help, help_entries, register_help
 
 _QUEUE = CommandQueue()
+_MACRO_BOOKS: dict[Path, MacroBook] = {}
+# set between `record` and `stop`; per session, since daemon clients share the module
+_RECORDING: contextvars.ContextVar[Recording | None] = contextvars.ContextVar("recording", default=None)
 
 Number = float
-Handler = Callable[[Calculator, list[str]], str]
+# handlers return a string, or an iterable of lines for long, streamed output
+Handler = Callable[[Calculator, list[str]], "str | Iterable[str]"]
 
 # ---------------- Color support ----------------
 CYAN = GREEN = RED = RESET = ""  # will be set by _init_colors()
@@ -62,22 +84,34 @@ def _color_banner(s: str) -> str:
     return _wrap_with(CYAN, s, RESET, "\x1b[36m")
 # ------------------------------------------------
 
-def _parse_two(args: list[str]) -> Tuple[Number, Number]:
-    if len(args) != 2:
-        raise OperationError("Exactly two numeric arguments required")
+def _parse_one(arg: str, parse: Callable[[str], Number] = float) -> Number:
     try:
-        a = float(args[0]); b = float(args[1])
-        return a, b
-    except ValueError as exc:
+        return parse(arg)
+    except (ValueError, ArithmeticError) as exc:
         raise OperationError("Arguments must be numbers") from exc
 
+def _parse_two(args: list[str], parse: Callable[[str], Number] = float) -> Tuple[Number, Number]:
+    if len(args) != 2:
+        raise OperationError("Exactly two numeric arguments required")
+    return _parse_one(args[0], parse), _parse_one(args[1], parse)
+
 def _op(name: str) -> Handler:
     def handler(calc: Calculator, args: list[str]) -> str:
-        a, b = _parse_two(args)
+        a, b = _parse_two(args, calc.numeric.parse)
         c = calc.execute(name, a, b)
         return f"{name}({a}, {b}) = {c.result}"
     return handler
 
+def _reduction(name: str) -> Handler:
+    def handler(calc: Calculator, args: list[str]) -> str:
+        if not args:
+            raise OperationError(f"usage: {name} <a> <b> ... | @history | @<file>")
+        if any("|" in a or a == "_" or a.startswith("$") for a in args):
+            raise OperationError(f"{name} cannot be piped or take _/$n; give it values, @history or @<file>")
+        c = calc.reduce(name, value_chunks(calc, args))
+        return f"{name}({int(c.a)} values) = {c.result}"
+    return handler
+
 # ---------------- Command Pattern: queue support ----------------
 @with_help("enqueue", "queue an operation: enqueue <op> <a> <b>")
 @command("enqueue", "queue an operation: enqueue <op> <a> <b>")
@@ -113,13 +147,107 @@ def _clearqueue(_calc: Calculator, _args: list[str]) -> str:
     return f"queue cleared ({n} item(s) removed)"
 # ---------------------------------------------------------------
 
-@with_help("history", "show history")
-@command("history", "show history")
-def _history(calc: Calculator, _args: list[str]) -> str:
-    items = calc.history.items()
-    if not items:
+HISTORY_PAGE = 20
+_HISTORY_USAGE = "error: usage: history [--last N] [--page P] [--offset K] [--all]"
+
+def _history_line(index: int, c) -> str:
+    if c.operation in REDUCTIONS:
+        return f"{index:>4}  {c.operation}({int(c.a)} values) = {c.result} [{c.timestamp}]"
+    return f"{index:>4}  {c.operation}({c.a}, {c.b}) = {c.result} [{c.timestamp}]"
+
+def _history_stream(calc: Calculator, start: int, stop: int, total: int) -> Iterator[str]:
+    for i, c in enumerate(calc.history.window(start, stop), start + 1):
+        yield _history_line(i, c)
+    if start > 0 or stop < total:
+        yield f"({start + 1}-{stop} of {total}; history --page P or --offset K for more)"
+
+# ---------------- Macros ----------------
+def _macro_book() -> MacroBook:
+    cfg = load_config()
+    path = cfg.history_dir / "macros.json"
+    book = _MACRO_BOOKS.get(path)
+    if book is None:
+        book = _MACRO_BOOKS[path] = MacroBook(path, cfg.default_encoding)
+    return book
+
+@with_help("record", "record operation lines as a macro: record <name> (use %1, %2 for arguments)")
+@command("record", "record operation lines as a macro: record <name> (use %1, %2 for arguments)")
+def _record(_calc: Calculator, args: list[str]) -> str:
+    if len(args) != 1:
+        return "error: usage: record <name>"
+    current = _RECORDING.get()
+    if current is not None:
+        raise OperationError(f"Already recording {current.name}; finish it with stop")
+    _RECORDING.set(_macro_book().start(args[0]))
+    return f"recording {args[0]}: enter operation lines, then stop"
+
+@with_help("stop", "finish recording a macro and save it")
+@command("stop", "finish recording a macro and save it")
+def _stop(_calc: Calculator, _args: list[str]) -> str:
+    recording = _RECORDING.get()
+    if recording is None:
+        return "error: Not recording"
+    _RECORDING.set(None)
+    name, n = recording.stop()
+    return f"saved macro {name} ({n} line(s))"
+
+@with_help("play", "replay a macro: play <name> [args...]")
+@command("play", "replay a macro: play <name> [args...]")
+def _play(calc: Calculator, args: list[str]):
+    if not args:
+        return "error: usage: play <name> [args...]"
+    macro = _macro_book().get(args[0], calc)
+    values = [_parse_one(a, calc.numeric.parse) for a in args[1:]]
+    return (f"{c.operation}({c.a}, {c.b}) = {c.result}" for c in macro.play(calc, values))
+
+@with_help("macros", "list saved macros")
+@command("macros", "list saved macros")
+def _macros(_calc: Calculator, _args: list[str]) -> str:
+    sources = _macro_book().sources()
+    if not sources:
+        return "macros: none"
+    return "\n".join(f"{name}: {'; '.join(lines)}" for name, lines in sorted(sources.items()))
+# ---------------------------------------------------------------
+
+@with_help("history", "show history: history [--last N] [--page P] [--offset K] [--all]")
+@command("history", "show history: history [--last N] [--page P] [--offset K] [--all]")
+def _history(calc: Calculator, args: list[str]):
+    """
+    Lines are produced lazily, one window of the history at a time, so showing
+    a large (or spilled) history never builds it in memory. By default only the
+    newest HISTORY_PAGE entries are shown.
+    - --last N:   window size (default HISTORY_PAGE)
+    - --page P:   P-th window counting back from the newest (1 = newest)
+    - --offset K: window starting at entry K+1 (oldest = 1) instead
+    - --all:      every entry, streamed
+    """
+    opts: dict[str, int] = {}
+    show_all = False
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key == "--all" and not eq:
+            show_all = True
+        elif key in ("--last", "--page", "--offset"):
+            raw = val if eq else next(it, "")
+            if not raw.isdigit() or (key != "--offset" and int(raw) < 1):
+                return _HISTORY_USAGE
+            opts[key] = int(raw)
+        else:
+            return _HISTORY_USAGE
+    total = calc.history.size()
+    if not total:
         return "history: empty"
-    return "\n".join(f"{c.operation}({c.a}, {c.b}) = {c.result} [{c.timestamp}]" for c in items)
+    size = total if show_all else opts.get("--last", HISTORY_PAGE)
+    if "--offset" in opts:
+        start = min(opts["--offset"], total)
+        stop = min(start + size, total)
+    else:
+        stop = max(0, total - size * (opts.get("--page", 1) - 1))
+        start = max(0, stop - size)
+    if start >= stop:
+        return f"history: nothing there ({total} item(s) in total)"
+    return _history_stream(calc, start, stop, total)
 
 @with_help("clear", "clear history")
 @command("clear", "clear history")
@@ -139,16 +267,238 @@ def _redo(calc: Calculator, _args: list[str]) -> str:
     c = calc.history.redo()
     return f"redo: {c.operation}({c.a}, {c.b})"
 
-@with_help("save", "save history to CSV")
-@command("save", "save history to CSV")
+@with_help("save", "save history (CSV or SQLite)")
+@command("save", "save history (CSV or SQLite)")
 def _save(calc: Calculator, _args: list[str]) -> str:
     path = calc.history.save()
     return f"saved: {path}"
 
-@with_help("load", "load history from CSV")
-@command("load", "load history from CSV")
-def _load(calc: Calculator, _args: list[str]) -> str:
-    n = calc.history.load()
+@with_help("export", "stream history to a file: export <path> [--format csv|jsonl] [--compress gzip|lzma]")
+@command("export", "stream history to a file: export <path> [--format csv|jsonl] [--compress gzip|lzma]")
+def _export(calc: Calculator, args: list[str]) -> str:
+    usage = "error: usage: export <path> [--format csv|jsonl] [--compress gzip|lzma|none]"
+    opts = {"--format": None, "--compress": None}
+    paths: list[str] = []
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key in opts:
+            opts[key] = val if eq else next(it, None)
+            if not opts[key]:
+                return usage
+        else:
+            paths.append(arg)
+    if len(paths) != 1:
+        return usage
+    cfg = load_config()
+    n = export_history(calc.history.iter_items(), Path(paths[0]), fmt=opts["--format"],
+                       compression=opts["--compress"], encoding=cfg.default_encoding)
+    return f"exported: {n} item(s) to {paths[0]}"
+
+@with_help("merge", "merge time-sorted history files: merge <path>... --out <path> [--format csv|jsonl] [--compress gzip|lzma]")
+@command("merge", "merge time-sorted history files: merge <path>... --out <path> [--format csv|jsonl] [--compress gzip|lzma]")
+def _merge(_calc: Calculator, args: list[str]) -> str:
+    usage = "error: usage: merge <path>... --out <path> [--format csv|jsonl] [--compress gzip|lzma|none]"
+    opts: dict[str, str | None] = {"--out": None, "--format": None, "--compress": None}
+    paths: list[str] = []
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key in opts:
+            opts[key] = val if eq else next(it, None)
+            if not opts[key]:
+                return usage
+        else:
+            paths.append(arg)
+    if not paths or not opts["--out"]:
+        return usage
+    report = merge_histories([Path(p) for p in paths], Path(opts["--out"]), fmt=opts["--format"],
+                             compression=opts["--compress"], encoding=load_config().default_encoding)
+    return format_merge(report)
+
+@with_help("verify", "recompute a saved history: verify [path] [--tol X] [--workers N]")
+@command("verify", "recompute a saved history: verify [path] [--tol X] [--workers N]")
+def _verify(calc: Calculator, args: list[str]) -> str:
+    usage = "error: usage: verify [path] [--tol X] [--workers N]"
+    opts: dict[str, str | None] = {"--tol": None, "--workers": None}
+    paths: list[str] = []
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key in opts:
+            opts[key] = val if eq else next(it, None)
+            if not opts[key]:
+                return usage
+        else:
+            paths.append(arg)
+    if len(paths) > 1:
+        return usage
+    try:
+        tol = float(opts["--tol"] or 1e-9)
+        workers = int(opts["--workers"]) if opts["--workers"] else None
+    except ValueError:
+        return usage
+    if paths:
+        return format_report(verify_history(Path(paths[0]), tol=tol, workers=workers))
+    cfg = load_config()
+    if cfg.auto_save:
+        calc.flush()  # verify what is in memory, not the last autosave
+        return format_report(verify_history(cfg.history_dir / cfg.history_file, tol=tol, workers=workers))
+    # nothing keeps the file current: verify a copy of this session's history instead
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "session.csv"
+        export_history(calc.history.iter_items(), path)
+        return format_report(verify_history(path, tol=tol, workers=workers))
+
+@with_help("quantiles", "p50/p90/p99 of results: quantiles [op] [--hist N] [--inputs] [--from path]... [--save path]")
+@command("quantiles", "p50/p90/p99 of results: quantiles [op] [--hist N] [--inputs] [--from path]... [--save path]")
+def _quantiles(calc: Calculator, args: list[str]) -> str:
+    """
+    Reads the session's streaming sketches; each --from merges in a history
+    file or a stats file saved earlier (by --save, from any session).
+    """
+    usage = "error: usage: quantiles [op] [--hist N] [--inputs] [--from path]... [--save path]"
+    ops: list[str] = []
+    sources: list[str] = []
+    hist, inputs, save = 0, False, None
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key == "--inputs" and not eq:
+            inputs = True
+        elif key in ("--hist", "--from", "--save"):
+            raw = val if eq else next(it, "")
+            if not raw or (key == "--hist" and not raw.isdigit()):
+                return usage
+            if key == "--hist":
+                hist = int(raw)
+            elif key == "--from":
+                sources.append(raw)
+            else:
+                save = raw
+        elif key.startswith("--"):
+            return usage
+        else:
+            ops.append(arg)
+    if len(ops) > 1:
+        return usage
+    cfg = load_config()
+    stats = DistributionStats().merge(calc.history.stats)
+    for source in sources:
+        stats.merge(load_stats(Path(source), cfg.default_encoding))
+    out = format_stats(stats, ops[0] if ops else None, hist, inputs)
+    if save:
+        stats.save(Path(save), cfg.default_encoding)
+        out += f"\nsaved: {save}"
+    return out
+
+_BATCH_USAGE = "batch <input> <output> --op NAME [--chunk N] [--workers N] [--restart]"
+
+@with_help("batch", f"apply an operation to every row of a CSV or .f64 file: {_BATCH_USAGE}")
+@command("batch", f"apply an operation to every row of a CSV or .f64 file: {_BATCH_USAGE}")
+def _batch(_calc: Calculator, args: list[str]) -> "str | Iterator[str]":
+    """
+    Runs app.batch in a background thread and streams its per-chunk progress.
+    Results go to the output file only, never into the history.
+    """
+    usage = f"error: usage: {_BATCH_USAGE}"
+    paths: list[str] = []
+    opts: dict[str, str | None] = {"--op": None, "--chunk": None, "--workers": None}
+    restart = False
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key == "--restart" and not eq:
+            restart = True
+        elif key in opts:
+            opts[key] = val if eq else next(it, None)
+            if not opts[key]:
+                return usage
+        elif key.startswith("--"):
+            return usage
+        else:
+            paths.append(arg)
+    if len(paths) != 2 or not opts["--op"]:
+        return usage
+    try:
+        chunk = int(opts["--chunk"]) if opts["--chunk"] else DEFAULT_CHUNK
+        workers = int(opts["--workers"]) if opts["--workers"] else None
+    except ValueError:
+        return usage
+    return _batch_lines(Path(paths[0]), Path(paths[1]), opts["--op"].lower(), chunk, workers, restart,
+                        load_config().max_input_value)
+
+def _batch_lines(src: Path, out: Path, op: str, chunk: int, workers: int | None,
+                 restart: bool, max_input: float) -> Iterator[str]:
+    lines: "queue.SimpleQueue[str | BaseException | None]" = queue.SimpleQueue()
+    cancel = threading.Event()
+
+    def run() -> None:
+        try:
+            report = run_batch(src, out, op, chunk, workers, restart, max_input,
+                               progress=lambda p: lines.put(format_progress(p)), cancel=cancel)
+            lines.put(report.summary())
+            lines.put(None)
+        except BaseException as exc:
+            lines.put(exc)
+
+    worker = threading.Thread(target=run, name="batch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = lines.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # the reader went away (e.g. a daemon client disconnected): stop at the
+        # next chunk, and release the output before another batch can claim it
+        cancel.set()
+        worker.join()
+
+@with_help("sync", "flush pending autosaves to disk now")
+@command("sync", "flush pending autosaves to disk now")
+def _sync(calc: Calculator, _args: list[str]) -> str:
+    n = calc.flush()
+    return f"synced: {n} pending save(s) written" if n else "synced: nothing pending"
+
+@with_help("refresh", "merge records other processes added to the shared history")
+@command("refresh", "merge records other processes added to the shared history")
+def _refresh(calc: Calculator, _args: list[str]) -> str:
+    n = calc.refresh()
+    return f"refreshed: {n} new item(s)"
+
+@with_help("cache", "result cache statistics: cache [clear]")
+@command("cache", "result cache statistics: cache [clear]")
+def _cache(calc: Calculator, args: list[str]) -> str:
+    if calc.cache is None:
+        return "cache: off (set CALCULATOR_RESULT_CACHE=risky|all)"
+    if args == ["clear"]:
+        return f"cache: cleared {calc.cache.clear()} entries"
+    if args:
+        return "error: usage: cache [clear]"
+    return f"cache: {calc.cache.stats()}"
+
+@with_help("load", "load saved history: load [N] [--since ISO] [--until ISO] (only the last N records / that range)")
+@command("load", "load saved history: load [N] [--since ISO] [--until ISO] (only the last N records / that range)")
+def _load(calc: Calculator, args: list[str]) -> str:
+    usage = "error: usage: load [N] [--since ISO] [--until ISO]"
+    limit = None
+    opts: dict[str, str | None] = {"--since": None, "--until": None}
+    it = iter(args)
+    for arg in it:
+        key, eq, val = arg.partition("=")
+        if key in opts:
+            opts[key] = val if eq else next(it, None)
+            if not opts[key]:
+                return usage
+        elif arg.isdigit() and limit is None:
+            limit = int(arg)
+        else:
+            return usage
+    n = calc.history.load(limit=limit, since=opts["--since"], until=opts["--until"])
     return f"loaded: {n} item(s)"
 
 @command("help", "show this help")
@@ -182,83 +532,157 @@ def _help(_calc: Calculator, _args: list[str]) -> str:
 def _exit(_calc: Calculator, _args: list[str]) -> str:
     return "__EXIT__"
 
+def _register_operations() -> None:
+    """
+    Every operation becomes a command: built-ins, plugins (discovered once,
+    imported on first use) and the n-ary reductions.
+    """
+    load_plugins(reserved=get_commands())
+    for name, desc in list(DESCRIPTIONS.items()):
+        register_help(name, desc)          # Decorator registry
+        register(name, _op(name), desc)    # Existing command registry
+    for name, desc in REDUCTION_DESCRIPTIONS.items():
+        register_help(name, desc)
+        register(name, _reduction(name), desc)
+
 # Register math ops programmatically
-for _name, _desc in [
-    ("add", "add"), ("subtract", "subtract"), ("multiply", "multiply"),
-    ("divide", "divide"), ("power", "a ** b"), ("root", "n-th root of a"),
-    ("modulus", "a % b"), ("int_divide", "a // b"), ("percent", "(a / b) * 100"),
-    ("abs_diff", "|a - b|"),
-]:
-    register_help(_name, _desc)          # Decorator registry
-    register(_name, _op(_name), _desc)   # Existing command registry
+_register_operations()
 
 def _seed_registry_if_needed() -> None:
     cmds = get_commands()
     if "help" in cmds:
         return
     # re-register baseline commands
-    register("history", _history, "show history")
+    register("history", _history, "show history: history [--last N] [--page P] [--offset K] [--all]")
     register("clear", _clear, "clear history")
     register("undo", _undo, "undo last calculation")
     register("redo", _redo, "redo last undone calculation")
-    register("save", _save, "save history to CSV")
-    register("load", _load, "load history from CSV")
+    register("save", _save, "save history (CSV or SQLite)")
+    register("load", _load, "load saved history: load [N] [--since ISO] [--until ISO] (only the last N records / that range)")
+    register("sync", _sync, "flush pending autosaves to disk now")
+    register("refresh", _refresh, "merge records other processes added to the shared history")
+    register("merge", _merge, "merge time-sorted history files: merge <path>... --out <path> [--format csv|jsonl] [--compress gzip|lzma]")
+    register("verify", _verify, "recompute a saved history: verify [path] [--tol X] [--workers N]")
+    register("record", _record, "record operation lines as a macro: record <name> (use %1, %2 for arguments)")
+    register("stop", _stop, "finish recording a macro and save it")
+    register("play", _play, "replay a macro: play <name> [args...]")
+    register("macros", _macros, "list saved macros")
+    register("quantiles", _quantiles, "p50/p90/p99 of results: quantiles [op] [--hist N] [--inputs] [--from path]... [--save path]")
+    register("cache", _cache, "result cache statistics: cache [clear]")
+    register("batch", _batch, f"apply an operation to every row of a CSV or .f64 file: {_BATCH_USAGE}")
+    register("export", _export, "stream history to a file: export <path> [--format csv|jsonl] [--compress gzip|lzma]")
     register("help", _help, "show this help")
     register("exit", _exit, "exit the program")
-    for _name, _desc in [
-        ("add", "add"), ("subtract", "subtract"), ("multiply", "multiply"),
-        ("divide", "divide"), ("power", "a ** b"), ("root", "n-th root of a"),
-        ("modulus", "a % b"), ("int_divide", "a // b"), ("percent", "(a / b) * 100"),
-        ("abs_diff", "|a - b|"),
-    ]:
-        register_help(_name, _desc)
-        register(_name, _op(_name), _desc)
+    _register_operations()
 
-def process_line(calc: Calculator, line: str):
-    _seed_registry_if_needed()
+def _guard_stream(lines: Iterable[str]) -> Iterator[str]:
+    try:
+        yield from lines
+    except Exception as exc:
+        yield f"error: {exc}"
+
+# commands that still run while a macro is being recorded
+_MACRO_CONTROL = frozenset({"stop", "record", "macros", "help", "exit"})
+
+def _tokenize(line: str) -> list[str]:
+    """str.split for plain `op a b` lines; shlex only when quotes or escapes appear."""
+    if "'" in line or '"' in line or "\\" in line:
+        return shlex.split(line)
+    return line.split()
+
+def _dispatch() -> Mapping[str, Handler]:
+    """The frozen command table; rebuilt (and reseeded) only when the registry changed."""
+    table = dispatch_table()
+    if "help" not in table:
+        _seed_registry_if_needed()
+        table = dispatch_table()
+    return table
+
+def process_line_iter(calc: Calculator, line: str) -> Tuple[bool, Iterator[str]]:
+    """
+    Like process_line, but output comes as an iterator of lines so long
+    results (e.g. history --all) can be written out as they are produced.
+    """
+    table = _dispatch()
     line = line.strip()
     if not line:
-        return True, ""
+        return True, iter(())
     try:
-        parts = shlex.split(line)
-        cmd, *args = parts
-        handler = get_commands().get(cmd)
+        recording = _RECORDING.get()
+        if recording is not None and line.split(maxsplit=1)[0] not in _MACRO_CONTROL:
+            return True, iter((recording.capture(line, calc),))
+        if looks_like_chain(line, OPERATION_NAMES):
+            # `add 1 2 | multiply _ 3`: parsed once, values passed as numbers
+            stages = parse_chain(line, calc)
+            return True, _guard_stream(
+                f"{c.operation}({c.a}, {c.b}) = {c.result}" for c in run_chain(calc, stages)
+            )
+        cmd, *args = _tokenize(line)
+        handler = table.get(cmd)
         if not handler:
-            return True, f"unknown command: {cmd}\nType 'help' to see commands."
+            return True, iter((f"unknown command: {cmd}\nType 'help' to see commands.",))
         out = handler(calc, args)
         if out == "__EXIT__":
-            return False, ""
-        return True, out
+            return False, iter(())
+        if isinstance(out, str):
+            return True, iter((out,) if out else ())
+        return True, _guard_stream(out)
     except OperationError as exc:
-        return True, f"error: {exc}"
+        return True, iter((f"error: {exc}",))
     except Exception as exc:
-        return True, f"error: {exc}"
+        return True, iter((f"error: {exc}",))
+
+def process_line(calc: Calculator, line: str):
+    cont, lines = process_line_iter(calc, line)
+    return cont, "\n".join(lines)
+
+def _install_sigterm_flush():
+    """Turn SIGTERM into SystemExit so run_loop's cleanup (the final flush) runs."""
+    if threading.current_thread() is not threading.main_thread():
+        return None
 
-def run_loop(stdin = sys.stdin, stdout = sys.stdout) -> int:
+    def _on_sigterm(signum, _frame):
+        raise SystemExit(128 + signum)
+    return signal.signal(signal.SIGTERM, _on_sigterm)
+
+def run_loop(stdin = sys.stdin, stdout = sys.stdout, calc: Calculator | None = None) -> int:
     _seed_registry_if_needed()
-    calc = Calculator(observers=[])
+    calc = calc or Calculator(observers=[])
     use_color = _should_color(stdout)
 
     banner = "Enhanced Calculator REPL. Type 'help' for commands. Type 'exit' to quit."
     print(_color_banner(banner) if use_color else banner, file=stdout)
 
-    while True:
-        stdout.write("> ")
-        stdout.flush()
-        line = stdin.readline()
-        if not line:
-            break
-        cont, out = process_line(calc, line)
-        if out:
-            if use_color and out.startswith("error:"):
-                print(_color_err(out), file=stdout)
-            elif use_color:
-                print(_color_ok(out), file=stdout)
-            else:
-                print(out, file=stdout)
-        if not cont:
-            break
+    previous = _install_sigterm_flush()
+    try:
+        while True:
+            stdout.write("> ")
+            stdout.flush()
+            line = stdin.readline()
+            if not line:
+                break
+            cont, lines = process_line_iter(calc, line)
+            for out in lines:
+                if use_color and out.startswith("error:"):
+                    print(_color_err(out), file=stdout)
+                elif use_color:
+                    print(_color_ok(out), file=stdout)
+                else:
+                    print(out, file=stdout)
+            if not cont:
+                break
+    finally:
+        # deferred autosaves must reach disk on exit, EOF and SIGTERM alike
+        try:
+            calc.flush()
+        except OperationError as exc:
+            print(f"error: {exc}", file=stdout)
+        if previous is not None:
+            signal.signal(signal.SIGTERM, previous)
     return 0
 
+def main() -> int:
+    return run_loop(calc=Calculator(observers=[AutoSaveObserver()]))
+
 if __name__ == "__main__":  # pragma: no cover
-    raise SystemExit(run_loop())  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
@@ -0,0 +1,257 @@
+# app/result_cache.py
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from .exceptions import OperationError
+from .operations import _FACTORY
+from .plugins import plugin_fingerprint
+
+__all__ = ["CACHE_MODES", "ResultCache", "code_version", "operation_key", "open_cache"]
+
+CACHE_MODES = ("off", "risky", "all")
+
+# bump when the key/value encoding below changes
+_FORMAT = 1
+_MEMORY_LIMIT = 4096  # front entries kept in a dict per process
+_TOUCH_BATCH = 256
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """
+    Hash of the code that produces results (operations + numeric backends).
+    Entries written under another version are stale and get dropped.
+    """
+    digest = hashlib.sha256(f"format={_FORMAT}".encode())
+    here = Path(__file__).resolve().parent
+    for name in ("operations.py", "numeric.py"):
+        digest.update((here / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def operation_key(op_name: str) -> str | None:
+    """
+    The name an operation's results are cached under. Built-ins are covered by
+    code_version(); a plugin carries its own fingerprint, so editing or
+    upgrading it misses the old entries. None (never cache) for anything else.
+    """
+    name = op_name.strip().lower()
+    if name in _FACTORY:
+        return name
+    fingerprint = plugin_fingerprint(name)
+    return None if fingerprint is None else f"{name}@{fingerprint}"
+
+
+def _encode(value: Any) -> str:
+    # type-tagged and exact, so a cached result is indistinguishable from a fresh one
+    if isinstance(value, bool):
+        raise TypeError("bool is not a calculator number")
+    if isinstance(value, float):
+        return "f:" + value.hex()
+    if isinstance(value, int):
+        return "i:" + str(value)
+    if isinstance(value, Decimal):
+        return "d:" + str(value)
+    if isinstance(value, Fraction):
+        return "q:" + str(value)
+    raise TypeError(f"cannot cache {type(value).__name__}")
+
+
+def _decode(text: str) -> Any:
+    tag, value = text[:2], text[2:]
+    if tag == "f:":
+        return float.fromhex(value)
+    if tag == "i:":
+        return int(value)
+    if tag == "d:":
+        return Decimal(value)
+    return Fraction(value)
+
+
+class ResultCache:
+    """
+    Persistent memo of operation results keyed by (operation, a, b, numeric mode).
+
+    - stored in SQLite (WAL) so several sessions and nightly batch runs share it
+    - every row carries code_version(); opening the cache drops rows from older
+      versions of operations.py/numeric.py
+    - plugin operations are keyed with their fingerprint (see operation_key),
+      so an edited plugin never answers from its old results
+    - at most `max_entries` rows; the least recently used are evicted in chunks
+    - a small in-process dict sits in front, so repeats in one session skip SQLite
+    - results that raise are never cached
+    """
+    def __init__(self, path: Path, mode_key: str, max_entries: int = 100_000) -> None:
+        self.path = Path(path)
+        self.mode_key = mode_key
+        self.max_entries = max(1, int(max_entries))
+        self.version = code_version()
+        self.hits = 0
+        self.misses = 0
+        self._memory: Dict[Tuple[str, str, str], Any] = {}
+        self._touched: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                mode      TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                a         TEXT NOT NULL,
+                b         TEXT NOT NULL,
+                version   TEXT NOT NULL,
+                result    TEXT NOT NULL,
+                used      INTEGER NOT NULL,
+                PRIMARY KEY (mode, operation, a, b)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_results_used ON results(used);
+            """
+        )
+        self._conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        self._tick = self._conn.execute("SELECT COALESCE(MAX(used), 0) FROM results").fetchone()[0]
+
+    # ---------- lookups ----------
+    def get(self, op_name: str, a: Any, b: Any) -> Tuple[bool, Any]:
+        """(True, result) on a hit, (False, None) on a miss."""
+        try:
+            key = (op_name, _encode(a), _encode(b))
+        except TypeError:
+            return False, None
+        with self._lock:
+            self._tick += 1
+            if key in self._memory:
+                self.hits += 1
+                self._touch(key)
+                return True, self._memory[key]
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE mode = ? AND operation = ? AND a = ? AND b = ?",
+                (self.mode_key, *key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            value = _decode(row[0])
+            self._remember(key, value)
+            self._touch(key)
+            return True, value
+
+    def put(self, op_name: str, a: Any, b: Any, result: Any) -> None:
+        try:
+            key = (op_name, _encode(a), _encode(b))
+            encoded = _encode(result)
+        except TypeError:
+            return  # e.g. a complex root: not worth a cache entry
+        with self._lock:
+            self._tick += 1
+            # another session may have stored the key since our miss: only a
+            # real insert grows the table, a replace must not count towards eviction
+            added = self._conn.execute(
+                "INSERT INTO results (mode, operation, a, b, version, result, used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                (self.mode_key, *key, self.version, encoded, self._tick),
+            ).rowcount
+            if not added:
+                self._conn.execute(
+                    "UPDATE results SET version = ?, result = ?, used = ? "
+                    "WHERE mode = ? AND operation = ? AND a = ? AND b = ?",
+                    (self.version, encoded, self._tick, self.mode_key, *key),
+                )
+            self._count += added
+            self._remember(key, result)
+            if self._count > self.max_entries:
+                self._evict()
+
+    def wrap(self, op_name: str, kernel):
+        """A kernel that answers from the cache and stores what it computes."""
+        def cached(a: Any, b: Any) -> Any:
+            hit, value = self.get(op_name, a, b)
+            if hit:
+                return value
+            value = kernel(a, b)
+            self.put(op_name, a, b, value)
+            return value
+        return cached
+
+    # ---------- housekeeping ----------
+    def _remember(self, key: Tuple[str, str, str], value: Any) -> None:
+        if len(self._memory) >= _MEMORY_LIMIT:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = value
+
+    def _touch(self, key: Tuple[str, str, str]) -> None:
+        # recency is written back in batches: a hit should not cost a write
+        self._touched[key] = self._tick
+        if len(self._touched) >= _TOUCH_BATCH:
+            self._write_touches()
+
+    def _write_touches(self) -> None:
+        if not self._touched:
+            return
+        with self._conn:  # one transaction for the whole batch
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE results SET used = ? WHERE mode = ? AND operation = ? AND a = ? AND b = ?",
+                ((tick, self.mode_key, *key) for key, tick in self._touched.items()),
+            )
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        self._write_touches()
+        # trim 10% below the bound so eviction does not run on every insert
+        excess = self._count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM results WHERE (mode, operation, a, b) IN "
+            "(SELECT mode, operation, a, b FROM results ORDER BY used LIMIT ?)",
+            (excess,),
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        self._memory.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_touches()
+
+    def clear(self) -> int:
+        with self._lock:
+            n = self._conn.execute("DELETE FROM results").rowcount
+            self._count = 0
+            self._memory.clear()
+            self._touched.clear()
+            self.hits = self.misses = 0
+            return n
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    # ---------- reporting ----------
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return (f"hits={self.hits} misses={self.misses} hit rate={self.hit_rate:.1%} "
+                f"entries={self._count}/{self.max_entries}")
+
+
+def open_cache(mode: str, directory: Path, mode_key: str, max_entries: int) -> ResultCache | None:
+    """The session's cache, or None when CALCULATOR_RESULT_CACHE is off."""
+    if mode == "off":
+        return None
+    if mode not in CACHE_MODES:
+        raise OperationError(f"Unknown result cache mode: {mode} (expected one of {', '.join(CACHE_MODES)})")
+    return ResultCache(Path(directory) / "results.db", mode_key, max_entries)
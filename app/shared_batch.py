@@ -0,0 +1,164 @@
+# app/shared_batch.py
+"""
+Evaluate one operation over large operand arrays on several cores.
+
+Operands, results and per-element error codes live in
+multiprocessing.shared_memory blocks. Workers attach to them by name and
+fill in their index range in place, so only (block names, lo, hi) is
+pickled per task, however large the arrays are. Each worker runs the same
+float kernels as Calculator.execute (app/operations.py, plugins included).
+"""
+from __future__ import annotations
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .cost_guard import mp_context
+from .exceptions import OperationError
+from .numeric import Kernel, get_backend
+
+__all__ = ["OK", "ERR_OPERATION", "ERR_INPUT", "ERR_INTERNAL", "ERR_UNREADABLE", "ERROR_NAMES", "BatchResult", "start_pool", "evaluate"]
+
+OK, ERR_OPERATION, ERR_INPUT, ERR_INTERNAL, ERR_UNREADABLE = 0, 1, 2, 3, 4
+ERROR_NAMES = {
+    ERR_OPERATION: "operation error",  # the kernel raised OperationError (e.g. division by zero)
+    ERR_INPUT: "input out of range",   # |a| or |b| above CALCULATOR_MAX_INPUT_VALUE
+    ERR_INTERNAL: "invalid result",    # anything else (e.g. a complex or non-numeric result)
+    ERR_UNREADABLE: "unreadable row",  # set by app.batch for missing or non-numeric operands
+}
+
+# below this many elements forking workers costs more than it saves
+MIN_PARALLEL = 200_000
+_TASKS_PER_WORKER = 4
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """results[i] is NaN wherever errors[i] != OK."""
+    results: np.ndarray  # float64
+    errors: np.ndarray   # uint8 codes
+
+    @property
+    def error_count(self) -> int:
+        return int(np.count_nonzero(self.errors))
+
+    def error_counts(self) -> Dict[str, int]:
+        codes, counts = np.unique(self.errors[self.errors != OK], return_counts=True)
+        return {ERROR_NAMES.get(int(c), str(int(c))): int(n) for c, n in zip(codes, counts)}
+
+
+def _eval_range(kernel: Kernel, a: np.ndarray, b: np.ndarray, out: np.ndarray,
+                err: np.ndarray, lo: int, hi: int) -> None:
+    """The per-element loop, on plain lists (much faster than indexing numpy scalars)."""
+    codes = err[lo:hi].tolist()
+    res = [math.nan] * (hi - lo)
+    for i, (x, y) in enumerate(zip(a[lo:hi].tolist(), b[lo:hi].tolist())):
+        if codes[i]:
+            continue
+        try:
+            res[i] = float(kernel(x, y))
+        except OperationError:
+            codes[i] = ERR_OPERATION
+        except Exception:
+            codes[i] = ERR_INTERNAL
+    out[lo:hi] = res
+    err[lo:hi] = codes
+
+
+def _worker(names: Tuple[str, str, str, str], n: int, op_name: str, lo: int, hi: int) -> None:
+    # pool workers share the parent's resource tracker, which the parent's
+    # unlink() settles; attaching only re-registers the same names
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        a, b, out = (np.ndarray((n,), np.float64, buffer=blk.buf) for blk in blocks[:3])
+        err = np.ndarray((n,), np.uint8, buffer=blocks[3].buf)
+        _eval_range(get_backend("float").resolve(op_name), a, b, out, err, lo, hi)
+        del a, b, out, err  # release the buffers before closing
+    finally:
+        for blk in blocks:
+            blk.close()
+
+
+def _operands(a: Any, b: Any) -> Tuple[np.ndarray, np.ndarray]:
+    try:
+        a_arr, b_arr = np.broadcast_arrays(np.asarray(a, np.float64), np.asarray(b, np.float64))
+    except ValueError as exc:
+        raise OperationError(f"Operand arrays do not match: {exc}") from exc
+    if a_arr.ndim != 1:
+        raise OperationError("Operands must be 1-D arrays (or scalars)")
+    return a_arr, b_arr
+
+
+def _ranges(n: int, parts: int) -> List[Tuple[int, int]]:
+    step = -(-n // parts)
+    return [(lo, min(lo + step, n)) for lo in range(0, n, step)]
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    A worker pool that evaluate(..., pool=) can reuse across calls, instead of
+    starting one per call. The workers are started here, so a caller that does
+    this before starting threads of its own still gets cheap forked workers.
+    """
+    pool = ProcessPoolExecutor(workers, mp_context=mp_context())
+    try:
+        pool.submit(int).result()  # a forking pool starts every worker on its first task
+    except BaseException:
+        pool.shutdown(cancel_futures=True)
+        raise
+    return pool
+
+
+def evaluate(op_name: str, a: Any, b: Any, workers: int | None = None,
+             max_input: float = math.inf, min_parallel: int = MIN_PARALLEL,
+             pool: ProcessPoolExecutor | None = None) -> BatchResult:
+    """
+    Apply `op_name` element-wise to float64 operands (arrays or scalars, broadcast
+    to one length). Errors never stop the batch: they are reported per element.
+    Batches shorter than `min_parallel`, or workers=1, run in this process. Others
+    run on `pool` when given (see start_pool), else on a pool for this call only.
+    """
+    kernel = get_backend("float").resolve(op_name)  # unknown operations fail before any work
+    a_arr, b_arr = _operands(a, b)
+    n = a_arr.shape[0]
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1 or n < min_parallel:
+        out = np.empty(n, np.float64)
+        err = ((np.abs(a_arr) > max_input) | (np.abs(b_arr) > max_input)).astype(np.uint8) * ERR_INPUT
+        _eval_range(kernel, a_arr, b_arr, out, err, 0, n)
+        return BatchResult(out, err)
+
+    sizes = (n * 8, n * 8, n * 8, n)
+    blocks = [shared_memory.SharedMemory(create=True, size=max(1, size)) for size in sizes]
+    try:
+        sa, sb, out = (np.ndarray((n,), np.float64, buffer=blk.buf) for blk in blocks[:3])
+        err = np.ndarray((n,), np.uint8, buffer=blocks[3].buf)
+        sa[:], sb[:] = a_arr, b_arr
+        np.multiply((np.abs(sa) > max_input) | (np.abs(sb) > max_input), ERR_INPUT, out=err, casting="unsafe")
+        names = tuple(blk.name for blk in blocks)
+        own = pool is None
+        if own:
+            pool = ProcessPoolExecutor(workers, mp_context=mp_context())
+        try:
+            tasks = [pool.submit(_worker, names, n, op_name, lo, hi)
+                     for lo, hi in _ranges(n, workers * _TASKS_PER_WORKER)]
+            for task in tasks:
+                task.result()
+        finally:
+            if own:
+                pool.shutdown()
+        result = BatchResult(out.copy(), err.copy())
+        del sa, sb, out, err
+        return result
+    finally:
+        for blk in blocks:
+            try:
+                blk.close()
+            except BufferError:
+                pass  # a view is still referenced from a failing frame; unmapped on gc
+            blk.unlink()
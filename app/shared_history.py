@@ -0,0 +1,140 @@
+# app/shared_history.py
+from __future__ import annotations
+import csv
+import io
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from .calculation import Calculation
+from .history_export import COLUMNS, csv_rows
+
+try:  # advisory locks are POSIX-only; elsewhere writers are not serialized
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+__all__ = ["SharedHistoryFile"]
+
+_HEADER = ",".join(COLUMNS)
+
+
+class SharedHistoryFile:
+    """
+    A history CSV shared by several calculator processes.
+
+    The file is an append-only log keyed by Calculation.uid:
+    - writers take an exclusive fcntl lock on `<file>.lock`, first read whatever
+      other processes appended since their last visit, then append only the
+      records the file does not have yet (merge-on-write), and fsync
+    - each instance remembers the byte offset it has consumed, so picking up
+      other processes' records (read_new) reads only the new tail
+
+    Undo does not remove records that were already appended, and a record
+    appended again (redo after the history forgot it) is loaded once.
+    """
+    def __init__(self, path: Path, encoding: str = "utf-8") -> None:
+        self.path = Path(path)
+        self.encoding = encoding
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._offset = 0
+        self._ino: int | None = None
+        self._seen: set[str] = set()
+
+    # ---------- locking ----------
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "a+b") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    # ---------- reading ----------
+    def _read_tail(self) -> List[Calculation]:
+        """Parse complete rows past our offset; caller holds the lock."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._offset, self._ino = 0, None
+            return []
+        if st.st_ino != self._ino or st.st_size < self._offset:
+            # replaced (e.g. a full rewrite) or truncated: rescan, uids dedupe for us
+            self._offset, self._ino = 0, st.st_ino
+        if st.st_size == self._offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        end = data.rfind(b"\n") + 1  # a torn last line is left for later
+        if not end:
+            return []
+        text = data[:end].decode(self.encoding, errors="replace")
+        self._offset += end
+
+        fresh: List[Calculation] = []
+        for row in csv.reader(io.StringIO(text)):
+            if len(row) != len(COLUMNS) or row[0] == "id":
+                continue  # header or a row torn by a crashed writer
+            try:
+                c = Calculation.from_dict(dict(zip(COLUMNS, row)))
+            except (ValueError, ZeroDivisionError):
+                continue
+            if c.uid and c.uid not in self._seen:
+                self._seen.add(c.uid)
+                fresh.append(c)
+        return fresh
+
+    def read_new(self) -> List[Calculation]:
+        """Records other processes appended since the last read/append."""
+        with self._locked(exclusive=False):
+            return self._read_tail()
+
+    # ---------- writing ----------
+    def append(self, calcs: Iterable[Calculation]) -> Tuple[List[Calculation], int]:
+        """
+        Merge-on-write: under the exclusive lock, pick up foreign records, then
+        append the given records whose uid the file does not contain yet.
+        Returns (foreign records picked up, number of records appended).
+        """
+        with self._locked(exclusive=True):
+            foreign = self._read_tail()
+            held = {c.uid for c in foreign if c.uid}
+            fresh: List[Calculation] = []
+            for c in calcs:
+                c = c.with_timestamp()
+                held.add(c.uid)  # type: ignore[arg-type]
+                if c.uid not in self._seen:
+                    fresh.append(c)
+            if fresh:
+                self._write(fresh)
+            # remember only the uids the history still holds (or is about to merge):
+            # ones it trimmed or cleared are not offered again, so this never outgrows it
+            self._seen = held
+            return foreign, len(fresh)
+
+    def _write(self, fresh: List[Calculation]) -> None:
+        """Append `fresh` and fsync; caller holds the exclusive lock."""
+        with open(self.path, "ab") as raw:
+            size = raw.tell()
+            buf = io.StringIO()
+            if size == 0:
+                buf.write(_HEADER + os.linesep)
+            else:
+                with open(self.path, "rb") as check:
+                    check.seek(size - 1)
+                    if check.read(1) != b"\n":
+                        buf.write(os.linesep)  # seal a torn line left by a crash
+            csv.writer(buf, lineterminator=os.linesep).writerows(csv_rows(fresh))
+            raw.write(buf.getvalue().encode(self.encoding))
+            raw.flush()
+            os.fsync(raw.fileno())
+            end = raw.tell()
+        if self._offset == size:
+            # nobody else wrote in between (we hold the lock); skip re-reading our rows
+            self._offset, self._ino = end, os.stat(self.path).st_ino
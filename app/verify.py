@@ -0,0 +1,227 @@
+# app/verify.py
+"""
+Recompute every row of a saved history with the current operations.
+
+    python -m app.verify [path] [--tol 1e-9] [--workers N]
+
+exits 1 when any stored result no longer matches, so it can gate changes
+to operation semantics.
+"""
+from __future__ import annotations
+import argparse
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from .calculation import Calculation
+from .calculator_config import load_config
+from .cost_guard import RISKY_OPS, check_cost, mp_context
+from .exceptions import OperationError
+from .history_export import COLUMNS, read_records
+from .history_store import PartitionedHistoryStore, SqliteHistoryStore, backend_for
+from .numeric import Kernel, get_backend
+from .operations import REDUCTIONS
+from .plugins import load_plugins
+
+__all__ = ["Mismatch", "VerifyReport", "iter_history_rows", "verify_history", "format_report", "main"]
+
+_MAX_SAMPLES = 10
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    uid: str
+    operation: str
+    a: Any
+    b: Any
+    stored: Any
+    actual: Any  # the recomputed value, or the error it raised
+
+    def __str__(self) -> str:
+        return f"{self.uid}: {self.operation}({self.a}, {self.b}) stored {self.stored}, now {self.actual}"
+
+
+@dataclass
+class VerifyReport:
+    checked: int = 0
+    mismatches: int = 0
+    skipped: int = 0  # rows that could not be parsed
+    reductions: int = 0  # sum/mean/... rows: their inputs are not stored
+    too_costly: int = 0  # power/root rows over the exact-mode digit limit: not recomputed
+    samples: List[Mismatch] = field(default_factory=list)
+
+    def add(self, part: "VerifyReport") -> None:
+        self.checked += part.checked
+        self.mismatches += part.mismatches
+        self.skipped += part.skipped
+        self.reductions += part.reductions
+        self.too_costly += part.too_costly
+        self.samples.extend(part.samples[: _MAX_SAMPLES - len(self.samples)])
+
+    @property
+    def ok(self) -> bool:
+        return self.mismatches == 0
+
+    def summary(self) -> str:
+        text = f"verified {self.checked} row(s): {self.mismatches} mismatch(es)"
+        if self.skipped:
+            text += f", {self.skipped} unreadable row(s) skipped"
+        if self.reductions:
+            text += f", {self.reductions} reduction(s) not recomputable"
+        if self.too_costly:
+            text += f", {self.too_costly} row(s) over the result digit limit skipped"
+        return text
+
+
+def iter_history_rows(path: Path, encoding: str = "utf-8") -> Iterator[tuple]:
+    """Stream raw history rows (COLUMNS order) from any format the app writes."""
+    path = Path(path)
+    if not path.exists():
+        raise OperationError(f"No history file at {path}")
+    backend = backend_for(path, "partitioned" if path.is_dir() else "csv")
+    if backend == "sqlite":
+        return SqliteHistoryStore(path, encoding).iter_rows()
+    if backend == "partitioned":
+        return PartitionedHistoryStore(path, encoding).iter_rows()
+    return read_records(path, encoding=encoding)
+
+
+def _close(stored: Any, actual: Any, tol: float) -> bool:
+    if stored == actual:
+        return True
+    try:
+        s, a = float(stored), float(actual)
+    except (TypeError, ValueError, OverflowError):
+        return False
+    if math.isnan(s) or math.isnan(a):
+        return math.isnan(s) and math.isnan(a)
+    return math.isclose(s, a, rel_tol=tol, abs_tol=tol)
+
+
+def _check_chunk(mode: str, precision: int, tol: float, rows: Sequence[tuple],
+                 max_digits: int = 0) -> VerifyReport:
+    """Worker: recompute one chunk of rows."""
+    backend = get_backend(mode, precision)
+    # the same up-front cost check the calculator applies to unbounded numbers
+    max_digits = 0 if backend.bounded else max_digits
+    kernels: Dict[str, Kernel] = {}
+    report = VerifyReport()
+    for row in rows:
+        try:
+            c = Calculation.from_dict(dict(zip(COLUMNS, row)))
+        except (ValueError, ZeroDivisionError, TypeError):
+            report.skipped += 1
+            continue
+        if c.operation in REDUCTIONS:
+            report.reductions += 1
+            continue
+        a, b = c.a, c.b
+        if backend.coerce is not None:
+            a, b = backend.coerce(a), backend.coerce(b)
+        if max_digits and c.operation in RISKY_OPS:
+            try:
+                check_cost(c.operation, a, b, max_digits)
+            except OperationError:
+                report.too_costly += 1
+                continue
+        try:
+            kernel = kernels.get(c.operation)
+            if kernel is None:
+                kernel = kernels[c.operation] = backend.resolve(c.operation)
+            actual: Any = kernel(a, b)
+        except Exception as exc:  # e.g. a plugin's ValueError: one row, not the whole run
+            actual = f"error: {exc}"
+        report.checked += 1
+        if not _close(c.result, actual, tol):
+            report.mismatches += 1
+            if len(report.samples) < _MAX_SAMPLES:
+                report.samples.append(Mismatch(c.uid or "", c.operation, c.a, c.b, c.result, actual))
+    return report
+
+
+def verify_history(
+    path: Path,
+    tol: float = 1e-9,
+    workers: int | None = None,
+    chunk_size: int = 10_000,
+    mode: str | None = None,
+    precision: int | None = None,
+    max_digits: int | None = None,
+) -> VerifyReport:
+    """
+    Stream `path` in chunks and recompute each (operation, a, b) with the
+    current numeric backend, fanning chunks out to a process pool. Results
+    within `tol` (relative or absolute) match. At most 2 * workers chunks are
+    in flight, so memory stays flat however large the file is. With exact
+    numbers, power/root rows that fail the cost check for `max_digits`
+    (default CALCULATOR_MAX_RESULT_DIGITS) are counted, not recomputed.
+    """
+    cfg = load_config()
+    mode = mode or cfg.numeric_mode
+    precision = cfg.precision if precision is None else precision
+    max_digits = cfg.max_result_digits if max_digits is None else max_digits
+    workers = max(1, workers or os.cpu_count() or 1)
+    rows = iter_history_rows(path, cfg.default_encoding)
+    chunks: Iterator[List[tuple]] = iter(lambda: list(islice(rows, chunk_size)), [])
+    report = VerifyReport()
+
+    first = next(chunks, None)
+    if first is None:
+        return report
+    if workers == 1 or len(first) < chunk_size:
+        # a single chunk is not worth starting a pool for
+        for chunk in chain([first], chunks):
+            report.add(_check_chunk(mode, precision, tol, chunk, max_digits))
+        return report
+
+    # spawned or forkserver workers start without the plugin operations
+    with ProcessPoolExecutor(workers, mp_context=mp_context(), initializer=load_plugins,
+                             initargs=(cfg.plugin_dir,)) as pool:
+        pending: deque = deque()
+        for chunk in chain([first], chunks):
+            pending.append(pool.submit(_check_chunk, mode, precision, tol, chunk, max_digits))
+            if len(pending) >= 2 * workers:
+                report.add(pending.popleft().result())
+        while pending:
+            report.add(pending.popleft().result())
+    return report
+
+
+def format_report(report: VerifyReport) -> str:
+    lines = [report.summary()]
+    lines += [f"  {m}" for m in report.samples]
+    if report.mismatches > len(report.samples):
+        lines.append(f"  ... {report.mismatches - len(report.samples)} more")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Sequence[str]) -> Tuple[Path | None, float, int | None]:
+    parser = argparse.ArgumentParser(prog="verify", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", type=Path, help="history file (default: the configured one)")
+    parser.add_argument("--tol", type=float, default=1e-9, help="relative/absolute tolerance")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ns = parser.parse_args(list(argv))
+    return ns.path, ns.tol, ns.workers
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    path, tol, workers = parse_args(sys.argv[1:] if argv is None else argv)
+    cfg = load_config()
+    load_plugins(cfg.plugin_dir)  # plugin rows recompute like any other
+    try:
+        report = verify_history(path or cfg.history_dir / cfg.history_file, tol=tol, workers=workers)
+    except OperationError as exc:
+        sys.stderr.write(f"error: {exc}\n")
+        return 2
+    print(format_report(report))
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())  # pragma: no cover
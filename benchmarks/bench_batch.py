@@ -0,0 +1,46 @@
+# benchmarks/bench_batch.py
+"""
+Throughput of shared-memory batch evaluation by worker count.
+
+    python -m benchmarks.bench_batch [--n N] [--op divide]
+
+Runs the same batch with 1, 2, 4, ... workers (up to the CPU count) and
+prints elements per second and the speedup over one worker.
+"""
+from __future__ import annotations
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.shared_batch import evaluate
+
+
+def run(n: int, op: str) -> list[tuple[int, float]]:
+    rng = np.random.default_rng(0)
+    a, b = rng.uniform(-100, 100, n), rng.uniform(-10, 10, n)
+    rows: list[tuple[int, float]] = []
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        evaluate(op, a, b, workers=workers, min_parallel=0)
+        rows.append((workers, n / (time.perf_counter() - start)))
+        workers *= 2
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=5_000_000)
+    parser.add_argument("--op", default="divide")
+    ns = parser.parse_args()
+    rows = run(ns.n, ns.op)
+    print(f"{'workers':>8}{'elem/s':>14}{'speedup':>10}")
+    for workers, rate in rows:
+        print(f"{workers:>8}{rate:>14,.0f}{rate / rows[0][1]:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
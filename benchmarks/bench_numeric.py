@@ -0,0 +1,57 @@
+# benchmarks/bench_numeric.py
+"""
+Per-operation cost of each numeric backend.
+
+    python -m benchmarks.bench_numeric [--number N]
+
+Times the resolved kernel call (what Calculator.execute pays once the backend
+is chosen), with operands already parsed into the backend's number type.
+"""
+from __future__ import annotations
+import argparse
+import timeit
+
+from app.numeric import MODES, get_backend
+
+# operands every operation accepts (root needs an integral degree)
+_OPERANDS = {
+    "add": ("1234.5678", "8765.4321"),
+    "subtract": ("1234.5678", "8765.4321"),
+    "multiply": ("1234.5678", "8765.4321"),
+    "divide": ("1234.5678", "3"),
+    "power": ("1.5", "7"),
+    "root": ("1234.5678", "3"),
+    "modulus": ("1234.5678", "7"),
+    "int_divide": ("1234.5678", "7"),
+    "percent": ("1234.5678", "8765.4321"),
+    "abs_diff": ("1234.5678", "8765.4321"),
+}
+
+
+def run(number: int, precision: int = 28) -> list[tuple[str, str, float]]:
+    rows: list[tuple[str, str, float]] = []
+    for mode in MODES:
+        backend = get_backend(mode, precision)
+        for op, (sa, sb) in _OPERANDS.items():
+            kernel = backend.resolve(op)
+            a, b = backend.parse(sa), backend.parse(sb)
+            best = min(timeit.repeat(lambda: kernel(a, b), number=number, repeat=5))
+            rows.append((op, mode, best / number * 1e9))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=100_000)
+    parser.add_argument("--precision", type=int, default=28)
+    ns = parser.parse_args()
+    rows = run(ns.number, ns.precision)
+    table = {(op, mode): ns_per for op, mode, ns_per in rows}
+    print(f"{'operation':<12}" + "".join(f"{m + ' ns/op':>16}" for m in MODES))
+    for op in _OPERANDS:
+        print(f"{op:<12}" + "".join(f"{table[(op, m)]:>16.0f}" for m in MODES))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
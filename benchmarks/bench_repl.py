@@ -0,0 +1,51 @@
+# benchmarks/bench_repl.py
+"""
+Per-line cost of the REPL front end.
+
+    python -m benchmarks.bench_repl [--number N]
+
+Times process_line end to end (tokenize, dispatch, parse, execute, format)
+and the tokenizer alone, for a plain `op a b` line (fast path) and a quoted
+one (shlex fallback).
+"""
+from __future__ import annotations
+import argparse
+import shlex
+import timeit
+
+from app.calculator import Calculator
+from app.repl import _tokenize, process_line
+
+_LINES = {
+    "plain": "add 1.5 2.25",
+    "quoted": "add '1.5' \"2.25\"",
+}
+
+
+def run(number: int) -> list[tuple[str, str, float]]:
+    calc = Calculator(observers=[])
+    rows: list[tuple[str, str, float]] = []
+    for label, line in _LINES.items():
+        for what, fn in (
+            ("process_line", lambda: process_line(calc, line)),
+            ("tokenize", lambda: _tokenize(line)),
+            ("shlex.split", lambda: shlex.split(line)),
+        ):
+            best = min(timeit.repeat(fn, number=number, repeat=5))
+            rows.append((label, what, best / number * 1e6))
+    calc.history.clear()
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20_000)
+    ns = parser.parse_args()
+    print(f"{'line':<8}{'step':<14}{'us/line':>10}")
+    for label, what, us in run(ns.number):
+        print(f"{label:<8}{what:<14}{us:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
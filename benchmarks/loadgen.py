@@ -0,0 +1,377 @@
+# benchmarks/loadgen.py
+"""
+Reproducible synthetic load for sizing a deployment.
+
+    python -m benchmarks.loadgen [--steps N] [--mix add=3,divide=1] [--operands normal:0:100]
+                                 [--error-rate P] [--undo P] [--redo P] [--seed S]
+                                 [--target repl|api|process]... [--autosave] [--config workloads.json]
+
+A workload is a seeded stream of steps: operations drawn from the built-in
+operations with the given weights, operands from a distribution, a share of
+steps made to fail on purpose (zero divisors, even roots of negatives), and
+undo/redo at the given rates. The same seed always gives the same steps.
+Each (workload, target) pair gets a fresh calculator and reports throughput,
+latency percentiles and the peak resident memory of the run. Targets:
+- repl:    process_line() in this process (tokenize, dispatch, format)
+- api:     Calculator.execute() / history.undo() / history.redo()
+- process: `python -m app.repl` in a child process, driven over its stdin.
+  It runs as deployed, with autosave under the configured CALCULATOR_* settings.
+The in-process targets do not persist anything unless the workload sets
+autosave (--autosave); the report's "saves" column says which runs did.
+
+--config takes a JSON list of workloads, each with the same keys as the flags
+(plus "name" and "targets"), to size several configurations in one run.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from app.calculator import AutoSaveObserver, Calculator
+from app.exceptions import OperationError
+from app.operations import _FACTORY
+from app.repl import process_line
+from app.sketch import KllSketch
+
+TARGETS = ("repl", "api", "process")
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# how an injected failure looks for each operation that can fail
+_FAILURES: Dict[str, Callable[[float, float], Tuple[float, float]]] = {
+    "divide": lambda a, b: (a, 0.0),
+    "modulus": lambda a, b: (a, 0.0),
+    "int_divide": lambda a, b: (a, 0.0),
+    "percent": lambda a, b: (a, 0.0),
+    "root": lambda a, b: (-abs(a) or -1.0, 2.0),
+    "power": lambda a, b: (0.0, -abs(b) or -1.0),
+}
+_ZERO_DIVISOR = frozenset({"divide", "modulus", "int_divide", "percent"})
+_LATENCY_BATCH = 4096
+_PROMPT = re.compile(rb"(?:^|\n)> ")
+_ROOT = Path(__file__).resolve().parents[1]
+
+
+# ---------------- workloads ----------------
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """uniform:LO:HI, normal:MU:SIGMA, lognormal:MU:SIGMA or int:LO:HI."""
+    kind, *params = spec.split(":")
+    try:
+        x, y = (float(p) for p in params)
+    except ValueError:
+        raise ValueError(f"Bad operand distribution: {spec} (expected e.g. uniform:-100:100)") from None
+    if kind == "uniform":
+        return lambda rng: rng.uniform(x, y)
+    if kind == "normal":
+        return lambda rng: rng.gauss(x, y)
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(x, y)
+    if kind == "int":
+        return lambda rng: float(rng.randint(int(x), int(y)))
+    raise ValueError(f"Unknown operand distribution: {kind} (expected uniform, normal, lognormal or int)")
+
+
+def parse_mix(spec: str | Dict[str, float] | None) -> Tuple[Tuple[str, float], ...]:
+    """'add=3,divide=1' (or a dict) -> weighted built-in operations; None -> all, equally."""
+    if not spec:
+        return tuple((name, 1.0) for name in _FACTORY)
+    if isinstance(spec, str):
+        pairs = [part.partition("=") for part in spec.split(",") if part.strip()]
+        spec = {name.strip(): float(weight) if eq else 1.0 for name, eq, weight in pairs}
+    mix = tuple((name.lower(), float(w)) for name, w in spec.items() if float(w) > 0)
+    unknown = [name for name, _ in mix if name not in _FACTORY]
+    if unknown or not mix:
+        raise ValueError(f"Mix needs built-in operations ({', '.join(_FACTORY)}), got: {', '.join(unknown) or 'nothing'}")
+    return mix
+
+
+@dataclass(frozen=True)
+class Step:
+    kind: str          # "op", "undo" or "redo"
+    op: str = ""
+    a: float = 0.0
+    b: float = 0.0
+    injected: bool = False  # made to fail on purpose
+
+    def line(self) -> str:
+        return f"{self.op} {self.a!r} {self.b!r}" if self.kind == "op" else self.kind
+
+
+@dataclass(frozen=True)
+class Workload:
+    name: str = "default"
+    steps: int = 10_000
+    mix: Tuple[Tuple[str, float], ...] = field(default_factory=parse_mix)
+    operands: str = "uniform:-1000:1000"
+    error_rate: float = 0.0
+    undo_rate: float = 0.0
+    redo_rate: float = 0.0
+    seed: int = 0
+    targets: Tuple[str, ...] = ("repl", "api")
+    autosave: bool = False  # in-process targets save like a deployed session
+
+    def __post_init__(self) -> None:
+        parse_distribution(self.operands)
+        if not all(0 <= p <= 1 for p in (self.error_rate, self.undo_rate, self.redo_rate)):
+            raise ValueError("Rates must be between 0 and 1")
+        if self.undo_rate + self.redo_rate > 1:
+            raise ValueError("Undo and redo rates add up to more than 1")
+        if self.error_rate and not any(name in _FAILURES for name, _ in self.mix):
+            raise ValueError(f"An error rate needs one of {', '.join(_FAILURES)} in the mix")
+        unknown = [t for t in self.targets if t not in TARGETS]
+        if unknown:
+            raise ValueError(f"Unknown target: {', '.join(unknown)} (expected {', '.join(TARGETS)})")
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Workload":
+        d = dict(d)
+        if "mix" in d:
+            d["mix"] = parse_mix(d["mix"])
+        if "targets" in d:
+            d["targets"] = tuple(d["targets"])
+        return cls(**d)
+
+    def __iter__(self) -> Iterator[Step]:
+        """The steps, generated lazily; the same seed always yields the same ones."""
+        rng = random.Random(self.seed)
+        draw = parse_distribution(self.operands)
+        names, weights = zip(*self.mix)
+        failing = [(n, w) for n, w in self.mix if n in _FAILURES]
+        for _ in range(self.steps):
+            r = rng.random()
+            if r < self.undo_rate:
+                yield Step("undo")
+                continue
+            if r < self.undo_rate + self.redo_rate:
+                yield Step("redo")
+                continue
+            a, b = draw(rng), draw(rng)
+            if failing and rng.random() < self.error_rate:
+                op = rng.choices([n for n, _ in failing], [w for _, w in failing])[0]
+                yield Step("op", op, *_FAILURES[op](a, b), injected=True)
+                continue
+            op = rng.choices(names, weights)[0]
+            yield Step("op", op, *_valid(op, a, b, rng))
+
+
+def _valid(op: str, a: float, b: float, rng: random.Random) -> Tuple[float, float]:
+    """Shape drawn operands so an un-injected step succeeds."""
+    if op == "root":  # odd roots of negatives come back complex from Root, so stay non-negative
+        return abs(a), float(rng.choice((2, 3, 4)))
+    if op == "power":
+        return a, max(-4.0, min(4.0, round(b))) if a else abs(round(b))
+    if op in _ZERO_DIVISOR and b == 0:
+        return a, 1.0
+    return a, b
+
+
+# ---------------- targets ----------------
+class _Api:
+    def __init__(self, autosave: bool = False) -> None:
+        self.calc = Calculator(observers=[AutoSaveObserver()] if autosave else [])
+
+    def __call__(self, step: Step) -> bool:
+        try:
+            if step.kind == "op":
+                self.calc.execute(step.op, step.a, step.b)
+            elif step.kind == "undo":
+                self.calc.history.undo()
+            else:
+                self.calc.history.redo()
+            return False
+        except OperationError:
+            return True
+
+    def close(self) -> int | None:
+        self.calc.flush()  # write whatever the save policy still holds
+        return None
+
+
+class _Repl(_Api):
+    def __call__(self, step: Step) -> bool:
+        return process_line(self.calc, step.line())[1].startswith("error:")
+
+
+class _Process:
+    """`python -m app.repl` over pipes; a step ends when the next prompt arrives."""
+    def __init__(self, env: Dict[str, str] | None = None) -> None:
+        self.proc = subprocess.Popen([sys.executable, "-m", "app.repl"], cwd=_ROOT,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     env={**os.environ, **(env or {})})
+        self._buf = b""
+        self._read_until_prompt()  # banner
+
+    def _read_until_prompt(self) -> bytes:
+        assert self.proc.stdout is not None
+        fd = self.proc.stdout.fileno()
+        while (m := _PROMPT.search(self._buf)) is None:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise OperationError(f"calculator process exited (status {self.proc.wait()})")
+            self._buf += chunk
+        out, self._buf = self._buf[:m.start()], self._buf[m.end():]
+        return out
+
+    def __call__(self, step: Step) -> bool:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(step.line().encode() + b"\n")
+        self.proc.stdin.flush()
+        return any(line.startswith(b"error:") for line in self._read_until_prompt().splitlines())
+
+    def close(self) -> int | None:
+        peak = _status_kb(self.proc.pid)
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(b"exit\n")
+        self.proc.stdin.close()
+        self.proc.wait(timeout=60)
+        return peak
+
+
+def _status_kb(pid: int | str = "self") -> int | None:
+    """VmHWM (peak resident set) of a process, where /proc has it."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak() -> bool:
+    """Restart this process's VmHWM from its current RSS (Linux); False if not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# ---------------- running ----------------
+@dataclass(frozen=True)
+class LoadReport:
+    workload: str
+    target: str
+    steps: int
+    seconds: float           # time spent inside the target (harness overhead excluded)
+    latency_us: Tuple[float, ...]  # at PERCENTILES
+    max_us: float
+    errors: int
+    injected: int
+    undos: int
+    redos: int
+    peak_rss_kb: int | None
+    lifetime_peak: bool = False    # this process's peak since it started (no per-run reset)
+    saves: bool = True             # whether the run paid for persisting its history
+
+    @property
+    def throughput(self) -> float:
+        return self.steps / self.seconds if self.seconds else 0.0
+
+
+def run(workload: Workload, target: str, env: Dict[str, str] | None = None) -> LoadReport:
+    """Drive one target with one workload (env only reaches the process target)."""
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target: {target} (expected {', '.join(TARGETS)})")
+    reset = target == "process" or _reset_peak()
+    if target == "process":
+        driver: _Api | _Process = _Process(env)
+    else:
+        driver = (_Repl if target == "repl" else _Api)(workload.autosave)
+    sketch, pending = KllSketch(seed=workload.seed), []
+    busy = errors = injected = undos = redos = 0
+    clock = time.perf_counter_ns
+    try:
+        for step in workload:
+            start = clock()
+            failed = driver(step)
+            elapsed = clock() - start
+            busy += elapsed
+            pending.append(elapsed / 1000)
+            if len(pending) >= _LATENCY_BATCH:
+                sketch.extend(pending)
+                pending.clear()
+            errors += failed
+            injected += step.injected
+            undos += step.kind == "undo"
+            redos += step.kind == "redo"
+    finally:
+        peak = driver.close()
+    sketch.extend(pending)
+    if target != "process":
+        peak = _status_kb() or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return LoadReport(workload.name, target, sketch.n, busy / 1e9, tuple(sketch.quantiles(PERCENTILES)),
+                      sketch.max if sketch.n else 0.0, errors, injected, undos, redos, peak,
+                      lifetime_peak=not reset, saves=target == "process" or workload.autosave)
+
+
+def format_reports(reports: Sequence[LoadReport]) -> str:
+    head = ["workload", "target", "steps", "steps/s"] + [f"p{round(q * 100)} us" for q in PERCENTILES]
+    head += ["max us", "errors", "injected", "undo", "redo", "peak MB", "saves"]
+    rows = [head]
+    for r in reports:
+        peak = "n/a" if r.peak_rss_kb is None else f"{r.peak_rss_kb / 1024:.1f}" + ("*" if r.lifetime_peak else "")
+        rows.append([r.workload, r.target, str(r.steps), f"{r.throughput:,.0f}"]
+                    + [f"{v:.1f}" for v in r.latency_us]
+                    + [f"{r.max_us:.1f}", str(r.errors), str(r.injected), str(r.undos), str(r.redos), peak,
+                       "yes" if r.saves else "no"])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(head))]
+    lines = ["  ".join(cell.rjust(w) if i > 1 else cell.ljust(w) for i, (cell, w) in enumerate(zip(row, widths)))
+             for row in rows]
+    if any(r.lifetime_peak for r in reports):
+        lines.append("* peak since this process started (per-run reset not available)")
+    if not all(r.saves for r in reports):
+        lines.append("saves=no: in-process run without autosave, so persistence is excluded (use --autosave)")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Sequence[str]) -> Tuple[argparse.Namespace, List[Workload]]:
+    parser = argparse.ArgumentParser(prog="loadgen", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", type=Path, default=None, help="JSON list of workloads")
+    parser.add_argument("--name", default="default")
+    parser.add_argument("--steps", type=int, default=10_000)
+    parser.add_argument("--mix", default=None, help="weighted operations, e.g. add=3,divide=1 (default: all)")
+    parser.add_argument("--operands", default="uniform:-1000:1000",
+                        help="uniform:LO:HI, normal:MU:SIGMA, lognormal:MU:SIGMA or int:LO:HI")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of steps made to fail")
+    parser.add_argument("--undo", type=float, default=0.0, help="share of steps that undo")
+    parser.add_argument("--redo", type=float, default=0.0, help="share of steps that redo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--autosave", action="store_true",
+                        help="in-process targets autosave under the CALCULATOR_* settings")
+    parser.add_argument("--target", action="append", choices=TARGETS, default=None,
+                        help="repeat for several (default: repl and api)")
+    ns = parser.parse_args(list(argv))
+    try:
+        if ns.config:
+            workloads = [Workload.from_dict(d) for d in json.loads(ns.config.read_text())]
+            if ns.target:
+                workloads = [replace(w, targets=tuple(ns.target)) for w in workloads]
+        else:
+            workloads = [Workload(ns.name, ns.steps, parse_mix(ns.mix), ns.operands, ns.error_rate,
+                                  ns.undo, ns.redo, ns.seed, tuple(ns.target or ("repl", "api")),
+                                  ns.autosave)]
+    except (OSError, TypeError, ValueError) as exc:
+        parser.error(str(exc))
+    return ns, workloads
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    _, workloads = parse_args(sys.argv[1:] if argv is None else argv)
+    reports = [run(w, target) for w in workloads for target in w.targets]
+    print(format_reports(reports))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+# tests/test_atomic_save.py
+import pandas as pd
+import pytest
+
+from app.atomic_io import atomic_write
+from app.calculator import Calculator, AutoSaveObserver
+from app.group_commit import GroupCommitter
+from app.repl import process_line
+
+
+def test_atomic_write_keeps_old_file_when_writer_fails(tmp_path):
+    target = tmp_path / "h.csv"
+    target.write_text("old\n", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with atomic_write(target) as f:
+            f.write("half-written")
+            raise RuntimeError("crash mid-write")
+    assert target.read_text(encoding="utf-8") == "old\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["h.csv"]  # temp file cleaned up
+
+    with atomic_write(target) as f:
+        f.write("new\n")
+    assert target.read_text(encoding="utf-8") == "new\n"
+
+
+def test_group_commit_coalesces_by_count_and_window():
+    writes = []
+    gc = GroupCommitter(lambda: writes.append(1), window_ms=60_000, max_batch=3)
+    assert gc.request() is False and gc.request() is False
+    assert writes == [] and gc.pending == 2
+    assert gc.request() is True
+    assert writes == [1] and gc.pending == 0
+
+    gc.request()
+    assert gc.flush() == 1 and writes == [1, 1]
+    assert gc.flush() == 0  # nothing pending, no write
+
+
+def test_group_commit_timer_flushes_after_window():
+    import threading
+    done = threading.Event()
+    gc = GroupCommitter(done.set, window_ms=20)
+    gc.request()
+    gc.request()
+    assert done.wait(2)
+    assert gc.commits == 1
+
+
+def test_autosave_group_commit_and_sync(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", "true")
+    monkeypatch.setenv("CALCULATOR_SAVE_WINDOW_MS", "60000")
+    monkeypatch.setenv("CALCULATOR_SAVE_BATCH", "2")
+    calc = Calculator(observers=[AutoSaveObserver()])
+    out = tmp_path / "h.csv"
+
+    process_line(calc, "add 1 1")
+    assert not out.exists()
+    process_line(calc, "add 2 2")  # batch full -> one durable write
+    assert len(pd.read_csv(out)) == 2
+
+    process_line(calc, "add 3 3")
+    assert len(pd.read_csv(out)) == 2
+    assert process_line(calc, "sync")[1] == "synced: 1 pending save(s) written"
+    assert len(pd.read_csv(out)) == 3
+    assert process_line(calc, "sync")[1] == "synced: nothing pending"
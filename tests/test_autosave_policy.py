@@ -0,0 +1,110 @@
+# tests/test_autosave_policy.py
+from io import StringIO
+import os
+import signal
+import subprocess
+import sys
+import time
+import pandas as pd
+import pytest
+
+from app.calculator import Calculator, AutoSaveObserver
+from app.exceptions import OperationError
+from app.group_commit import AutoSavePolicy
+from app.repl import run_loop
+
+
+def _env(monkeypatch, tmp_path, policy):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", "true")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE_POLICY", policy)
+    return tmp_path / "h.csv"
+
+
+@pytest.mark.parametrize("text,kind,every,ms", [
+    (None, "always", 0, 0.0),
+    ("every=5", "every", 5, 0.0),
+    ("interval=250ms", "interval", 0, 250.0),
+    ("interval=2s", "interval", 0, 2000.0),
+    ("on-idle", "on-idle", 0, 1000.0),
+    ("on-idle=50", "on-idle", 0, 50.0),
+])
+def test_policy_parse(text, kind, every, ms):
+    p = AutoSavePolicy.parse(text)
+    assert (p.kind, p.every, p.interval_ms) == (kind, every, ms)
+
+
+def test_policy_parse_rejects_garbage():
+    with pytest.raises(OperationError):
+        AutoSavePolicy.parse("every=0")
+
+
+def test_every_n_writes_once_per_n(tmp_path, monkeypatch):
+    out = _env(monkeypatch, tmp_path, "every=10")
+    obs = AutoSaveObserver()
+    calc = Calculator(observers=[obs])
+    for i in range(25):
+        calc.execute("add", i, 1)
+    assert obs.writes == 2 and len(pd.read_csv(out)) == 20
+    assert obs.flush() == 5 and len(pd.read_csv(out)) == 25
+    assert obs.flush() == 0  # clean: no write
+
+
+def test_interval_coalesces_bursts(tmp_path, monkeypatch):
+    out = _env(monkeypatch, tmp_path, "interval=100ms")
+    obs = AutoSaveObserver()
+    calc = Calculator(observers=[obs])
+    for i in range(500):
+        calc.execute("add", i, 1)
+    time.sleep(0.4)
+    assert 1 <= obs.writes <= 5
+    assert len(pd.read_csv(out)) == 500
+
+
+def test_undo_marks_dirty_and_run_loop_flushes_on_exit(tmp_path, monkeypatch):
+    out = _env(monkeypatch, tmp_path, "on-idle=60000")
+    obs = AutoSaveObserver()
+    calc = Calculator(observers=[obs])
+    run_loop(stdin=StringIO("add 1 2\nadd 3 4\n"), stdout=StringIO(), calc=calc)
+    assert len(pd.read_csv(out)) == 2  # EOF flushed the pending save
+
+    run_loop(stdin=StringIO("undo\nexit\n"), stdout=StringIO(), calc=calc)
+    assert len(pd.read_csv(out)) == 1  # undo alone made the history dirty
+
+
+
+@pytest.mark.parametrize("auto_save", ["true", "false"])
+def test_session_without_changes_leaves_file_alone(tmp_path, monkeypatch, auto_save):
+    out = _env(monkeypatch, tmp_path, "always")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", auto_save)
+    out.write_text("id,operation,a,b,result,timestamp\nx,add,1.0,2.0,3.0,2026-01-01T00:00:00+00:00\n")
+    before = out.read_bytes()
+    obs = AutoSaveObserver()
+    calc = Calculator(observers=[obs])
+    run_loop(stdin=StringIO("exit\n"), stdout=StringIO(), calc=calc)
+    assert out.read_bytes() == before and obs.flush() == 0
+    if auto_save == "false":
+        calc.execute("add", 1, 1)
+        assert obs.flush() == 0 and out.read_bytes() == before
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGTERM") or os.name != "posix", reason="POSIX signals")
+def test_sigterm_flushes_pending_autosave(tmp_path):
+    env = dict(os.environ,
+               CALCULATOR_HISTORY_DIR=str(tmp_path), CALCULATOR_HISTORY_FILE="h.csv",
+               CALCULATOR_LOG_DIR=str(tmp_path / "logs"), CALCULATOR_AUTO_SAVE="true",
+               CALCULATOR_AUTO_SAVE_POLICY="on-idle=60000")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, "-m", "app.repl"], cwd=root, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    proc.stdin.write("add 1 2\nmultiply 2 3\n")
+    proc.stdin.flush()
+    # wait for both answers before signalling
+    seen = ""
+    while seen.count("= ") < 2:
+        seen += proc.stdout.readline()
+    assert not (tmp_path / "h.csv").exists()
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 128 + signal.SIGTERM
+    assert len(pd.read_csv(tmp_path / "h.csv")) == 2
@@ -0,0 +1,152 @@
+# tests/test_batch.py
+import numpy as np
+import pytest
+
+import app.batch as batch_mod
+import app.shared_batch as shared_batch_mod
+from app.batch import _checkpoint_path, _exclusive, main, run_batch
+from app.calculator import Calculator
+from app.exceptions import OperationError
+from app.repl import process_line_iter
+
+
+def _write_csv(path, rows, header=True):
+    text = ("a,b\n" if header else "") + "".join(f"{a},{b}\n" for a, b in rows)
+    path.write_text(text)
+
+
+def _rows(path):
+    return path.read_text().splitlines()
+
+
+def test_csv_rows_errors_and_header(tmp_path):
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    src.write_text("a,b\n6,3\n1,0\nx,2\n\n9,3,extra\n")
+    report = run_batch(src, out, "divide", chunk_rows=2, workers=1)
+    assert _rows(out) == [
+        "a,b,result,error",
+        "6.0,3.0,2.0,",
+        "1.0,0.0,,operation error",
+        ",,,unreadable row",
+        ",,,unreadable row",
+        "9.0,3.0,3.0,",
+    ]
+    assert (report.rows, report.chunks) == (5, 3)
+    assert report.errors == {"operation error": 1, "unreadable row": 2}
+    assert "5 row(s) in 3 chunk(s)" in report.summary()
+    assert not _checkpoint_path(out).exists()
+
+
+def test_binary_columns_round_trip(tmp_path):
+    a, b = np.arange(1.0, 1001.0), np.full(1000, 2.0)
+    b[10] = 0.0
+    src, out = tmp_path / "in.f64", tmp_path / "out.f64"
+    np.column_stack([a, b]).astype("<f8").tofile(src)
+    report = run_batch(src, out, "divide", chunk_rows=64, workers=1)
+    results = np.fromfile(out, dtype="<f8")
+    assert report.rows == 1000 and report.chunks == 16
+    assert np.isnan(results[10]) and report.errors == {"operation error": 1}
+    mask = np.arange(1000) != 10
+    assert np.array_equal(results[mask], a[mask] / 2)
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def test_resumes_after_the_last_committed_chunk(tmp_path):
+    src = tmp_path / "in.csv"
+    _write_csv(src, [(i, 3) for i in range(100)])
+    full, out = tmp_path / "full.csv", tmp_path / "out.csv"
+    run_batch(src, full, "multiply", chunk_rows=10, workers=1)
+
+    def crash(p):
+        if p.chunk == 4:
+            raise _Interrupted
+    with pytest.raises(_Interrupted):
+        run_batch(src, out, "multiply", chunk_rows=10, workers=1, progress=crash)
+    assert _checkpoint_path(out).exists()
+    with out.open("a") as f:
+        f.write("9999,1,9999")  # a torn write after the last commit
+    seen = []
+    report = run_batch(src, out, "multiply", chunk_rows=10, workers=1, progress=seen.append)
+    assert report.resumed_rows == 40 and report.rows == 100
+    assert seen[0].chunk == 5
+    assert out.read_text() == full.read_text()
+
+
+def test_restart_and_changed_arguments_ignore_the_checkpoint(tmp_path):
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    _write_csv(src, [(i, 1) for i in range(30)], header=False)
+
+    def crash(p):
+        raise _Interrupted
+    with pytest.raises(_Interrupted):
+        run_batch(src, out, "add", chunk_rows=10, workers=1, progress=crash)
+    assert run_batch(src, out, "add", chunk_rows=10, workers=1, restart=True).resumed_rows == 0
+    with pytest.raises(_Interrupted):
+        run_batch(src, out, "add", chunk_rows=10, workers=1, progress=crash)
+    report = run_batch(src, out, "subtract", chunk_rows=10, workers=1)
+    assert report.resumed_rows == 0
+    assert _rows(out)[1] == "0.0,1.0,-1.0,"
+
+
+def test_bad_arguments_fail_before_any_output(tmp_path):
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    _write_csv(src, [(1, 2)])
+    with pytest.raises(OperationError):
+        run_batch(src, out, "nope")
+    with pytest.raises(OperationError, match="No input file"):
+        run_batch(tmp_path / "missing.csv", out, "add")
+    assert not out.exists()
+
+
+def test_cli_and_repl(tmp_path, capsys):
+    src = tmp_path / "in.csv"
+    _write_csv(src, [(2, 3), (4, 5)])
+    assert main([str(src), str(tmp_path / "cli.csv"), "--op", "power", "--workers", "1"]) == 0
+    assert "2 row(s)" in capsys.readouterr().out
+    assert _rows(tmp_path / "cli.csv")[1:] == ["2.0,3.0,8.0,", "4.0,5.0,1024.0,"]
+    assert main([str(tmp_path / "missing.csv"), str(tmp_path / "x.csv"), "--op", "add"]) == 2
+
+    calc = Calculator(observers=[])
+    _, lines = process_line_iter(calc, f"batch {src} {tmp_path / 'repl.csv'} --op POWER --chunk 1")
+    lines = list(lines)
+    assert lines[0].startswith("chunk 1: 1 row(s)") and lines[-1].startswith("batch: 2 row(s)")
+    assert calc.history.size() == 0
+    _, lines = process_line_iter(calc, f"batch {src} --op power")
+    assert list(lines)[0].startswith("error: usage")
+    _, lines = process_line_iter(calc, f"batch {src} {tmp_path / 'y.csv'} --op nope")
+    assert list(lines)[0].startswith("error:")
+
+
+def test_abandoned_repl_batch_stops_and_frees_its_output(tmp_path):
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    _write_csv(src, [(i, 2) for i in range(300)])
+    calc = Calculator(observers=[])
+    _, lines = process_line_iter(calc, f"batch {src} {out} --op multiply --chunk 1 --workers 1")
+    assert next(lines).startswith("chunk 1:")
+    lines.close()  # e.g. the daemon client hung up
+    assert _checkpoint_path(out).exists()
+
+    with _exclusive(out):
+        with pytest.raises(OperationError, match="Another batch is already writing"):
+            run_batch(src, out, "multiply", chunk_rows=1, workers=1)
+    report = run_batch(src, out, "multiply", chunk_rows=1, workers=1)
+    assert 0 < report.resumed_rows < 300 and report.rows == 300
+
+
+def test_one_worker_pool_serves_every_chunk(tmp_path, monkeypatch):
+    pools = []
+
+    class CountingPool(shared_batch_mod.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(shared_batch_mod, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(batch_mod, "MIN_PARALLEL", 10)
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    _write_csv(src, [(i, 2) for i in range(100)])
+    report = run_batch(src, out, "multiply", chunk_rows=20, workers=2)
+    assert report.chunks == 5 and len(pools) == 1
+    assert _rows(out)[-1] == "99.0,2.0,198.0,"
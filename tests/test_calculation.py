@@ -29,3 +29,23 @@ def test_from_dict_roundtrip_without_id_or_timestamp():
     c2 = Calculation.from_dict({"operation": "percent", "a": 50, "b": 200, "result": 25})
     assert c2.uid is None and c2.timestamp is None
     assert c2.operation == "percent" and c2.a == 50 and c2.b == 200 and c2.result == 25
+
+def test_now_uses_sequence_ids_and_renders_strings_lazily():
+    c1 = Calculation.now("add", 1.0, 2.0, 3.0)
+    c2 = Calculation.now("add", 1.0, 2.0, 3.0)
+    assert c2.seq > c1.seq and c1.ts_ns > 0
+    assert c1._uid is None and c1._timestamp is None  # nothing rendered yet
+    assert c1.uid != c2.uid and len(c1.uid) == 36
+    assert c1.uid is c1.uid  # cached after first render
+    assert c1.timestamp.endswith("+00:00") and "T" in c1.timestamp
+
+def test_calculation_is_slotted_frozen_and_picklable():
+    import pickle
+    import pytest
+    from dataclasses import FrozenInstanceError
+    c = Calculation.now("mul", 2.0, 3.0, 6.0)
+    assert not hasattr(c, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        c.result = 7.0  # type: ignore[misc]
+    c2 = pickle.loads(pickle.dumps(c))
+    assert c2 == c and c2.uid == c.uid and c2.seq == c.seq
@@ -0,0 +1,132 @@
+# tests/test_concurrency.py
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.command_pattern import CommandQueue, MathCommand
+from app.exceptions import OperationError
+from app.history import History
+from app.history_spill import entry_bytes
+
+
+@pytest.fixture
+def busy_switching():
+    """Switch threads far more often than usual, to shake out races."""
+    before = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(before)
+
+
+def _run(*targets):
+    errors = []
+
+    def guarded(fn):
+        try:
+            fn()
+        except Exception as exc:  # surfaced by the assertion below
+            errors.append(exc)
+    threads = [threading.Thread(target=guarded, args=(fn,)) for fn in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def _check_snapshot(h):
+    snap = h.snapshot()
+    entries = list(snap)
+    assert len(entries) == len(snap)
+    assert len({c.uid for c in entries}) == len(entries)
+    return entries
+
+
+@pytest.mark.parametrize("budget", [0, 16])
+def test_concurrent_execute_undo_save(tmp_path, monkeypatch, busy_switching, budget):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_MAX_HISTORY_SIZE", "100000")
+    monkeypatch.setenv("CALCULATOR_MAX_HISTORY_BYTES", str(budget * entry_bytes(Calculation.now("add", 1.0, 1.0, 2.0))))
+    calc = Calculator(observers=[])
+    per_thread, undos = 300, []
+    done = threading.Event()
+
+    def worker(t):
+        def run():
+            n = 0
+            for i in range(per_thread):
+                calc.execute("add", t * 1000 + i, 1)
+                if i % 7 == 0:
+                    try:
+                        calc.history.undo()
+                        n += 1
+                    except OperationError:
+                        pass
+            undos.append(n)
+        return run
+
+    def saver():
+        k = 0
+        while not done.is_set():
+            path = calc.history.save(tmp_path / f"h{k % 2}.csv")
+            assert pd.read_csv(path)["id"].is_unique  # each save is one consistent snapshot
+            k += 1
+
+    def reader():
+        while not done.is_set():
+            _check_snapshot(calc.history)
+            calc.history.query(operation="add", limit=5)
+            calc.history.stats.results("add")
+
+    workers = [worker(t) for t in range(4)]
+
+    def all_workers():
+        try:
+            _run(*workers)
+        finally:
+            done.set()
+    _run(all_workers, saver, reader)
+
+    total = 4 * per_thread
+    entries = _check_snapshot(calc.history)
+    assert calc.history.size() == len(entries) == total - sum(undos)
+    assert calc.history.stats.results("add").n == total  # sketches keep undone entries
+    path = calc.history.save(tmp_path / "final.csv")
+    fresh = History(max_size=100000)
+    assert fresh.load(path) == len(entries)
+    assert [c.uid for c in fresh.items()] == [c.uid for c in entries]
+
+
+def test_snapshot_outlives_undo_and_clear_of_spilled_segments(tmp_path):
+    calcs = [Calculation.now("add", float(i), 1.0, i + 1.0) for i in range(40)]
+    h = History(max_bytes=4 * entry_bytes(calcs[0]), spill_dir=tmp_path)
+    h.extend(calcs)
+    snap = h.snapshot()
+    assert snap.spilled > 0 and h.snapshot() is snap  # reused until something changes
+    for _ in range(40):
+        h.undo()
+    h.clear()
+    assert list(snap) == calcs and list(snap.window(3, 6)) == calcs[3:6]
+    assert h.items() == [] and h.snapshot() is not snap
+    del snap
+    assert not any(p.iterdir() for p in tmp_path.iterdir())  # segment files go with the last snapshot
+
+
+def test_command_queue_shared_between_threads(busy_switching):
+    calc, queue = Calculator(observers=[]), CommandQueue()
+    results = []
+
+    def producer(t):
+        return lambda: [queue.enqueue(MathCommand("add", t, i)) for i in range(250)]
+
+    def consumer():
+        for _ in range(50):
+            results.extend(queue.run_all(calc))
+    _run(*(producer(t) for t in range(4)), consumer, consumer)
+    results.extend(queue.run_all(calc))
+    assert len(results) == 1000 and queue.list() == []
+    assert calc.history.size() == 1000
@@ -0,0 +1,81 @@
+# tests/test_cost_guard.py
+from fractions import Fraction
+import threading
+import time
+import pytest
+
+from app.calculator import Calculator
+from app.cost_guard import check_cost, estimate_exact_digits, estimate_log10_magnitude, mp_context, run_with_timeout
+from app.exceptions import OperationError
+from app.repl import process_line
+
+
+def test_estimate_log10_magnitude():
+    assert estimate_log10_magnitude("power", 10, 5) == pytest.approx(5)
+    assert estimate_log10_magnitude("root", Fraction(10**12), 3) == pytest.approx(4)
+    assert estimate_log10_magnitude("power", 1, 10**400) == 0.0
+    assert estimate_log10_magnitude("add", 1, 2) is None
+
+
+def test_check_cost_rejects_unbounded_power():
+    check_cost("power", Fraction(2), Fraction(100), max_digits=100)
+    with pytest.raises(OperationError, match="too large"):
+        check_cost("power", Fraction(2), Fraction(10**9), max_digits=4300)
+    with pytest.raises(OperationError):
+        check_cost("power", Fraction(3), Fraction(-10**9), max_digits=4300)
+
+
+def test_exact_mode_rejects_before_computing(monkeypatch):
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    calc = Calculator(observers=[])
+    start = time.monotonic()
+    cont, out = process_line(calc, "power 3 1000000000")
+    assert cont and out.startswith("error: power result too large")
+    assert time.monotonic() - start < 1.0
+    assert process_line(calc, "power 2 10")[1] == "power(2, 10) = 1024"
+
+
+
+def test_exact_mode_rejects_long_fractions_of_small_values(monkeypatch):
+    base = Fraction("1.0000001")
+    assert estimate_log10_magnitude("power", base, Fraction(10**9)) < 100  # the value stays small
+    assert estimate_exact_digits("power", base, Fraction(10**9)) == pytest.approx(7e9)
+    assert estimate_exact_digits("power", Fraction(4, 9), Fraction(3, 2)) == pytest.approx(1.5 * 0.9542, rel=1e-3)
+    with pytest.raises(OperationError, match="as a fraction"):
+        check_cost("power", base, Fraction(10**6), max_digits=4300)
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    calc = Calculator(observers=[])
+    start = time.monotonic()
+    assert process_line(calc, "power 1.0000001 1000000000")[1].startswith("error: power result too large")
+    assert time.monotonic() - start < 1.0
+    assert process_line(calc, "power 1.5 3")[1] == "power(3/2, 3) = 27/8"
+
+
+def test_timeout_kills_worker_and_queue_keeps_going(monkeypatch):
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    monkeypatch.setenv("CALCULATOR_MAX_RESULT_DIGITS", "0")  # let the slow one through
+    monkeypatch.setenv("CALCULATOR_OP_TIMEOUT", "0.2")
+    calc = Calculator(observers=[])
+    process_line(calc, "enqueue power 3 10000000")
+    process_line(calc, "enqueue power 2 3")
+    cont, out = process_line(calc, "runqueue")
+    assert out.splitlines() == ["error: timed out", "power(2.0, 3.0) = 8"]
+
+
+def test_run_with_timeout_relays_operation_errors():
+    with pytest.raises(OperationError, match="Even root"):
+        run_with_timeout("float", 6, "root", -4.0, 2.0, timeout=5)
+    assert run_with_timeout("exact", 6, "power", Fraction(2), Fraction(3), timeout=5) == 8
+
+
+def test_workers_are_not_forked_while_other_threads_run():
+    stop = threading.Event()
+    t = threading.Thread(target=stop.wait, daemon=True)
+    t.start()
+    try:
+        assert mp_context().get_start_method() != "fork"
+        with pytest.raises(OperationError, match="Even root"):
+            run_with_timeout("float", 6, "root", -4.0, 2.0, timeout=30)
+    finally:
+        stop.set()
+        t.join()
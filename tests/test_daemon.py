@@ -0,0 +1,78 @@
+# tests/test_daemon.py
+import threading
+import pytest
+
+from app.calculator import Calculator
+from app.daemon import CalculatorDaemon
+from app import client
+
+
+def _start(tmp_path, idle=5.0):
+    sock = tmp_path / "calc.sock"
+    daemon = CalculatorDaemon(sock, idle_timeout=idle, calc=Calculator(observers=[]))
+    t = threading.Thread(target=daemon.serve_until_idle, daemon=True)
+    t.start()
+    return daemon, t, str(sock)
+
+
+def test_daemon_answers_like_the_repl(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    daemon, t, sock = _start(tmp_path, idle=0.3)
+
+    out = client.request(["add 1 2"], path=sock, spawn=False)
+    assert out == "add(1.0, 2.0) = 3.0\n"
+
+    # state stays warm between connections
+    out = client.request(["multiply 2 3", "history"], path=sock, spawn=False)
+    assert "multiply(2.0, 3.0) = 6.0" in out
+    assert "add(1.0, 2.0) = 3.0 [" in out
+
+    # idle timeout shuts the daemon down and removes the socket
+    t.join(timeout=5)
+    assert not t.is_alive()
+    assert not (tmp_path / "calc.sock").exists()
+
+
+def test_client_reports_errors_and_missing_daemon(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    with pytest.raises(ConnectionError):
+        client.request(["add 1 2"], path=str(tmp_path / "none.sock"), spawn=False)
+
+    daemon, t, sock = _start(tmp_path, idle=0.3)
+    monkeypatch.setenv("CALCULATOR_DAEMON_SOCKET", sock)
+    assert client.main(["divide", "1", "0"]) == 1
+    assert "error: Division by zero" in capsys.readouterr().out
+    t.join(timeout=5)
+
+
+def test_second_daemon_refuses_live_socket(tmp_path):
+    daemon, t, sock = _start(tmp_path, idle=0.3)
+    with pytest.raises(OSError):
+        CalculatorDaemon(tmp_path / "calc.sock", idle_timeout=0.1)
+    t.join(timeout=5)
+
+
+def test_recording_belongs_to_one_connection(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    daemon, t, sock = _start(tmp_path, idle=0.3)
+
+    out = client.request(["record m", "add 1 2"], path=sock, spawn=False)
+    assert out.endswith("recorded: add 1 2\n")
+
+    # the first client left mid-recording: nothing is captured for it now
+    out = client.request(["add 1 2", "stop"], path=sock, spawn=False)
+    assert out == "add(1.0, 2.0) = 3.0\nerror: Not recording\n"
+    t.join(timeout=5)
+
+
+def test_daemon_autosaves_and_flushes_on_shutdown(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE_POLICY", "on-idle=60")  # nothing written until the flush
+    daemon = CalculatorDaemon(tmp_path / "calc.sock", idle_timeout=0.3)
+    t = threading.Thread(target=daemon.serve_until_idle, daemon=True)
+    t.start()
+    client.request(["add 1 2", "multiply 2 3"], path=str(tmp_path / "calc.sock"), spawn=False)
+    t.join(timeout=5)
+    assert not t.is_alive()
+    h = Calculator(observers=[]).history
+    assert h.load() == 2
@@ -0,0 +1,59 @@
+# tests/test_export.py
+import gzip
+import json
+import lzma
+import pandas as pd
+import pytest
+
+from app.calculator import Calculator
+from app.history_export import export_history
+from app.exceptions import OperationError
+from app.repl import process_line
+
+
+def _history():
+    calc = Calculator(observers=[])
+    for op, a, b in [("add", 0.1, 0.2), ("divide", 1.0, 3.0), ("multiply", 1e11, 3e11),
+                     ("int_divide", 7.0, 2.0), ("subtract", -0.0, 1e-5)]:
+        calc.execute(op, a, b)
+    return calc.history
+
+
+def test_streamed_csv_is_byte_identical_to_pandas(tmp_path):
+    h = _history()
+    streamed = tmp_path / "stream.csv"
+    h.save(streamed)
+    via_pandas = tmp_path / "pandas.csv"
+    h.to_dataframe().to_csv(via_pandas, index=False, encoding="utf-8")
+    assert streamed.read_bytes() == via_pandas.read_bytes()
+
+
+def test_export_jsonl_and_compression(tmp_path):
+    h = _history()
+    assert export_history(h.items(), tmp_path / "h.jsonl") == 5
+    rows = [json.loads(l) for l in (tmp_path / "h.jsonl").read_text().splitlines()]
+    assert rows[0]["operation"] == "add" and set(rows[0]) == {"id", "operation", "a", "b", "result", "timestamp"}
+
+    export_history(h.items(), tmp_path / "h.csv.gz")
+    with gzip.open(tmp_path / "h.csv.gz", "rt") as f:
+        assert len(pd.read_csv(f)) == 5
+    export_history(h.items(), tmp_path / "h.out", fmt="jsonl", compression="lzma")
+    with lzma.open(tmp_path / "h.out", "rt") as f:
+        assert sum(1 for _ in f) == 5
+
+
+def test_export_rejects_unknown_format(tmp_path):
+    with pytest.raises(OperationError):
+        export_history([], tmp_path / "h.csv", fmt="xml")
+
+
+def test_export_repl_command(tmp_path):
+    calc = Calculator(observers=[])
+    process_line(calc, "add 1 2")
+    out_path = tmp_path / "out.jsonl.xz"
+    cont, out = process_line(calc, f"export {out_path}")
+    assert cont and out == f"exported: 1 item(s) to {out_path}"
+    cont, out = process_line(calc, f"export {tmp_path / 'x.dat'} --format=jsonl --compress gzip")
+    assert out.startswith("exported: 1 item(s)")
+    cont, out = process_line(calc, "export")
+    assert out.startswith("error: usage: export")
@@ -0,0 +1,97 @@
+# tests/test_history_merge.py
+import math
+from fractions import Fraction
+
+import pytest
+
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.exceptions import OperationError
+from app.history_export import export_history, read_records
+from app.history_merge import MergeReport, main, merge_histories, merge_rows
+from app.history_store import SqliteHistoryStore
+from app.repl import process_line
+
+
+def _c(uid, second, a=1.0, result=None, op="add"):
+    return Calculation(op, a, 1.0, a + 1.0 if result is None else result,
+                       uid=f"00000000-0000-4000-8000-{uid:012d}", timestamp=f"2026-01-01T00:00:{second:02d}+00:00")
+
+
+def test_k_way_merge_orders_and_dedupes_across_formats(tmp_path):
+    host1 = [_c(1, 1), _c(2, 3), _c(5, 7)]
+    host2 = [_c(3, 2), _c(2, 3), _c(6, 9)]   # 2 is a copy of host1's record
+    host3 = [_c(4, 5, result=math.nan), _c(5, 7)]
+    export_history(host1, tmp_path / "h1.csv")
+    export_history(host2, tmp_path / "h2.jsonl.gz")
+    SqliteHistoryStore(tmp_path / "h3.db").save(host3)
+    report = merge_histories([tmp_path / "h1.csv", tmp_path / "h2.jsonl.gz", tmp_path / "h3.db"],
+                             tmp_path / "merged.csv")
+    merged = list(read_records(tmp_path / "merged.csv"))
+    assert [row[0][-1] for row in merged] == list("132456")
+    assert [row[5][-8:-6] for row in merged] == ["01", "02", "03", "05", "07", "09"]
+    assert (report.read, report.written, report.duplicates, report.conflicts) == (8, 6, 2, 0)
+    assert merged[3][4] == ""  # the NaN result survives the SQLite round trip
+    assert report.ok
+
+
+def test_conflicts_keep_the_first_file_and_are_reported(tmp_path, capsys):
+    export_history([_c(1, 1, a=2.0), _c(2, 2)], tmp_path / "a.csv")
+    export_history([_c(1, 1, a=2.0, result=99.0), _c(2, 2)], tmp_path / "b.csv")
+    assert main([str(tmp_path / "a.csv"), str(tmp_path / "b.csv"), "-o", str(tmp_path / "m.jsonl")]) == 1
+    out = capsys.readouterr().out
+    assert "1 duplicate(s), 1 conflict(s)" in out
+    assert "kept add(2.0, 1.0) = 3.0" in out and "b.csv has add(2.0, 1.0) = 99.0" in out
+    assert [float(r[4]) for r in read_records(tmp_path / "m.jsonl")] == [3.0, 2.0]
+
+
+def test_same_id_at_different_times_is_caught(tmp_path):
+    export_history([_c(1, 0), _c(2, 1), _c(3, 2, a=4.0)], tmp_path / "a.csv")
+    export_history([_c(2, 4), _c(1, 5, result=99.0), _c(3, 6, a=4.0)], tmp_path / "b.csv")
+    report = merge_histories([tmp_path / "a.csv", tmp_path / "b.csv"], tmp_path / "m.csv")
+    assert (report.written, report.duplicates, report.conflicts) == (3, 2, 1)
+    assert [row[0][-1] for row in read_records(tmp_path / "m.csv")] == list("123")
+    assert report.samples[0].kept.result == 2.0 and report.samples[0].dropped.result == 99.0
+    assert not report.ok
+
+
+def test_exact_mode_records_merge(tmp_path):
+    third = _c(1, 1, a=Fraction(1, 3), result=Fraction(4, 3))
+    export_history([third, _c(2, 2)], tmp_path / "a.csv")
+    export_history([third, _c(2, 2, result=Fraction(7, 2))], tmp_path / "b.csv")
+    report = merge_histories([tmp_path / "a.csv", tmp_path / "b.csv"], tmp_path / "m.csv")
+    assert (report.written, report.duplicates, report.conflicts) == (2, 1, 1)
+    assert [row[4] for row in read_records(tmp_path / "m.csv")] == ["4/3", "2.0"]
+    assert report.samples[0].dropped.result == Fraction(7, 2)
+
+
+def test_out_of_order_and_unreadable_rows_are_counted(tmp_path):
+    path = tmp_path / "h.csv"
+    export_history([_c(1, 5), _c(2, 3), _c(3, 6)], path)
+    with path.open("a") as f:
+        f.write("00000000-0000-4000-8000-000000000009,add,1.0,1.0,2.0,not-a-time\n")
+        f.write(",add,1.0,1.0,2.0,2026-01-01T00:00:07+00:00\n")
+    report = MergeReport()
+    assert len(list(merge_rows([path], report=report))) == 3
+    assert (report.out_of_order, report.skipped) == (1, 2)
+    assert "1 row(s) out of timestamp order" in report.summary()
+
+
+def test_bad_paths_fail_before_writing(tmp_path, capsys):
+    export_history([_c(1, 1)], tmp_path / "a.csv")
+    with pytest.raises(OperationError, match="No history file"):
+        merge_histories([tmp_path / "a.csv", tmp_path / "missing.csv"], tmp_path / "m.csv")
+    with pytest.raises(OperationError, match="CSV or JSON Lines"):
+        merge_histories([tmp_path / "a.csv"], tmp_path / "m.db")
+    assert not (tmp_path / "m.csv").exists()
+    assert main([str(tmp_path / "missing.csv"), "-o", str(tmp_path / "m.csv")]) == 2
+
+
+def test_repl_merge_command(tmp_path):
+    export_history([_c(1, 1), _c(3, 3)], tmp_path / "a.csv")
+    export_history([_c(2, 2), _c(3, 3)], tmp_path / "b.csv")
+    calc = Calculator(observers=[])
+    _, out = process_line(calc, f"merge {tmp_path / 'a.csv'} {tmp_path / 'b.csv'} --out {tmp_path / 'm.csv'}")
+    assert out == "merged 4 row(s) into 3: 1 duplicate(s), 0 conflict(s)"
+    _, out = process_line(calc, f"merge {tmp_path / 'a.csv'}")
+    assert out.startswith("error: usage")
@@ -0,0 +1,66 @@
+# tests/test_history_paging.py
+import io
+import types
+
+from app.calculator import Calculator
+from app.history import History
+from app.calculation import Calculation
+from app.repl import HISTORY_PAGE, process_line, process_line_iter, run_loop
+
+
+def _calc_with(n):
+    calc = Calculator()
+    for i in range(n):
+        calc.execute("add", float(i), 0.0)
+    return calc
+
+
+def _indices(out):
+    return [int(line.split()[0]) for line in out.splitlines() if not line.startswith("(")]
+
+
+def test_default_is_bounded_to_newest_page():
+    calc = _calc_with(HISTORY_PAGE + 5)
+    cont, out = process_line(calc, "history")
+    assert cont and _indices(out) == list(range(6, HISTORY_PAGE + 6))
+    assert out.splitlines()[-1].startswith(f"(6-{HISTORY_PAGE + 5} of {HISTORY_PAGE + 5};")
+    assert "add(24.0, 0.0) = 24.0" in out
+
+
+def test_last_page_and_offset():
+    calc = _calc_with(10)
+    assert _indices(process_line(calc, "history --last 3")[1]) == [8, 9, 10]
+    assert _indices(process_line(calc, "history --last 3 --page 2")[1]) == [5, 6, 7]
+    assert _indices(process_line(calc, "history --last=4 --page 3")[1]) == [1, 2]
+    assert _indices(process_line(calc, "history --offset 2 --last 3")[1]) == [3, 4, 5]
+    assert _indices(process_line(calc, "history --all")[1]) == list(range(1, 11))
+    assert "of 10;" not in process_line(calc, "history --last 10")[1]
+    assert process_line(calc, "history --page 9")[1] == "history: nothing there (10 item(s) in total)"
+    assert process_line(calc, "history --last 0")[1].startswith("error: usage")
+    assert process_line(calc, "history --bogus")[1].startswith("error: usage")
+
+
+def test_output_is_streamed_lazily():
+    calc = _calc_with(5)
+    reads = []
+    real = calc.history.window
+    calc.history.window = lambda a, b: (reads.append(i) or c for i, c in enumerate(real(a, b)))
+    cont, lines = process_line_iter(calc, "history --all")
+    assert isinstance(lines, types.GeneratorType) and reads == []
+    assert next(lines).startswith("   1  add(0.0") and reads == [0]
+
+
+def test_window_reads_only_overlapping_spill_segments(tmp_path):
+    h = History(max_bytes=1, spill_dir=tmp_path)  # everything but the newest entry spills
+    calcs = [Calculation.now("add", float(i), 0.0, float(i)) for i in range(50)]
+    h.extend(calcs)
+    assert h.spilled == 49
+    assert list(h.window(10, 13)) == calcs[10:13]
+    assert list(h.window(45, 60)) == calcs[45:]
+
+
+def test_run_loop_prints_streamed_lines():
+    calc = _calc_with(3)
+    out = io.StringIO()
+    run_loop(io.StringIO("history --all\nexit\n"), out, calc=calc)
+    assert "   3  add(2.0, 0.0) = 2.0" in out.getvalue()
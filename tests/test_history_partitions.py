@@ -0,0 +1,155 @@
+# tests/test_history_partitions.py
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.calculation import Calculation
+from app.exceptions import OperationError
+from app.history import History
+from app.history_store import PartitionedHistoryStore, backend_for, open_store
+from app.verify import verify_history
+
+
+def _c(n, day, hour=12, op="add"):
+    return Calculation(op, float(n), 1.0, n + 1.0 if op == "add" else n * 1.0,
+                       uid=f"00000000-0000-4000-8000-{n:012d}", timestamp=f"{day}T{hour:02d}:00:00+00:00")
+
+
+def _days_ago(n):
+    return (datetime.now(UTC).date() - timedelta(days=n)).isoformat()
+
+
+@pytest.fixture
+def calcs():
+    return [_c(1, "2026-03-01", 9), _c(2, "2026-03-01", 17, "multiply"),
+            _c(3, "2026-03-02"), _c(4, "2026-03-04", 8), _c(5, "2026-03-04", 20, "multiply")]
+
+
+def _spy_reads(store, monkeypatch):
+    days = []
+    read = store._read
+    monkeypatch.setattr(store, "_read", lambda day: days.append(day) or read(day))
+    return days
+
+
+def test_one_file_and_manifest_per_day(tmp_path, calcs):
+    store = open_store(tmp_path / "history.parts")
+    assert isinstance(store, PartitionedHistoryStore) and backend_for(store.path) == "partitioned"
+    assert store.save(calcs) == 5
+    assert sorted(p.name for p in store.path.iterdir()) == [
+        "2026-03-01.csv", "2026-03-01.json", "2026-03-02.csv", "2026-03-02.json",
+        "2026-03-04.csv", "2026-03-04.json"]
+    manifest = json.loads((store.path / "2026-03-01.json").read_text())
+    assert manifest["count"] == 2 and manifest["ops"] == {"add": 1, "multiply": 1}
+    assert (manifest["min_ts"], manifest["max_ts"]) == ("2026-03-01T09:00:00+00:00", "2026-03-01T17:00:00+00:00")
+    assert [c.uid for c in store.load()] == [c.uid for c in calcs]
+    assert [float(r[2]) for r in store.iter_rows()] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_save_rewrites_only_changed_days(tmp_path, calcs):
+    store = PartitionedHistoryStore(tmp_path / "h.parts")
+    store.save(calcs)
+    inodes = {p.name: p.stat().st_ino for p in store.path.glob("*.csv")}
+    assert store.save(calcs + [_c(6, "2026-03-04", 22)]) == 3  # only 03-04 again
+    after = {p.name: p.stat().st_ino for p in store.path.glob("*.csv")}
+    assert after["2026-03-01.csv"] == inodes["2026-03-01.csv"]
+    assert after["2026-03-04.csv"] != inodes["2026-03-04.csv"]
+    assert store.save(calcs[:3]) == 0  # days missing from a save are not deleted
+    assert [p.day for p in store.partitions()] == ["2026-03-01", "2026-03-02", "2026-03-04"]
+
+
+def test_pruned_load_then_save_keeps_other_days(tmp_path, calcs, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.parts")
+    monkeypatch.delenv("CALCULATOR_HISTORY_SHARED", raising=False)
+    PartitionedHistoryStore(tmp_path / "h.parts").save(calcs)
+    h = History(max_size=2)
+    h.load(since="2026-03-01T12:00:00+00:00")
+    assert [c.uid[-1] for c in h.items()] == ["4", "5"]  # 2 and 3 were trimmed
+    h.add(_c(6, "2026-03-04", 22))
+    h.save()
+    store = PartitionedHistoryStore(tmp_path / "h.parts")
+    assert [p.count for p in store.partitions()] == [2, 1, 3]
+    assert [c.uid[-1] for c in store.load()] == ["1", "2", "3", "4", "5", "6"]
+    h.undo()
+    h.undo()  # takes out 5 (loaded) as well as 6
+    assert len(h.snapshot().removed) == 2
+    h.save()
+    assert [c.uid[-1] for c in store.load()] == ["1", "2", "3", "4"]
+    assert h.snapshot().removed == ()  # applied: snapshots stop carrying them
+    h.redo()
+    h.save()
+    assert [c.uid[-1] for c in store.load()] == ["1", "2", "3", "4", "5"]
+
+
+def test_clear_then_save_empties_every_day(tmp_path, calcs, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.parts")
+    monkeypatch.delenv("CALCULATOR_HISTORY_SHARED", raising=False)
+    PartitionedHistoryStore(tmp_path / "h.parts").save(calcs)
+    h = History()
+    h.load(limit=2)
+    h.clear()
+    h.add(_c(6, "2026-03-04", 22))
+    h.save()
+    fresh = History()
+    fresh.load()
+    assert [c.uid[-1] for c in fresh.items()] == ["6"]
+    # the clear is applied once: later saves merge again
+    h.clear()
+    h.save()
+    PartitionedHistoryStore(tmp_path / "h.parts").save([_c(7, "2026-03-05")])
+    h.add(_c(8, "2026-03-06"))
+    h.save()
+    fresh.load()
+    assert [c.uid[-1] for c in fresh.items()] == ["7", "8"]
+
+
+def test_load_and_query_read_only_overlapping_days(tmp_path, calcs, monkeypatch):
+    store = PartitionedHistoryStore(tmp_path / "h.parts")
+    store.save(calcs)
+    days = _spy_reads(store, monkeypatch)
+    assert [c.uid[-1] for c in store.load(limit=3)] == ["3", "4", "5"]
+    assert days == ["2026-03-02", "2026-03-04"]
+    days.clear()
+    hits = store.query(since="2026-03-01T12:00:00+00:00", until="2026-03-02T23:59:59+00:00")
+    assert [c.uid[-1] for c in hits] == ["2", "3"] and days == ["2026-03-02", "2026-03-01"]
+    days.clear()
+    assert [c.uid[-1] for c in store.query(operation="multiply", limit=1)] == ["5"]
+    assert days == ["2026-03-04"]
+
+
+def test_history_load_range_through_config(tmp_path, calcs, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_BACKEND", "partitioned")
+    monkeypatch.delenv("CALCULATOR_HISTORY_FILE", raising=False)
+    h = History()
+    h.extend(calcs)
+    assert h.save() == tmp_path / "history.parts"
+    fresh = History()
+    assert fresh.load(since="2026-03-02", until="2026-03-03") == 1
+    assert fresh.items()[0].uid == calcs[2].uid
+    assert fresh.load() == 5
+    assert verify_history(tmp_path / "history.parts").checked == 5
+
+
+def test_retention_drops_whole_old_days(tmp_path):
+    old, recent = _c(1, _days_ago(10)), _c(2, _days_ago(1))
+    PartitionedHistoryStore(tmp_path / "h.parts").save([old, recent])
+    store = PartitionedHistoryStore(tmp_path / "h.parts", retention_days=7)
+    assert store.save([old, recent, _c(3, _days_ago(0))]) == 1
+    assert [p.day for p in store.partitions()] == [_days_ago(1), _days_ago(0)]
+    assert store.drop_before(_days_ago(0)) == 1
+    assert [c.uid[-1] for c in store.load()] == ["3"]
+
+
+def test_lost_manifest_is_rebuilt_and_sharing_is_refused(tmp_path, calcs):
+    store = PartitionedHistoryStore(tmp_path / "h.parts")
+    store.save(calcs)
+    (store.path / "2026-03-02.json").unlink()
+    (store.path / "2026-03-03.json").write_text("{}")  # a manifest without its day is ignored
+    assert [p.count for p in store.partitions()] == [2, 1, 2]
+    assert (store.path / "2026-03-02.json").exists()
+    with pytest.raises(OperationError, match="cannot be shared"):
+        store.append(calcs)
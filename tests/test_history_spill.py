@@ -0,0 +1,75 @@
+# tests/test_history_spill.py
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.history import History
+from app.history_spill import entry_bytes
+
+
+def _calc(i):
+    return Calculation.now("add" if i % 2 else "multiply", float(i), 1.0, float(i) + 1.0)
+
+
+def _budget(n):
+    return n * entry_bytes(_calc(1))
+
+
+def test_without_budget_entries_past_max_size_are_dropped(tmp_path):
+    h = History(max_size=3, spill_dir=tmp_path)
+    for i in range(5):
+        h.add(_calc(i))
+    assert h.size() == 3 and h.spilled == 0 and not any(tmp_path.iterdir())
+
+
+def test_budget_spills_instead_of_dropping(tmp_path):
+    h = History(max_size=1000, max_bytes=_budget(10), spill_dir=tmp_path)
+    calcs = [_calc(i) for i in range(100)]
+    for c in calcs:
+        h.add(c)
+    assert h.size() == 100 and h.spilled > 0
+    assert h.memory_bytes <= _budget(10)
+    assert h.items() == calcs
+    assert [c.a for c in h.query(operation="add", limit=2)] == [97.0, 99.0]
+
+
+def test_max_size_spills_with_a_budget(tmp_path):
+    h = History(max_size=4, max_bytes=10**9, spill_dir=tmp_path)
+    for i in range(20):
+        h.add(_calc(i))
+    assert h.size() == 20 and len(h._done) <= 4
+
+
+def test_undo_redo_page_segments_back_in(tmp_path):
+    h = History(max_bytes=_budget(4), spill_dir=tmp_path)
+    calcs = [_calc(i) for i in range(30)]
+    h.extend(calcs)
+    undone = [h.undo() for _ in range(30)]
+    assert undone == calcs[::-1] and h.size() == 0 and h.spilled == 0
+    for _ in range(30):
+        h.redo()
+    assert h.items() == calcs
+
+
+def test_clear_and_restore_drop_segments(tmp_path):
+    h = History(max_bytes=_budget(4), spill_dir=tmp_path)
+    h.extend(_calc(i) for i in range(20))
+    m = h.create_memento()
+    assert len(m.done) == 20
+    h.clear()
+    assert h.is_empty() and not any(p.iterdir() for p in tmp_path.iterdir())
+    h.restore(m)
+    assert h.items() == list(m.done) and h.memory_bytes <= _budget(4)
+
+
+def test_save_load_include_spilled_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_MAX_HISTORY_SIZE", "5")
+    monkeypatch.setenv("CALCULATOR_MAX_HISTORY_BYTES", str(_budget(5)))
+    calc = Calculator()
+    for i in range(40):
+        calc.execute("add", i, 1)
+    assert calc.history.spilled and (tmp_path / "spill").is_dir()
+    calc.history.save()
+    fresh = Calculator()
+    assert fresh.history.load() == 40 and fresh.history.size() == 40
+    assert [c.a for c in fresh.history.items()] == [float(i) for i in range(40)]
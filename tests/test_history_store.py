@@ -0,0 +1,162 @@
+# tests/test_history_store.py
+import sqlite3
+from fractions import Fraction
+
+import pytest
+
+from app.calculation import Calculation
+from app.calculator import AutoSaveObserver, Calculator
+from app.exceptions import OperationError
+from app.history import History, HistorySnapshot
+from app.history_spill import entry_bytes
+from app.history_store import CsvHistoryStore, SqliteHistoryStore, backend_for, open_store
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT operation, a, b, result FROM history ORDER BY pos").fetchall()
+
+
+def test_backend_follows_suffix_then_config(tmp_path):
+    assert backend_for(tmp_path / "h.db") == "sqlite"
+    assert backend_for(tmp_path / "h.csv", "sqlite") == "csv"
+    assert backend_for(tmp_path / "h.hist", "sqlite") == "sqlite"
+    assert isinstance(open_store(tmp_path / "h.sqlite3"), SqliteHistoryStore)
+    assert isinstance(open_store(tmp_path / "h.csv"), CsvHistoryStore)
+    with pytest.raises(OperationError):
+        open_store(tmp_path / "h.hist", "parquet")
+
+
+def test_sqlite_uses_wal_and_indexes(tmp_path):
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    store.save([Calculation.now("add", 1.0, 2.0, 3.0)])
+    with sqlite3.connect(tmp_path / "h.db") as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {r[1] for r in conn.execute("PRAGMA index_list(history)")}
+    assert {"ix_history_operation", "ix_history_timestamp", "ix_history_result"} <= indexes
+
+
+def test_sqlite_save_is_incremental_and_mirrors_history(tmp_path):
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    h = History(max_size=3)
+    for i in range(3):
+        h.add(Calculation.now("add", float(i), 1.0, i + 1.0))
+    assert store.save(h.items()) == 3
+    h.add(Calculation.now("multiply", 2.0, 3.0, 6.0))  # trims the oldest
+    assert store.save(h.items()) == 1
+    h.undo()
+    assert store.save(h.items()) == 0
+    assert [r[0] for r in _rows(tmp_path / "h.db")] == ["add", "add"]
+    h.redo()
+    assert store.save(h.items()) == 1
+    assert [c.uid for c in store.load()] == [c.uid for c in h.items()]
+    h.clear()
+    store.save(h.items())
+    assert _rows(tmp_path / "h.db") == []
+
+
+def test_sqlite_save_and_merge_stream_a_spilled_history(tmp_path, monkeypatch):
+    calcs = [Calculation.now("add", float(i), 1.0, i + 1.0) for i in range(60)]
+    h = History(max_bytes=4 * entry_bytes(calcs[0]), spill_dir=tmp_path / "spill")
+    h.extend(calcs[:40])
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    assert h.spilled and store.save(h.snapshot()) == 40
+    h.merge(calcs[40:45])
+    h.add(calcs[45])
+    h.undo()
+    h.undo()  # a local entry from before the merged ones
+    assert store.save(h.snapshot()) == 5  # rewritten from the first row that moved
+    assert [c.uid for c in store.load()] == [c.uid for c in h.items()]
+
+    def whole_history(_self):
+        raise AssertionError("merge read the whole history")
+    monkeypatch.setattr(HistorySnapshot, "__iter__", whole_history)
+    assert h.merge(calcs[44:50]) == 5
+
+
+def test_sqlite_load_last_n_and_query(tmp_path):
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    calcs = [
+        Calculation("add" if i % 2 else "subtract", float(i), 1.0, float(i),
+                    uid=f"id-{i}", timestamp=f"2026-01-01T00:00:{i:02d}+00:00")
+        for i in range(10)
+    ]
+    store.save(calcs)
+    assert [c.a for c in store.load(limit=3)] == [7.0, 8.0, 9.0]
+    assert [c.a for c in store.query(operation="add")] == [1.0, 3.0, 5.0, 7.0, 9.0]
+    assert [c.a for c in store.query(operation="subtract", limit=2)] == [6.0, 8.0]
+    assert store.query(since=calcs[8].timestamp) == calcs[8:]
+
+
+def test_sqlite_keeps_exact_results(tmp_path):
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    store.save([Calculation.now("divide", Fraction(1), Fraction(3), Fraction(1, 3))])
+    (c,) = SqliteHistoryStore(tmp_path / "h.db").load()
+    assert c.result == Fraction(1, 3)
+
+
+def test_history_backend_from_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.delenv("CALCULATOR_HISTORY_FILE", raising=False)
+    monkeypatch.setenv("CALCULATOR_HISTORY_BACKEND", "sqlite")
+    h = History()
+    h.add(Calculation("add", 1, 2, 3))
+    h.add(Calculation("power", 2, 10, 1024))
+    assert h.save() == tmp_path / "history.db"
+    h2 = History()
+    assert h2.load(limit=1) == 1 and h2.items()[0].result == 1024
+
+
+def test_history_closes_the_stores_it_opens(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.delenv("CALCULATOR_HISTORY_FILE", raising=False)
+    monkeypatch.setenv("CALCULATOR_HISTORY_BACKEND", "sqlite")
+    closed = []
+    real = SqliteHistoryStore.close
+    monkeypatch.setattr(SqliteHistoryStore, "close", lambda self: closed.append(self._conn) or real(self))
+    h = History()
+    h.add(Calculation("add", 1, 2, 3))
+    h.save()
+    assert History().load() == 1
+    assert len(closed) == 2 and None not in closed  # each opened a connection and closed it
+    kept = SqliteHistoryStore(tmp_path / "kept.db")
+    h.save(store=kept)
+    assert len(closed) == 2 and kept._conn is not None  # a store passed in stays open
+    kept.close()
+
+
+def test_autosave_sqlite_writes_only_new_rows(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "auto.db")
+    obs = AutoSaveObserver()
+    calc = Calculator(observers=[obs])
+    calc.execute("add", 1, 2)
+    calc.execute("multiply", 3, 4)
+    calc.history.undo()
+    obs.flush()
+    assert _rows(tmp_path / "auto.db") == [("add", 1.0, 2.0, 3.0)]
+
+
+def test_shared_sqlite_merges_between_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "shared.db")
+    monkeypatch.setenv("CALCULATOR_HISTORY_SHARED", "true")
+    o1, o2 = AutoSaveObserver(), AutoSaveObserver()
+    c1, c2 = Calculator(observers=[o1]), Calculator(observers=[o2])
+    c1.execute("add", 1, 1)
+    c2.execute("add", 2, 2)  # picks up c1's row while appending its own
+    assert c2.history.size() == 2
+    assert c1.refresh() == 1 and c1.history.size() == 2
+    assert len(_rows(tmp_path / "shared.db")) == 2
+
+
+def test_shared_sqlite_remembers_only_what_the_history_holds(tmp_path):
+    store = SqliteHistoryStore(tmp_path / "h.db")
+    calcs = [Calculation.now("add", float(i), 1.0, i + 1.0) for i in range(50)]
+    assert store.append(calcs) == ([], 50)
+    assert store.append(calcs[-5:]) == ([], 0)  # the history trimmed the rest
+    assert len(store._seen) == 5
+    # an entry it forgot and brings back is not inserted twice, nor counted
+    assert store.append(calcs[-6:]) == ([], 0)
+    assert len(_rows(tmp_path / "h.db")) == 50
+    store.close()
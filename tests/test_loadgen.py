@@ -0,0 +1,54 @@
+# tests/test_loadgen.py
+from dataclasses import replace
+
+import pytest
+
+from benchmarks.loadgen import Workload, format_reports, main, parse_distribution, parse_mix, run
+
+
+def test_the_same_seed_gives_the_same_steps():
+    w = Workload(steps=200, mix=parse_mix("add=3,divide=1"), error_rate=0.2, undo_rate=0.1, seed=7)
+    assert list(w) == list(w) == list(replace(w))
+    assert list(w) != list(replace(w, seed=8))
+
+
+def test_api_run_counts_the_injected_failures():
+    w = Workload(steps=300, mix=parse_mix("add=1,divide=1,root=1"), error_rate=0.25,
+                 undo_rate=0.05, redo_rate=0.05, seed=3)
+    steps = list(w)
+    report = run(w, "api")
+    assert report.steps == 300
+    assert report.injected == sum(s.injected for s in steps) > 0
+    assert report.errors >= report.injected  # undo/redo on an empty stack fail too
+    assert (report.undos, report.redos) == (sum(s.kind == "undo" for s in steps),
+                                            sum(s.kind == "redo" for s in steps))
+    assert not report.saves and "persistence is excluded" in format_reports([report])
+
+
+def test_autosave_runs_persist_the_history(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "load.csv")
+    report = run(Workload(steps=20, mix=parse_mix("add"), autosave=True), "repl")
+    assert report.saves and (tmp_path / "load.csv").exists()
+    assert "persistence is excluded" not in format_reports([report])
+
+
+@pytest.mark.parametrize("spec, message", [
+    ("uniform:1", "Bad operand distribution"),
+    ("cauchy:0:1", "Unknown operand distribution"),
+])
+def test_bad_distributions_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_distribution(spec)
+
+
+@pytest.mark.parametrize("spec", ["sqrt=1", "add=0", {"nope": 2}])
+def test_bad_mixes_are_rejected(spec):
+    with pytest.raises(ValueError, match="Mix needs built-in operations"):
+        parse_mix(spec)
+
+
+def test_cli_reports_usage_errors(capsys):
+    with pytest.raises(SystemExit):
+        main(["--undo", "0.8", "--redo", "0.5"])
+    assert "more than 1" in capsys.readouterr().err
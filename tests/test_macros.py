@@ -0,0 +1,79 @@
+# tests/test_macros.py
+import contextvars
+import json
+
+import pytest
+
+import app.macros as macros_mod
+import app.repl as repl
+from app.calculator import Calculator
+from app.command_pattern import MathCommand
+from app.exceptions import OperationError
+from app.macros import MacroBook, compile_macro
+from app.pipeline import Param, Ref
+from app.repl import process_line
+
+
+@pytest.fixture
+def calc(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(repl, "_RECORDING", contextvars.ContextVar("recording", default=None))
+    return Calculator(observers=[])
+
+
+def _record(calc, name, *lines):
+    outs = [process_line(calc, f"record {name}")[1]]
+    outs += [process_line(calc, line)[1] for line in lines]
+    outs.append(process_line(calc, "stop")[1])
+    return outs
+
+
+def test_record_and_play_with_arguments(calc):
+    outs = _record(calc, "hyp", "power %1 2", "power %2 2", "add _ $1 | root _ 2")
+    assert outs[1] == "recorded: power %1 2" and outs[-1] == "saved macro hyp (3 line(s))"
+    assert calc.history.size() == 0  # recording does not execute
+    process_line(calc, "clear")
+    out = process_line(calc, "play hyp 3 4")[1]
+    assert out.splitlines()[-1] == "root(25.0, 2.0) = 5.0"
+    assert process_line(calc, "play hyp 3")[1] == "error: hyp takes 2 argument(s), got 1"
+    assert process_line(calc, "play nope")[1] == "error: Unknown macro: nope"
+
+
+def test_bad_lines_are_rejected_while_recording(calc):
+    process_line(calc, "record m")
+    assert process_line(calc, "nope 1 2")[1] == "error: Unknown operation: nope"
+    assert process_line(calc, "add %0 1")[1].startswith("error: Invalid macro parameter")
+    assert process_line(calc, "record other")[1].startswith("error: Already recording m")
+    assert process_line(calc, "add 1 %1")[1] == "recorded: add 1 %1"
+    assert process_line(calc, "stop")[1] == "saved macro m (1 line(s))"
+    assert process_line(calc, "stop")[1] == "error: Not recording"
+    assert process_line(calc, "add %1 1")[1] == "error: Arguments must be numbers"
+
+
+def test_macro_compiles_to_math_commands(calc):
+    macro = compile_macro("m", ["add %1 2 | multiply _ 3"], calc)
+    assert macro.steps == (MathCommand("add", Param(1), 2.0), MathCommand("multiply", Ref(), 3.0))
+    assert macro.arity == 1
+
+
+def test_replay_skips_parsing_and_dispatch(calc, monkeypatch):
+    _record(calc, "inc", "add %1 1")
+    macro = repl._macro_book().get("inc", calc)
+
+    def boom(*_a, **_k):
+        raise AssertionError("re-parsed")
+    monkeypatch.setattr(macros_mod, "parse_chain", boom)
+    monkeypatch.setattr(repl, "_tokenize", boom)
+    results = [c.result for _ in range(1000) for c in macro.play(calc, [41.0])]
+    assert results == [42.0] * 1000
+
+
+def test_macros_persist_across_sessions(calc, tmp_path):
+    _record(calc, "double", "multiply %1 2")
+    assert json.loads((tmp_path / "macros.json").read_text()) == {"double": ["multiply %1 2"]}
+    book = MacroBook(tmp_path / "macros.json")
+    assert [c.result for c in book.get("double", calc).play(calc, [21.0])] == [42.0]
+    assert process_line(calc, "macros")[1] == "double: multiply %1 2"
+    book.delete("double")
+    with pytest.raises(OperationError):
+        MacroBook(tmp_path / "macros.json").get("double", calc)
@@ -0,0 +1,64 @@
+# tests/test_numeric.py
+from decimal import Decimal
+from fractions import Fraction
+import pytest
+
+from app.numeric import get_backend
+from app.calculator import Calculator
+from app.repl import process_line
+from app.exceptions import OperationError
+
+
+def test_float_backend_is_default_and_uncoerced(monkeypatch):
+    monkeypatch.delenv("CALCULATOR_NUMERIC_MODE", raising=False)
+    calc = Calculator(observers=[])
+    assert calc.numeric.name == "float"
+    assert calc.execute("add", 2, 3).result == 5
+
+
+def test_decimal_backend_uses_configured_precision():
+    dec = get_backend("decimal", 4)
+    assert dec.resolve("divide")(dec.parse("1"), dec.parse("3")) == Decimal("0.3333")
+    assert dec.resolve("add")(dec.parse(0.1), dec.parse(0.2)) == Decimal("0.3")
+    assert dec.resolve("root")(dec.parse("27"), dec.parse("3")) == Decimal("3")
+    assert dec.resolve("modulus")(dec.parse("-7"), dec.parse("2")) == 1
+    assert dec.resolve("int_divide")(dec.parse("-7"), dec.parse("2")) == -4
+
+
+@pytest.mark.parametrize("op,a,b,expected", [
+    ("add", "0.1", "0.2", Fraction(3, 10)),
+    ("divide", "1", "3", Fraction(1, 3)),
+    ("int_divide", "7.5", "2.5", 3),
+    ("power", "4", "0.5", 2),
+    ("root", "-32", "5", -2),
+    ("root", "16", "-2", Fraction(1, 4)),
+    # perfect powers past float range and past float precision stay exact
+    ("root", str(3 ** 700), "7", 3 ** 100),
+    ("root", str((2 ** 60 + 1) ** 3), "3", 2 ** 60 + 1),
+    ("power", str((10 ** 20 + 3) ** 2), "0.5", 10 ** 20 + 3),
+])
+def test_exact_backend_results(op, a, b, expected):
+    ex = get_backend("exact")
+    assert ex.resolve(op)(ex.parse(a), ex.parse(b)) == expected
+
+
+@pytest.mark.parametrize("mode", ["decimal", "exact"])
+def test_backends_keep_operation_errors(mode):
+    be = get_backend(mode, 6)
+    with pytest.raises(OperationError):
+        be.resolve("divide")(be.parse("1"), be.parse("0"))
+    with pytest.raises(OperationError):
+        be.resolve("root")(be.parse("-4"), be.parse("2"))
+    with pytest.raises(OperationError):
+        be.resolve("nonesuch")
+
+
+def test_exact_mode_through_repl_and_csv(monkeypatch, tmp_path):
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    calc = Calculator(observers=[])
+    assert process_line(calc, "divide 1 3")[1] == "divide(1, 3) = 1/3"
+    calc.history.save()
+    calc.history.load()
+    assert calc.history.items()[0].result == Fraction(1, 3)
@@ -49,7 +49,7 @@ def test_history_load_malformed_is_graceful(tmp_path, monkeypatch):
     assert h.size() == 0
 
 def test_history_save_raises_operationerror_on_io_failure(tmp_path, monkeypatch):
-    # Route file to a writable directory but force to_csv to fail
+    # Route file to a writable directory but force the write to fail
     monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
     monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "cannot.csv")
 
@@ -59,7 +59,8 @@ def test_history_save_raises_operationerror_on_io_failure(tmp_path, monkeypatch)
     def boom(*args, **kwargs):
         raise OSError("disk error")
 
-    monkeypatch.setattr(pd.DataFrame, "to_csv", boom)
+    # save() streams rows itself instead of going through DataFrame.to_csv
+    monkeypatch.setattr("app.history_store.write_records", boom)
 
     from app.exceptions import OperationError
     with pytest.raises(OperationError):
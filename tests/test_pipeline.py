@@ -0,0 +1,59 @@
+# tests/test_pipeline.py
+from fractions import Fraction
+
+from app.calculator import Calculator
+from app.pipeline import Ref, Stage, looks_like_chain, parse_chain, run_chain
+from app.repl import process_line
+
+
+def test_chain_runs_each_stage_on_the_previous_result():
+    calc = Calculator(observers=[])
+    cont, out = process_line(calc, "add 1 2 | multiply _ 3 | root _ 2")
+    assert cont and out.splitlines() == [
+        "add(1.0, 2.0) = 3.0", "multiply(3.0, 3.0) = 9.0", "root(9.0, 2.0) = 3.0",
+    ]
+    assert calc.history.size() == 3
+
+
+def test_references_to_history_entries():
+    calc = Calculator(observers=[])
+    process_line(calc, "add 1 2")
+    process_line(calc, "add 10 20")
+    assert process_line(calc, "multiply $1 $2")[1] == "multiply(3.0, 30.0) = 90.0"
+    assert process_line(calc, "subtract _ 1")[1] == "subtract(90.0, 1.0) = 89.0"
+    assert process_line(calc, "add $7 1")[1] == "error: No history entry $7 (4 item(s))"
+    assert process_line(calc, "add $0 1")[1].startswith("error: Invalid result reference")
+    assert process_line(Calculator(observers=[]), "add _ 1")[1] == "error: No previous result for _"
+
+
+def test_chain_parses_fully_before_running():
+    calc = Calculator(observers=[])
+    assert process_line(calc, "add 1 2 | nope _ 1")[1] == "error: Unknown operation: nope"
+    assert process_line(calc, "add 1 2 | multiply _")[1].startswith("error: Each piped stage")
+    assert process_line(calc, "add 1 2 | multiply _ x")[1] == "error: Arguments must be numbers"
+    assert calc.history.size() == 0
+
+
+def test_chain_stops_at_first_failing_stage():
+    calc = Calculator(observers=[])
+    out = process_line(calc, "add 1 2 | divide _ 0 | add _ 1")[1]
+    assert out.splitlines() == ["add(1.0, 2.0) = 3.0", "error: Division by zero"]
+    assert calc.history.size() == 1
+
+
+def test_values_flow_as_numbers_not_text(monkeypatch):
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    calc = Calculator(observers=[])
+    stages = parse_chain("divide 1 3 | multiply _ 3", calc)
+    assert stages[1] == Stage("multiply", Ref(), Fraction(3))
+    results = [c.result for c in run_chain(calc, stages)]
+    assert results == [Fraction(1, 3), Fraction(1)]
+
+
+def test_only_operation_lines_are_chains():
+    ops = Calculator(observers=[]).numeric.kernels
+    assert looks_like_chain("add 1 2 | add _ 1", ops)
+    assert looks_like_chain("add $1 2", ops)
+    assert not looks_like_chain("int_divide 7 2", ops)
+    assert not looks_like_chain("export $HOME/h.csv", ops)
+    assert not looks_like_chain("add '1' _", ops)
@@ -0,0 +1,98 @@
+# tests/test_plugins.py
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+import app.plugins as plugins
+from app.calculator import Calculator
+from app.command_registry import get_commands
+from app.operations import OPERATION_NAMES, unregister_lazy_operation
+from app.repl import _register_operations, process_line
+
+PLUGIN = '''
+import math
+
+OPERATIONS = {"hypot": "sqrt(a**2 + b**2)", "avg2": "mean of a and b"}
+
+class Hypot:
+    def execute(self, a, b):
+        return math.hypot(a, b)
+
+def avg2(a, b):
+    return (a + b) / 2
+'''
+
+
+@pytest.fixture
+def plugin_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path / "history"))
+    monkeypatch.setenv("CALCULATOR_PLUGIN_DIR", str(tmp_path / "plugins"))
+    (tmp_path / "plugins").mkdir()
+    monkeypatch.setattr(plugins, "_LOADED", {})
+    monkeypatch.setattr(plugins, "_SCANNED", set())
+    monkeypatch.setattr(plugins, "entry_points", lambda group: [])
+    yield tmp_path / "plugins"
+    for name in list(plugins._LOADED):
+        unregister_lazy_operation(name)
+        get_commands().pop(name, None)
+    for mod in [m for m in sys.modules if m.startswith("calculator_plugins.")]:
+        del sys.modules[mod]
+
+
+def test_directory_plugins_import_on_first_use(plugin_env):
+    (plugin_env / "geo.py").write_text(PLUGIN)
+    _register_operations()
+    calc = Calculator(observers=[])
+    assert "hypot" in OPERATION_NAMES
+    assert "sqrt(a**2 + b**2)" in process_line(calc, "help")[1]
+    assert "calculator_plugins.geo" not in sys.modules  # help did not import it
+    assert process_line(calc, "hypot 3 4")[1] == "hypot(3.0, 4.0) = 5.0"
+    assert "calculator_plugins.geo" in sys.modules
+    assert process_line(calc, "avg2 1 2 | hypot _ 2")[1].splitlines() == [
+        "avg2(1.0, 2.0) = 1.5", "hypot(1.5, 2.0) = 2.5"]
+
+
+def test_entry_points_are_lazy_too(plugin_env, tmp_path, monkeypatch):
+    (tmp_path / "ep_geo.py").write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    eps = [EntryPoint("ephypot", "ep_geo:Hypot", plugins.ENTRY_POINT_GROUP)]
+    monkeypatch.setattr(plugins, "entry_points", lambda group: eps if group == plugins.ENTRY_POINT_GROUP else [])
+    _register_operations()
+    assert "ep_geo" not in sys.modules
+    assert process_line(Calculator(observers=[]), "ephypot 5 12")[1] == "ephypot(5.0, 12.0) = 13.0"
+    assert "ep_geo" in sys.modules
+    del sys.modules["ep_geo"]
+
+
+def test_bad_or_clashing_plugins_are_skipped(plugin_env):
+    (plugin_env / "broken.py").write_text("OPERATIONS = {'x': \n")
+    (plugin_env / "clash.py").write_text("OPERATIONS = {'add': 'mine', 'history': 'mine', 'sum': 'mine'}\n")
+    (plugin_env / "missing.py").write_text("OPERATIONS = {'ghost': 'not defined'}\n")
+    _register_operations()
+    assert [p.name for p in plugins.loaded_plugins()] == ["ghost"]
+    calc = Calculator(observers=[])
+    assert process_line(calc, "add 1 2")[1] == "add(1.0, 2.0) = 3.0"
+    assert process_line(calc, "ghost 1 2")[1].startswith("error: Plugin operation ghost failed to load")
+
+
+def test_result_cache_misses_after_a_plugin_is_edited(plugin_env, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_RESULT_CACHE", "all")
+    plugin = plugin_env / "twice.py"
+    plugin.write_text('OPERATIONS = {"twice": "2a"}\n\ndef twice(a, b):\n    return 2 * a\n')
+    _register_operations()
+    calc = Calculator(observers=[])
+    assert process_line(calc, "twice 5 0")[1] == "twice(5.0, 0.0) = 10.0"
+    calc.flush()
+
+    plugin.write_text('OPERATIONS = {"twice": "2a"}\n\ndef twice(a, b):\n    return 3 * a\n')
+    unregister_lazy_operation("twice")
+    get_commands().pop("twice")
+    plugins._LOADED.clear()
+    plugins._SCANNED.clear()
+    del sys.modules["calculator_plugins.twice"]
+    _register_operations()
+    calc = Calculator(observers=[])
+    assert process_line(calc, "twice 5 0")[1] == "twice(5.0, 0.0) = 15.0"
+    assert calc.cache.hits == 0
+    assert process_line(calc, "twice 5 0")[1] == "twice(5.0, 0.0) = 15.0" and calc.cache.hits == 1
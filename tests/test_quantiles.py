@@ -0,0 +1,82 @@
+# tests/test_quantiles.py
+import json
+import random
+
+import pytest
+
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.quantiles import load_stats, main
+from app.repl import process_line
+from app.sketch import DistributionStats, KllSketch
+
+
+@pytest.fixture
+def calc(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    return Calculator(observers=[])
+
+
+def _rank_error(sketch, data, q):
+    value = sketch.quantile(q)
+    return abs(sum(1 for x in data if x < value) / len(data) - q)
+
+
+def test_sketch_is_small_and_accurate():
+    rng = random.Random(1)
+    data = [rng.gauss(0, 1) for _ in range(100_000)]
+    s = KllSketch(seed=2)
+    s.extend(data)
+    assert s.n == 100_000 and (s.min, s.max) == (min(data), max(data))
+    assert sum(map(len, s._levels)) < 2_000
+    for q in (0.01, 0.5, 0.9, 0.99):
+        assert _rank_error(s, data, q) < 0.02
+    assert sum(c for _, _, c in s.histogram(10)) == 100_000
+
+
+def test_merged_sketches_match_one_stream():
+    rng = random.Random(3)
+    a = [rng.random() for _ in range(30_000)]
+    b = [rng.random() + 1 for _ in range(50_000)]
+    left, right = KllSketch(seed=4), KllSketch(seed=5)
+    left.extend(a)
+    right.extend(b)
+    merged = KllSketch.from_dict(json.loads(json.dumps(left.to_dict()))).merge(right)
+    assert merged.n == 80_000
+    for q in (0.1, 0.375, 0.5, 0.9):
+        assert _rank_error(merged, a + b, q) < 0.02
+
+
+def test_history_keeps_stats_as_it_grows(calc):
+    for i in range(1, 101):
+        calc.execute("multiply", float(i), 2.0)
+    calc.execute("add", -5.0, 1.0)
+    stats = calc.history.stats
+    assert stats.operations() == ["add", "multiply"]
+    assert stats.results("multiply").quantile(0.5) == pytest.approx(100, abs=4)
+    assert stats.results().n == 101 and stats.inputs("add").max == 5.0
+    calc.history.clear()
+    assert stats.results().n == 0
+
+
+def test_quantiles_command_merges_files_and_saved_stats(calc, tmp_path):
+    for i in range(10):
+        calc.execute("add", float(i), 0.0)
+    path = calc.history.save(tmp_path / "h.csv")
+    out = process_line(calc, f"quantiles add --from {path} --save {tmp_path / 's.json'}")[1]
+    assert out.splitlines()[0] == "results (add): n=20 min=0 p50=4 p90=8 p99=9 max=9"
+    assert out.endswith(f"saved: {tmp_path / 's.json'}")
+    assert load_stats(tmp_path / "s.json").results("add").n == 20
+    assert len(process_line(calc, "quantiles --hist 3 --inputs")[1].splitlines()) == 5
+    assert process_line(calc, "quantiles --hist x")[1].startswith("error: usage")
+    assert process_line(calc, "quantiles divide")[1] == "quantiles: no results for divide"
+
+
+def test_cli_merges_sessions(tmp_path, capsys):
+    for name, values in (("a.json", range(0, 50)), ("b.json", range(50, 100))):
+        stats = DistributionStats()
+        stats.record_many(Calculation("add", float(v), 0.0, float(v)) for v in values)
+        stats.save(tmp_path / name)
+    assert main([str(tmp_path / "a.json"), str(tmp_path / "b.json"), "--op", "add"]) == 0
+    assert capsys.readouterr().out.startswith("results (add): n=100 min=0 p50=49")
+    assert main([str(tmp_path / "missing.json")]) == 2
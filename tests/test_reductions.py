@@ -0,0 +1,103 @@
+# tests/test_reductions.py
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from app.calculator import Calculator
+from app.exceptions import OperationError
+from app.operations import create_reduction
+from app.reductions import read_values, value_chunks
+from app.repl import process_line
+from app.verify import verify_history
+
+
+@pytest.fixture
+def calc(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    return Calculator(observers=[])
+
+
+def test_sum_is_correctly_rounded():
+    assert create_reduction("sum").reduce([0.1] * 10) == 1.0
+    assert create_reduction("sum").reduce([1e100, 1.0, -1e100]) == 1.0
+    assert create_reduction("mean").reduce(iter([1.0, 2.0, 4.0])) == pytest.approx(7 / 3)
+    with pytest.raises(OperationError):
+        create_reduction("product").reduce([1e200, 1e200])
+    with pytest.raises(OperationError):
+        create_reduction("median")
+
+
+@pytest.mark.parametrize("op, expected", [
+    ("sum", 10.0), ("product", 24.0), ("min", 1.0), ("max", 4.0), ("mean", 2.5),
+])
+def test_one_history_entry_per_reduction(calc, op, expected):
+    assert process_line(calc, f"{op} 3 1 4 2")[1] == f"{op}(4 values) = {expected}"
+    [c] = calc.history.items()
+    assert (c.operation, c.a, c.b, c.result) == (op, 4.0, 0.0, expected)
+
+
+def test_history_and_file_sources_stream_in_chunks(calc, tmp_path):
+    path = tmp_path / "values.txt"
+    path.write_text("1, 2\n3 4\n\n" + "1\n" * 1000)
+    chunks = list(read_values(path, chunk_lines=2))
+    assert chunks[0] == [1.0, 2.0, 3.0, 4.0] and len(chunks) == 502
+    assert process_line(calc, f"sum @{path} 5")[1] == "sum(1005 values) = 1015.0"
+    process_line(calc, "add 1 2")
+    assert process_line(calc, "mean @history")[1] == "mean(2 values) = 509.0"
+    assert process_line(calc, "history --last 1")[1].startswith("   3  mean(2 values) = 509.0")
+
+
+def test_bad_input_records_nothing(calc, tmp_path):
+    (tmp_path / "bad.txt").write_text("1 2 x\n")
+    assert process_line(calc, "sum")[1].startswith("error: usage: sum")
+    assert process_line(calc, "sum @history")[1] == "error: sum needs at least one value"
+    assert process_line(calc, f"sum @{tmp_path / 'bad.txt'}")[1].startswith("error: Non-numeric value")
+    assert process_line(calc, f"sum @{tmp_path / 'nope.txt'}")[1].startswith("error: Cannot read values")
+    assert process_line(calc, "max 1 1e13")[1] == "error: Input exceeds configured maximum"
+    assert calc.history.size() == 0
+
+
+
+@pytest.mark.parametrize("line", ["min nan 1", "max 1 nan", "sum 1 nan", "mean nan 2"])
+def test_nan_is_rejected_wherever_it_sits(calc, line):
+    op = line.split()[0]
+    assert process_line(calc, line)[1] == f"error: Result not finite in {op} operation"
+    assert calc.history.size() == 0
+
+
+def test_reductions_are_not_pipe_stages(calc):
+    for line in ("sum 1 2 3 | add _ 1", "add 1 2 | sum _ 5", "max _ 1"):
+        assert "cannot be" in process_line(calc, line)[1]
+    assert calc.history.size() == 0
+
+
+def test_exact_product_has_a_digit_limit(monkeypatch, tmp_path):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    monkeypatch.setenv("CALCULATOR_MAX_RESULT_DIGITS", "50")
+    calc = Calculator(observers=[])
+    out = process_line(calc, "product " + " ".join(["1.0000001"] * 20))[1]
+    assert out == "error: product result too large: about 140 digits (limit 50)"
+    assert process_line(calc, "product 2 3 0.5")[1] == "product(3 values) = 3"
+    assert calc.history.size() == 1
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("decimal", Decimal("0.6")), ("exact", Fraction(3, 5)),
+])
+def test_reductions_follow_the_numeric_mode(monkeypatch, tmp_path, mode, expected):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", mode)
+    calc = Calculator(observers=[])
+    assert calc.reduce("sum", value_chunks(calc, ["0.1", "0.2", "0.3"])).result == expected
+    assert calc.reduce("mean", [[calc.numeric.parse("1")], [calc.numeric.parse("2")]]).result == 1.5
+
+
+def test_verify_skips_reductions(calc, tmp_path):
+    process_line(calc, "sum 1 2 3")
+    process_line(calc, "add 1 2")
+    path = calc.history.save(tmp_path / "h.csv")
+    report = verify_history(path, workers=1)
+    assert report.ok and report.checked == 1 and report.reductions == 1
+    assert report.summary().endswith("1 reduction(s) not recomputable")
@@ -98,7 +98,9 @@ def test_run_loop_immediate_eof():
     assert "> " in text
 
 
-def test_repl_module_main_entrypoint(monkeypatch):
+def test_repl_module_main_entrypoint(monkeypatch, tmp_path):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_LOG_DIR", str(tmp_path / "logs"))
     fake_stdin = StringIO("exit\n")
     fake_stdout = StringIO()
     monkeypatch.setattr(sys, "stdin", fake_stdin, raising=False)
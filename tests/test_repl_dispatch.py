@@ -0,0 +1,61 @@
+# tests/test_repl_dispatch.py
+from types import MappingProxyType
+
+import pytest
+
+from app.calculator import Calculator
+from app.command_registry import dispatch_table, get_commands, register
+from app.repl import _tokenize, process_line
+
+
+def test_tokenizer_fast_path_matches_shlex():
+    assert _tokenize("add  1.5\t2") == ["add", "1.5", "2"]
+    assert _tokenize("export 'my file.csv'") == ["export", "my file.csv"]
+    assert _tokenize('add "1" 2') == ["add", "1", "2"]
+    with pytest.raises(ValueError):
+        _tokenize("add 'unterminated 2")
+    assert process_line(Calculator(observers=[]), "add 'oops")[1].startswith("error:")
+
+
+def test_dispatch_table_is_frozen_and_cached():
+    process_line(Calculator(observers=[]), "help")
+    table = dispatch_table()
+    assert isinstance(table, MappingProxyType) and "add" in table
+    assert dispatch_table() is table
+    with pytest.raises(TypeError):
+        table["x"] = None  # type: ignore[index]
+
+
+def test_dispatch_table_follows_registry_changes():
+    calc = Calculator(observers=[])
+    process_line(calc, "help")
+    register("ping", lambda _c, _a: "pong", "reply pong")
+    assert process_line(calc, "ping") == (True, "pong")
+    get_commands().pop("ping")
+    assert process_line(calc, "ping")[1].startswith("unknown command: ping")
+
+
+
+def test_dispatch_table_follows_in_place_edits():
+    calc = Calculator(observers=[])
+    process_line(calc, "help")
+    cmds = get_commands()
+    real_help = cmds["help"]
+    try:
+        cmds["help"] = lambda _c, _a: "custom help"
+        assert process_line(calc, "help") == (True, "custom help")
+        undo = cmds.pop("undo")
+        cmds["zzz"] = lambda _c, _a: "zzz ran"  # same size as before the pop
+        assert process_line(calc, "zzz") == (True, "zzz ran")
+        assert process_line(calc, "undo")[1].startswith("unknown command: undo")
+    finally:
+        cmds["help"] = real_help
+        cmds["undo"] = undo
+        del cmds["zzz"]
+
+
+def test_input_limit_is_read_once_per_session(monkeypatch):
+    monkeypatch.setenv("CALCULATOR_MAX_INPUT_VALUE", "10")
+    calc = Calculator(observers=[])
+    monkeypatch.setenv("CALCULATOR_MAX_INPUT_VALUE", "1e12")
+    assert process_line(calc, "add 11 0")[1] == "error: Input exceeds configured maximum"
@@ -0,0 +1,93 @@
+# tests/test_result_cache.py
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+import app.result_cache as rc
+from app.calculator import Calculator
+from app.repl import process_line
+from app.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_RESULT_CACHE", "all")
+    return tmp_path
+
+
+def test_results_survive_sessions(cache_env, monkeypatch):
+    c1 = Calculator()
+    assert c1.execute("power", 2, 10).result == 1024
+    c1.flush()
+
+    calls = []
+    c2 = Calculator()
+    real = c2.numeric.kernels["power"]
+    monkeypatch.setitem(c2.numeric.kernels, "power", lambda a, b: calls.append(1) or real(a, b))
+    assert c2.execute("power", 2, 10).result == 1024
+    assert calls == [] and c2.cache.hits == 1 and c2.cache.misses == 0
+    assert c2.execute("power", 2, 11).result == 2048 and calls == [1]
+    assert c2.cache.hit_rate == 0.5
+
+
+def test_values_round_trip_exactly(tmp_path):
+    cache = ResultCache(tmp_path / "r.db", "exact:6")
+    for value in (0.1, 7, Decimal("1.50"), Fraction(1, 3)):
+        cache.put("add", value, value, value)
+    again = ResultCache(tmp_path / "r.db", "exact:6")
+    for value in (0.1, 7, Decimal("1.50"), Fraction(1, 3)):
+        hit, got = again.get("add", value, value)
+        assert hit and got == value and type(got) is type(value)
+    assert again.get("add", 0.1, 0.2) == (False, None)
+    assert ResultCache(tmp_path / "r.db", "float:6").get("add", 7, 7) == (False, None)
+
+
+def test_code_change_invalidates_entries(tmp_path, monkeypatch):
+    ResultCache(tmp_path / "r.db", "float:6").put("add", 1.0, 2.0, 3.0)
+    monkeypatch.setattr(rc, "code_version", lambda: "edited")
+    cache = ResultCache(tmp_path / "r.db", "float:6")
+    assert cache.get("add", 1.0, 2.0) == (False, None)
+    assert "entries=0/" in cache.stats()
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "r.db", "float:6", max_entries=10)
+    for i in range(10):
+        cache.put("add", float(i), 0.0, float(i))
+    cache.get("add", 0.0, 0.0)  # the oldest entry is now the most recently used
+    cache.put("add", 99.0, 0.0, 99.0)
+    fresh = ResultCache(tmp_path / "r.db", "float:6", max_entries=10)
+    assert fresh.get("add", 0.0, 0.0)[0] and fresh.get("add", 99.0, 0.0)[0]
+    assert not fresh.get("add", 1.0, 0.0)[0]
+    assert fresh._count <= 10
+
+
+def test_storing_a_key_again_does_not_count_as_a_new_entry(tmp_path):
+    cache = ResultCache(tmp_path / "r.db", "float:6", max_entries=3)
+    for i in range(3):
+        cache.put("add", float(i), 0.0, float(i))
+        cache.put("add", float(i), 0.0, float(i))  # e.g. two threads that both missed
+    assert cache.stats().endswith("entries=3/3")
+    assert all(cache.get("add", float(i), 0.0) == (True, float(i)) for i in range(3))
+
+
+def test_errors_are_not_cached_and_risky_mode_skips_cheap_ops(cache_env, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_RESULT_CACHE", "risky")
+    calc = Calculator()
+    with pytest.raises(Exception):
+        calc.execute("divide", 1, 0)
+    calc.execute("add", 1, 2)
+    calc.execute("root", 27, 3)
+    assert calc.cache.misses == 1 and calc.cache._count == 1
+
+
+def test_cache_command(cache_env, monkeypatch):
+    calc = Calculator()
+    process_line(calc, "add 1 2")
+    process_line(calc, "add 1 2")
+    assert process_line(calc, "cache")[1].startswith("cache: hits=1 misses=1 hit rate=50.0%")
+    assert process_line(calc, "cache clear")[1] == "cache: cleared 1 entries"
+    monkeypatch.setenv("CALCULATOR_RESULT_CACHE", "off")
+    assert "off" in process_line(Calculator(), "cache")[1]
@@ -0,0 +1,54 @@
+# tests/test_shared_batch.py
+import os
+
+import numpy as np
+import pytest
+
+from app.calculator import Calculator
+from app.exceptions import OperationError
+from app.shared_batch import ERR_INPUT, ERR_OPERATION, OK, evaluate
+
+
+def _shm_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.mark.parametrize("workers, min_parallel", [(1, 0), (3, 0)])
+def test_matches_execute_element_by_element(workers, min_parallel):
+    rng = np.random.default_rng(1)
+    a, b = rng.uniform(-50, 50, 1_001), rng.integers(-3, 4, 1_001).astype(float)
+    before = _shm_blocks()
+    out = evaluate("int_divide", a, b, workers=workers, min_parallel=min_parallel)
+    assert _shm_blocks() == before  # every block unlinked
+    for x, y, r, e in zip(a, b, out.results, out.errors):
+        if y == 0:
+            assert e == ERR_OPERATION and np.isnan(r)
+        else:
+            assert e == OK and r == x // y
+    assert out.error_counts() == {"operation error": int((b == 0).sum())}
+
+
+def test_error_codes_are_per_element():
+    out = evaluate("root", [16.0, -8.0, 5.0, 1e13, 9.0], [2.0, 2.0, 0.5, 2.0, 2.0],
+                   workers=2, min_parallel=0, max_input=1e12)
+    assert out.errors.tolist() == [OK, ERR_OPERATION, ERR_OPERATION, ERR_INPUT, OK]
+    assert out.results[[0, 4]].tolist() == [4.0, 3.0]
+    assert out.error_count == 3
+
+
+def test_scalars_broadcast_and_bad_input_fails_fast():
+    assert evaluate("power", np.arange(4.0), 2.0).results.tolist() == [0.0, 1.0, 4.0, 9.0]
+    with pytest.raises(OperationError):
+        evaluate("nope", [1.0], [2.0])
+    with pytest.raises(OperationError):
+        evaluate("add", [1.0, 2.0], [1.0, 2.0, 3.0])
+
+
+def test_calculator_batch_keeps_history_untouched(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    calc = Calculator(observers=[])
+    out = calc.execute_batch("add", np.ones(10), np.arange(10.0), workers=2)
+    assert out.results.tolist() == [float(i + 1) for i in range(10)] and calc.history.size() == 0
+    monkeypatch.setenv("CALCULATOR_NUMERIC_MODE", "exact")
+    with pytest.raises(OperationError):
+        Calculator(observers=[]).execute_batch("add", [1.0], [1.0])
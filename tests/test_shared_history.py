@@ -0,0 +1,103 @@
+# tests/test_shared_history.py
+import os
+import subprocess
+import sys
+import pandas as pd
+
+from app.calculation import Calculation
+from app.calculator import Calculator, AutoSaveObserver
+from app.history_store import CsvHistoryStore
+from app.shared_history import SharedHistoryFile
+from app.repl import process_line
+
+
+def test_two_writers_merge_and_pick_up_each_other(tmp_path):
+    path = tmp_path / "h.csv"
+    p1, p2 = SharedHistoryFile(path), SharedHistoryFile(path)
+    a = [Calculation.now("add", 1.0, 1.0, 2.0), Calculation.now("add", 2.0, 2.0, 4.0)]
+    b = [Calculation.now("multiply", 3.0, 3.0, 9.0)]
+
+    assert p1.append(a) == ([], 2)
+    foreign, n = p2.append(b)
+    assert n == 1 and [c.uid for c in foreign] == [c.uid for c in a]
+    assert [c.uid for c in p1.read_new()] == [b[0].uid]
+    assert p1.read_new() == []  # incremental: nothing new since
+
+    # re-appending known records is a no-op (dedupe by uid)
+    assert p1.append(a + b) == ([], 0)
+    assert len(pd.read_csv(path)) == 3
+
+
+def test_torn_line_from_crashed_writer_is_skipped(tmp_path):
+    path = tmp_path / "h.csv"
+    w = SharedHistoryFile(path)
+    w.append([Calculation.now("add", 1.0, 1.0, 2.0)])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("deadbeef,add,1.0")  # crash mid-row, no newline
+    w.append([Calculation.now("add", 2.0, 2.0, 4.0)])
+    reader = SharedHistoryFile(path)
+    assert [c.a for c in reader.read_new()] == [1.0, 2.0]
+
+
+def test_remembered_uids_follow_the_history(tmp_path):
+    path = tmp_path / "h.csv"
+    w = SharedHistoryFile(path)
+    calcs = [Calculation.now("add", float(i), 1.0, i + 1.0) for i in range(50)]
+    w.append(calcs)
+    w.append(calcs[-5:])  # the history trimmed the rest
+    assert len(w._seen) == 5
+    # an entry it forgot and brings back is written again, but loads once
+    assert w.append(calcs[-6:]) == ([], 1)
+    assert [c.uid for c in CsvHistoryStore(path).load()] == [c.uid for c in calcs]
+
+
+def test_autosave_observers_share_one_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", "true")
+    monkeypatch.setenv("CALCULATOR_HISTORY_SHARED", "true")
+    c1 = Calculator(observers=[AutoSaveObserver()])
+    c2 = Calculator(observers=[AutoSaveObserver()])
+    c1.execute("add", 1, 2)
+    c2.execute("subtract", 5, 3)   # merge-on-write pulls c1's row into c2
+    assert [c.operation for c in c2.history.items()] == ["subtract", "add"]
+    assert process_line(c1, "refresh")[1] == "refreshed: 1 new item(s)"
+    assert c1.history.size() == 2
+    # an explicit save in shared mode must not clobber the other writer's rows
+    c1.history.save()
+    assert len(pd.read_csv(tmp_path / "h.csv")) == 2
+
+
+
+def test_undo_takes_back_only_local_calculations(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", "true")
+    monkeypatch.setenv("CALCULATOR_HISTORY_SHARED", "true")
+    c1 = Calculator(observers=[AutoSaveObserver()])
+    c2 = Calculator(observers=[AutoSaveObserver()])
+    c1.execute("add", 1, 2)
+    c2.execute("subtract", 5, 3)
+    c1.execute("multiply", 2, 3)
+    process_line(c2, "refresh")
+    assert [c.operation for c in c2.history.items()] == ["subtract", "add", "multiply"]
+    assert process_line(c2, "undo")[1] == "undo: subtract(5, 3)"
+    assert process_line(c2, "undo")[1] == "error: Nothing to undo"
+    assert [c.operation for c in c2.history.items()] == ["add", "multiply"]
+    assert len(pd.read_csv(tmp_path / "h.csv")) == 3  # the file keeps the appended row
+
+
+def test_concurrent_processes_lose_no_records(tmp_path):
+    env = dict(os.environ, CALCULATOR_HISTORY_DIR=str(tmp_path), CALCULATOR_HISTORY_FILE="h.csv",
+               CALCULATOR_LOG_DIR=str(tmp_path / "logs"), CALCULATOR_AUTO_SAVE="true",
+               CALCULATOR_HISTORY_SHARED="true")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        "from app.calculator import Calculator, AutoSaveObserver\n"
+        "c = Calculator(observers=[AutoSaveObserver()])\n"
+        "for i in range(40): c.execute('add', i, 1)\n"
+    )
+    procs = [subprocess.Popen([sys.executable, "-c", script], cwd=root, env=env) for _ in range(4)]
+    assert all(p.wait(timeout=60) == 0 for p in procs)
+    df = pd.read_csv(tmp_path / "h.csv")
+    assert len(df) == 160 and df["id"].is_unique
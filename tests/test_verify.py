@@ -0,0 +1,147 @@
+# tests/test_verify.py
+import multiprocessing
+import sys
+
+import pytest
+
+import app.plugins as plugins
+import app.verify as verify_mod
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.history import History
+from app.history_export import export_history
+from app.history_store import SqliteHistoryStore
+from app.operations import unregister_lazy_operation
+from app.repl import process_line
+from app.verify import main, verify_history
+
+
+def _history(n=50):
+    h = History(max_size=n + 10)
+    calc = Calculator()
+    for i in range(n):
+        h.add(calc.execute("multiply", float(i), 1.5))
+    return h
+
+
+def test_clean_history_verifies(tmp_path):
+    h = _history()
+    h.save(tmp_path / "h.csv")
+    report = verify_history(tmp_path / "h.csv", workers=1)
+    assert report.ok and report.checked == 50 and report.skipped == 0
+
+
+def test_mismatches_are_reported_with_tolerance(tmp_path):
+    h = _history(3)
+    h.add(Calculation("add", 1.0, 2.0, 3.0000001, uid="near"))
+    h.add(Calculation("add", 1.0, 2.0, 4.0, uid="wrong"))
+    h.add(Calculation("divide", 1.0, 0.0, 5.0, uid="raises"))
+    h.save(tmp_path / "h.csv")
+    report = verify_history(tmp_path / "h.csv", tol=1e-6, workers=1)
+    assert report.checked == 6 and report.mismatches == 2
+    assert [m.uid for m in report.samples] == ["wrong", "raises"]
+    assert str(report.samples[1]).startswith("raises: divide(1.0, 0.0) stored 5.0, now error:")
+    assert verify_history(tmp_path / "h.csv", tol=1e-9, workers=1).mismatches == 3
+
+
+def test_process_pool_streams_chunks(tmp_path):
+    h = _history(200)
+    h.add(Calculation("subtract", 5.0, 3.0, 1.0, uid="bad"))
+    export_history(h.items(), tmp_path / "h.jsonl.gz")
+    report = verify_history(tmp_path / "h.jsonl.gz", workers=2, chunk_size=32)
+    assert report.checked == 201 and [m.uid for m in report.samples] == ["bad"]
+
+
+def test_sqlite_and_torn_rows(tmp_path):
+    h = _history(5)
+    SqliteHistoryStore(tmp_path / "h.db").save(h.items())
+    assert verify_history(tmp_path / "h.db", workers=1).checked == 5
+
+    h.save(tmp_path / "h.csv")
+    with open(tmp_path / "h.csv", "a", encoding="utf-8") as f:
+        f.write("x,add,oops,1.0,2.0,2026-01-01T00:00:00+00:00\nhalf,add\n")
+    report = verify_history(tmp_path / "h.csv", workers=1)
+    assert report.checked == 5 and report.skipped == 1
+
+
+
+def test_exact_mode_skips_rows_over_the_digit_limit(tmp_path):
+    h = _history(2)
+    h.add(Calculation("power", 1.0000001, 1e9, 1.0, uid="huge"))
+    h.add(Calculation("power", 3.0, 1e9, 1.0, uid="vast"))
+    h.save(tmp_path / "h.csv")
+    report = verify_history(tmp_path / "h.csv", workers=1, mode="exact", max_digits=4300)
+    assert (report.checked, report.too_costly, report.mismatches) == (2, 2, 0)
+    assert "2 row(s) over the result digit limit skipped" in report.summary()
+
+def test_verify_command_and_cli_exit_codes(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    calc = Calculator()
+    process_line(calc, "add 2 3")
+    process_line(calc, "save")
+    assert process_line(calc, "verify --workers 1")[1] == "verified 1 row(s): 0 mismatch(es)"
+    assert process_line(calc, "verify --tol")[1].startswith("error: usage")
+    assert main([]) == 0
+
+    h = History()
+    h.add(Calculation("add", 2.0, 3.0, 6.0, uid="off"))
+    h.save(tmp_path / "bad.csv")
+    assert main([str(tmp_path / "bad.csv"), "--workers", "1"]) == 1
+    assert "off: add(2.0, 3.0) stored 6.0, now 5.0" in capsys.readouterr().out
+    assert main([str(tmp_path / "missing.csv")]) == 2
+
+
+@pytest.fixture
+def plugin_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_PLUGIN_DIR", str(tmp_path / "plugins"))
+    (tmp_path / "plugins").mkdir()
+    (tmp_path / "plugins" / "geo.py").write_text(
+        "import math\nOPERATIONS = {'hypot': 'sqrt(a**2 + b**2)', 'sulk': 'always fails'}\n"
+        "def hypot(a, b):\n    return math.hypot(a, b)\n"
+        "def sulk(a, b):\n    raise ValueError('not today')\n")
+    monkeypatch.setattr(plugins, "_LOADED", {})
+    monkeypatch.setattr(plugins, "_SCANNED", set())
+    monkeypatch.setattr(plugins, "entry_points", lambda group: [])
+    yield tmp_path / "plugins"
+    for name in list(plugins._LOADED):
+        unregister_lazy_operation(name)
+    for mod in [m for m in sys.modules if m.startswith("calculator_plugins.")]:
+        del sys.modules[mod]
+
+
+def test_plugin_rows_verify_in_the_cli_and_fresh_workers(tmp_path, plugin_dir, monkeypatch, capsys):
+    h = History()
+    for i in range(4):
+        h.add(Calculation("hypot", 3.0 * i, 4.0 * i, 5.0 * i, uid=f"h{i}"))
+    h.save(tmp_path / "h.csv")
+    assert main([str(tmp_path / "h.csv"), "--workers", "1"]) == 0
+    assert "verified 4 row(s): 0 mismatch(es)" in capsys.readouterr().out
+    # spawned workers do not inherit the parent's plugin registry
+    monkeypatch.setattr(verify_mod, "mp_context", lambda: multiprocessing.get_context("spawn"))
+    report = verify_history(tmp_path / "h.csv", workers=2, chunk_size=2)
+    assert report.ok and report.checked == 4
+
+
+def test_a_raising_kernel_is_a_mismatch_not_a_crash(tmp_path, plugin_dir, capsys):
+    h = History()
+    h.add(Calculation("sulk", 1.0, 2.0, 3.0, uid="sulky"))
+    h.add(Calculation("add", 1.0, 2.0, 3.0, uid="fine"))
+    h.save(tmp_path / "h.csv")
+    assert main([str(tmp_path / "h.csv"), "--workers", "1"]) == 1
+    out = capsys.readouterr().out
+    assert "verified 2 row(s): 1 mismatch(es)" in out and "sulky" in out and "not today" in out
+
+
+def test_verify_without_autosave_checks_the_session_not_the_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "h.csv")
+    monkeypatch.setenv("CALCULATOR_AUTO_SAVE", "false")
+    stale = History()
+    stale.add(Calculation("add", 2.0, 3.0, 6.0, uid="stale"))
+    stale.save(tmp_path / "h.csv")
+    calc = Calculator(observers=[])
+    process_line(calc, "add 2 3")
+    process_line(calc, "multiply 2 3")
+    assert process_line(calc, "verify --workers 1")[1] == "verified 2 row(s): 0 mismatch(es)"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["h.csv"]  # the file itself is untouched